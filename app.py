@@ -4,23 +4,31 @@ Run with: streamlit run app.py
 """
 
 import streamlit as st
-from datetime import datetime
+import os
+import uuid
 import urllib.parse
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from contextlib import contextmanager
+from streamlit.errors import StreamlitAPIException
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from engine import (
-    calculate_traits, 
-    determine_season, 
     trait_summary, 
     season_label, 
     detect_tensions, 
     irl_tests_for,
-    trait_label
+    trait_label,
+    IncrementalScore,
+    use_answer_table,
+    QUESTION_KEYS,
+    QUESTION_OPTIONS
 )
-from palettes import palettes
-from streamlit_image_coordinates import streamlit_image_coordinates
-from PIL import Image
-import colorsys
+from result_cache import get_results
+from metrics import maybe_write_file, registry as metrics_registry, span, start_http_server
+
+# Subsystems the questionnaire doesn't need are imported on first use, so a
+# cold start paints the questions sooner (see bench.py --imports):
+#   image_pipeline (PIL) and streamlit_image_coordinates - once a photo is uploaded
+#   photo, palette_registry, lookup (numpy)                 - once a photo or result needs them
+#   storage, sheets_writer (gspread, google-auth)          - at booking submit
 
 # Display labels for dropdown options (prettier than internal values)
 DISPLAY_LABELS = {
@@ -43,149 +51,165 @@ DISPLAY_LABELS = {
     'chartreuse': 'Chartreuse/Lime'
 }
 
+# Answers needed before the provisional leader is shown
+PROVISIONAL_MIN_ANSWERS = 3
+
+# Swatches extracted from the inspiration image
+DOMINANT_COLOR_COUNT = 6
+
+# Photo sampling areas: label -> (radius in display pixels, shape)
+SAMPLING_AREAS = {
+    'Single pixel': (0, 'square'),
+    '7×7 patch': (3, 'square'),
+    'Circle (radius 5)': (5, 'circle'),
+}
+
 def format_option(option):
     """Convert internal value to pretty display label."""
     return DISPLAY_LABELS.get(option, option.replace('_', ' ').title())
 
 
-def save_to_google_sheets(booking_data):
-    """Save booking data to Google Sheets."""
+@st.cache_resource
+def load_palette_registry():
+    """Parsed palette data, shared by every session in this process."""
+    from palette_registry import get_registry
+    return get_registry()
+
+
+@st.cache_resource
+def load_answer_table():
+    """
+    Attach the precomputed answer table (python lookup.py build) once per
+    process, so full answer sets are served by lookup. Without a current
+    table file results are scored live.
+    """
+    from lookup import load_table
+    table = load_table()
+    use_answer_table(table)
+    return table
+
+
+@st.cache_resource
+def start_metrics_export():
+    """Serve /metrics on RFG_METRICS_PORT (once per process) when metrics are enabled."""
+    port = os.environ.get("RFG_METRICS_PORT")
+    if metrics_registry.enabled and port:
+        return start_http_server(int(port))
+    return None
+
+
+def rerun_section():
+    """
+    Rerun only the fragment being drawn. During a full-page run (the first
+    render, or a rerun triggered elsewhere) that isn't allowed, so the page
+    reruns instead.
+    """
     try:
-        # Set up credentials
-        scope = ['https://spreadsheets.google.com/feeds',
-                 'https://www.googleapis.com/auth/drive']
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(st.secrets["gcp_service_account"], scope)
-        client = gspread.authorize(creds)
-        
-        # Open the sheet
-        sheet = client.open_by_key('1t0mh7E_oQp78Lf4ADwX_t1ctGKSxNCvhYbcij0LIPtc').sheet1
-        
-        # Prepare the row data
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Format HSV data as strings
-        def format_hsv(color_data):
-            if color_data and 'hsv' in color_data:
-                h, s, v = color_data['hsv']
-                return f"H{h} S{s} V{v}"
-            return ""
-        
-        def format_hex(color_data):
-            if color_data and 'hex' in color_data:
-                return color_data['hex']
-            return ""
-        
-        row = [
-            timestamp,
-            booking_data.get('name', ''),
-            booking_data.get('email', ''),
-            booking_data.get('phone', ''),
-            booking_data.get('notes', ''),
-            booking_data.get('season', ''),
-            str(booking_data.get('confidence', '')),
-            # Photo analysis results
-            booking_data.get('photo_season', ''),
-            booking_data.get('undertone', ''),
-            booking_data.get('value', ''),
-            booking_data.get('chroma', ''),
-            # Iris color
-            format_hex(booking_data.get('iris_color')),
-            format_hsv(booking_data.get('iris_color')),
-            # Hair color
-            format_hex(booking_data.get('hair_color')),
-            format_hsv(booking_data.get('hair_color')),
-            # Skin color
-            format_hex(booking_data.get('skin_color')),
-            format_hsv(booking_data.get('skin_color')),
-            # Favorite colors (comma-separated hex codes)
-            ', '.join(booking_data.get('favorite_colors', []))
-        ]
-        
-        # Append to sheet
-        sheet.append_row(row)
-        return True
-    except Exception as e:
-        st.error(f"Error saving to Google Sheets: {str(e)}")
-        return False
-    
-def analyze_seasonal(iris, hair, skin):
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+
+@contextmanager
+def fragment_span(name):
     """
-    Analyze iris, hair, and skin colors to suggest a season.
+    Time a fragment body. On a full-page run it is a phase of "rerun" like
+    any other; when only the fragment reruns, the page-level "rerun" span
+    never runs, so the body is timed as "rerun_<name>" and the metrics file
+    is refreshed here instead.
     """
-    iris_h, iris_s, iris_v = iris['hsv']
-    hair_h, hair_s, hair_v = hair['hsv']
-    skin_h, skin_s, skin_v = skin['hsv']
-    
-    # UNDERTONE
-    if 20 <= skin_h <= 70:
-        undertone = "Warm"
-        undertone_reason = f"Skin hue {skin_h}° is in warm range"
-    elif skin_h >= 300 or skin_h <= 20:
-        undertone = "Cool"
-        undertone_reason = f"Skin hue {skin_h}° is in cool range"
-    else:
-        undertone = "Neutral"
-        undertone_reason = f"Skin hue {skin_h}° is between warm and cool"
+    ctx = get_script_run_ctx()
+    if ctx is None or not ctx.fragment_ids_this_run:
+        with span(name):
+            yield
+        return
+    with span(f"rerun_{name}"):
+        yield
+    maybe_write_file()
+
+
+def get_decoded_upload(uploaded_file, slot):
+    """
+    Decoded copy of an upload, shared across reruns (hashed once per file per
+    session) and counted against this session's image memory budget.
     
-    # VALUE
-    avg_value = (skin_v * 2 + hair_v + iris_v) / 4
-    if avg_value >= 65:
-        value = "Light"
-        value_reason = f"Average value {avg_value:.0f}% is light"
-    elif avg_value <= 40:
-        value = "Dark"
-        value_reason = f"Average value {avg_value:.0f}% is dark"
-    else:
-        value = "Medium"
-        value_reason = f"Average value {avg_value:.0f}% is medium"
+    slot names the uploader; when its file is replaced, the previous image
+    is released.
+    """
+    from image_pipeline import content_key, get_image, release_image
     
-    # CHROMA
-    avg_sat = (iris_s + hair_s) / 2
-    if avg_sat >= 50:
-        chroma = "Clear"
-        chroma_reason = f"Average saturation {avg_sat:.0f}% is high"
-    elif avg_sat <= 30:
-        chroma = "Muted"
-        chroma_reason = f"Average saturation {avg_sat:.0f}% is low"
-    else:
-        chroma = "Moderate"
-        chroma_reason = f"Average saturation {avg_sat:.0f}% is moderate"
+    keys = st.session_state.setdefault('upload_keys', {})
+    if uploaded_file.file_id not in keys:
+        keys[uploaded_file.file_id] = content_key(uploaded_file.getvalue())
+    key = keys[uploaded_file.file_id]
+    # Our own id rather than the runtime's, so every session (including
+    # headless test sessions) is budgeted separately
+    session = st.session_state.setdefault('image_session', uuid.uuid4().hex)
+    slots = st.session_state.setdefault('upload_slots', {})
+    if slots.get(slot) not in (None, key):
+        release_image(session, slots[slot])
+    slots[slot] = key
+    return get_image(uploaded_file.getvalue(), key, session)
+
+
+def release_upload(slot):
+    """Release the image behind an uploader that was cleared or is no longer shown."""
+    slots = st.session_state.get('upload_slots')
+    if slots and slots.get(slot):
+        from image_pipeline import release_image
+        release_image(st.session_state.image_session, slots.pop(slot))
+
+
+def release_session_images():
+    """Release every image this session holds (e.g. when the quiz starts over)."""
+    if 'image_session' in st.session_state:
+        from image_pipeline import release_session
+        release_session(st.session_state.image_session)
+        st.session_state.upload_slots = {}
+
+
+def clickable_image(image, key):
+    """Show an image and return the last click on it as {'x', 'y'} (or None)."""
+    from streamlit_image_coordinates import streamlit_image_coordinates
+    return streamlit_image_coordinates(image, key=key)
+
+
+@st.cache_resource
+def get_bookings():
+    """
+    Booking storage shared by every session: the local SQLite database, plus
+    the Google Sheet as an export sink. RFG_SHEET_BACKEND=local exports to a
+    local CSV stand-in instead, RFG_SHEET_BACKEND=fake to a local fake of the
+    Sheets API (see fake_sheets.py); RFG_SHEET_BACKEND=none skips the export.
+    """
+    from sheets_writer import DEFAULT_QUEUE_PATH, BookingQueue, GoogleSheet, LocalSheet, SheetsWriter
+    from storage import DEFAULT_DB_PATH, Bookings, SheetsSink, SQLiteStore
     
-    # SEASON
-    if undertone == "Warm":
-        if value == "Light" and chroma == "Clear":
-            season = "Spring"
-            season_reason = "Warm + light + clear = Spring"
-        elif chroma == "Muted":
-            season = "Autumn"
-            season_reason = "Warm + muted = Autumn family"
-        else:
-            season = "Spring/Autumn"
-            season_reason = "Warm undertone, mixed signals"
-    elif undertone == "Cool":
-        if chroma == "Muted" or value == "Light":
-            season = "Summer"
-            season_reason = "Cool + muted or light = Summer family"
-        elif chroma == "Clear" and value in ["Dark", "Medium"]:
-            season = "Winter"
-            season_reason = "Cool + clear + darker = Winter family"
-        else:
-            season = "Summer/Winter"
-            season_reason = "Cool undertone, mixed signals"
+    store = SQLiteStore(os.environ.get("RFG_BOOKINGS_DB", DEFAULT_DB_PATH))
+    backend = os.environ.get("RFG_SHEET_BACKEND", "google")
+    if backend == "none":
+        return Bookings(store)
+    if backend == "local":
+        sheet = LocalSheet(os.environ.get("RFG_LOCAL_SHEET", "local_sheet.csv"))
+    elif backend == "fake":
+        # The real Sheets client against an in-process fake of the API
+        from fake_sheets import FakeSheetsServer
+        server = FakeSheetsServer().start()
+        sheet = GoogleSheet(server.credentials_info(), server.sheet_key, server.url)
     else:
-        if chroma == "Muted":
-            season = "Soft Summer or Soft Autumn"
-            season_reason = "Neutral + muted = Soft seasons"
-        else:
-            season = "Needs draping"
-            season_reason = "Neutral undertone - need in-person draping"
-    
-    return {
-        'undertone': undertone, 'undertone_reason': undertone_reason,
-        'value': value, 'value_reason': value_reason,
-        'chroma': chroma, 'chroma_reason': chroma_reason,
-        'season': season, 'season_reason': season_reason
-    }
+        sheet = GoogleSheet(dict(st.secrets["gcp_service_account"]))
+    queue = BookingQueue(os.environ.get("RFG_BOOKING_QUEUE", DEFAULT_QUEUE_PATH))
+    return Bookings(store, [SheetsSink(SheetsWriter(queue, sheet))])
+
+
+def save_booking(booking_data):
+    """Store booking data (exports to Google Sheets happen in the background)."""
+    try:
+        get_bookings().save(booking_data)
+        return True
+    except Exception as e:
+        st.error(f"Error saving your information: {str(e)}")
+        return False
 
 # Page config
 st.set_page_config(
@@ -341,9 +365,13 @@ def main():
     st.markdown('<h1 class="main-header">🎨 RFG Palette System</h1>', unsafe_allow_html=True)
     st.markdown('<p class="sub-header">Discover Your Color Season</p>', unsafe_allow_html=True)
     
+    load_answer_table()
+    
     # Initialize session state
     if 'answers' not in st.session_state:
         st.session_state.answers = {}
+    if 'quiz_score' not in st.session_state:
+        st.session_state.quiz_score = IncrementalScore()
     
     # Instructions
     with st.expander("📖 How This Works"):
@@ -355,10 +383,7 @@ def main():
         """)
     
     # List of all questions (for progress tracking)
-    all_questions = [
-        'eye_color', 'hair_color', 'skin_tone', 'jewelry', 'veins', 'eyes',
-        'contrast', 'black_test', 'white_test', 'wrong_metal', 'worst_color', 'best_comp'
-    ]
+    all_questions = list(QUESTION_KEYS)
     
     # Initialize photo color session state
     if 'iris_color' not in st.session_state:
@@ -375,159 +400,183 @@ def main():
     # Create placeholder for progress bar (will update after selectboxes)
     progress_placeholder = st.empty()
     progress_bar_placeholder = st.empty()
+    leader_placeholder = st.empty()
     st.markdown("---")
     
     # Questions section
-    st.subheader("Physical Features")
+    with span("questions"):
+        st.subheader("Physical Features")
     
-    col1, col2 = st.columns(2)
+        col1, col2 = st.columns(2)
     
-    with col1:
-        eye_color = st.selectbox(
-            "Eye Color",
-            ["blue", "green", "brown", "hazel"],
-            key="eye_color_select",
-            index=None,
-            placeholder="Select...",
-            help="Your dominant eye color in natural light"
-        )
-        if eye_color is not None:
-            st.session_state.answers['eye_color'] = eye_color
+        with col1:
+            eye_color = st.selectbox(
+                "Eye Color",
+                QUESTION_OPTIONS['eye_color'],
+                key="eye_color_select",
+                index=None,
+                placeholder="Select...",
+                help="Your dominant eye color in natural light"
+            )
+            if eye_color is not None:
+                st.session_state.answers['eye_color'] = eye_color
         
-        hair_color = st.selectbox(
-            "Natural Hair Color",
-            ["blonde", "light brown", "dark brown", "black", "red"],
-            key="hair_color_select",
-            index=None,
-            placeholder="Select...",
-            help="Your natural color, not dyed"
-        )
-        if hair_color is not None:
-            st.session_state.answers['hair_color'] = hair_color
+            hair_color = st.selectbox(
+                "Natural Hair Color",
+                QUESTION_OPTIONS['hair_color'],
+                key="hair_color_select",
+                index=None,
+                placeholder="Select...",
+                help="Your natural color, not dyed"
+            )
+            if hair_color is not None:
+                st.session_state.answers['hair_color'] = hair_color
         
-        skin_tone = st.selectbox(
-            "Skin Tone",
-            ["warm", "cool", "neutral"],
-            key="skin_tone_select",
-            index=None,
-            placeholder="Select...",
-            help="Warm = golden/peachy undertones, Cool = pink/blue undertones"
-        )
-        if skin_tone is not None:
-            st.session_state.answers['skin_tone'] = skin_tone
+            skin_tone = st.selectbox(
+                "Skin Tone",
+                QUESTION_OPTIONS['skin_tone'],
+                key="skin_tone_select",
+                index=None,
+                placeholder="Select...",
+                help="Warm = golden/peachy undertones, Cool = pink/blue undertones"
+            )
+            if skin_tone is not None:
+                st.session_state.answers['skin_tone'] = skin_tone
         
-        jewelry = st.selectbox(
-            "Which jewelry looks best?",
-            ["gold", "silver", "both"],
-            key="jewelry_select",
-            index=None,
-            placeholder="Select...",
-            help="Which metal makes your skin glow?"
-        )
-        if jewelry is not None:
-            st.session_state.answers['jewelry'] = jewelry
+            jewelry = st.selectbox(
+                "Which jewelry looks best?",
+                QUESTION_OPTIONS['jewelry'],
+                key="jewelry_select",
+                index=None,
+                placeholder="Select...",
+                help="Which metal makes your skin glow?"
+            )
+            if jewelry is not None:
+                st.session_state.answers['jewelry'] = jewelry
         
-        veins = st.selectbox(
-            "Vein Color",
-            ["blue", "green", "blue-green", "purple"],
-            key="veins_select",
-            index=None,
-            placeholder="Select...",
-            help="Look at your inner wrist in natural light"
-        )
-        if veins is not None:
-            st.session_state.answers['veins'] = veins
+            veins = st.selectbox(
+                "Vein Color",
+                QUESTION_OPTIONS['veins'],
+                key="veins_select",
+                index=None,
+                placeholder="Select...",
+                help="Look at your inner wrist in natural light"
+            )
+            if veins is not None:
+                st.session_state.answers['veins'] = veins
         
-        eyes = st.selectbox(
-            "Eye Quality",
-            ["bright", "soft"],
-            key="eyes_select",
-            index=None,
-            placeholder="Select...",
-            help="Bright and clear vs muted and soft"
-        )
-        if eyes is not None:
-            st.session_state.answers['eyes'] = eyes
+            eyes = st.selectbox(
+                "Eye Quality",
+                QUESTION_OPTIONS['eyes'],
+                key="eyes_select",
+                index=None,
+                placeholder="Select...",
+                help="Bright and clear vs muted and soft"
+            )
+            if eyes is not None:
+                st.session_state.answers['eyes'] = eyes
     
-    with col2:
-        contrast = st.selectbox(
-            "Hair/Skin Contrast",
-            ["high", "low"],
-            key="contrast_select",
-            index=None,
-            placeholder="Select...",
-            help="High = dark hair + light skin or vice versa"
-        )
-        if contrast is not None:
-            st.session_state.answers['contrast'] = contrast
+        with col2:
+            contrast = st.selectbox(
+                "Hair/Skin Contrast",
+                QUESTION_OPTIONS['contrast'],
+                key="contrast_select",
+                index=None,
+                placeholder="Select...",
+                help="High = dark hair + light skin or vice versa"
+            )
+            if contrast is not None:
+                st.session_state.answers['contrast'] = contrast
         
-        black_test = st.selectbox(
-            "Black near your face",
-            ["yes", "softened", "no"],
-            key="black_test_select",
-            index=None,
-            placeholder="Select...",
-            help="Does pure black look good on you?"
-        )
-        if black_test is not None:
-            st.session_state.answers['black_test'] = black_test
+            black_test = st.selectbox(
+                "Black near your face",
+                QUESTION_OPTIONS['black_test'],
+                key="black_test_select",
+                index=None,
+                placeholder="Select...",
+                help="Does pure black look good on you?"
+            )
+            if black_test is not None:
+                st.session_state.answers['black_test'] = black_test
         
-        white_test = st.selectbox(
-            "Best white on you",
-            ["optic", "soft", "cream"],
-            key="white_test_select",
-            index=None,
-            placeholder="Select...",
-            help="Optic = bright white, Soft = off-white, Cream = warm ivory"
-        )
-        if white_test is not None:
-            st.session_state.answers['white_test'] = white_test
+            white_test = st.selectbox(
+                "Best white on you",
+                QUESTION_OPTIONS['white_test'],
+                key="white_test_select",
+                index=None,
+                placeholder="Select...",
+                help="Optic = bright white, Soft = off-white, Cream = warm ivory"
+            )
+            if white_test is not None:
+                st.session_state.answers['white_test'] = white_test
         
-        wrong_metal = st.selectbox(
-            "Wrong metal effect",
-            ["gold_sallow", "silver_gray", "no_diff"],
-            key="wrong_metal_select",
-            index=None,
-            placeholder="Select...",
-            format_func=format_option,
-            help="Gold makes you sallow OR silver makes you gray?"
-        )
-        if wrong_metal is not None:
-            st.session_state.answers['wrong_metal'] = wrong_metal
+            wrong_metal = st.selectbox(
+                "Wrong metal effect",
+                QUESTION_OPTIONS['wrong_metal'],
+                key="wrong_metal_select",
+                index=None,
+                placeholder="Select...",
+                format_func=format_option,
+                help="Gold makes you sallow OR silver makes you gray?"
+            )
+            if wrong_metal is not None:
+                st.session_state.answers['wrong_metal'] = wrong_metal
         
-        worst_color = st.selectbox(
-            "Worst color on you",
-            ["mustard", "camel", "icypink", "black", "hotpink"],
-            key="worst_color_select",
-            index=None,
-            placeholder="Select...",
-            format_func=format_option,
-            help="Which color looks terrible on you?"
-        )
-        if worst_color is not None:
-            st.session_state.answers['worst_color'] = worst_color
+            worst_color = st.selectbox(
+                "Worst color on you",
+                QUESTION_OPTIONS['worst_color'],
+                key="worst_color_select",
+                index=None,
+                placeholder="Select...",
+                format_func=format_option,
+                help="Which color looks terrible on you?"
+            )
+            if worst_color is not None:
+                st.session_state.answers['worst_color'] = worst_color
         
-        best_comp = st.selectbox(
-            "Color you get compliments in",
-            ["dusty_rose", "coral", "cobalt", "rust", "icy_lavender", "chartreuse"],
-            key="best_comp_select",
-            index=None,
-            placeholder="Select...",
-            format_func=format_option,
-            help="Which color gets you the most 'you look great!' comments?"
-        )
-        if best_comp is not None:
-            st.session_state.answers['best_comp'] = best_comp
+            best_comp = st.selectbox(
+                "Color you get compliments in",
+                QUESTION_OPTIONS['best_comp'],
+                key="best_comp_select",
+                index=None,
+                placeholder="Select...",
+                format_func=format_option,
+                help="Which color gets you the most 'you look great!' comments?"
+            )
+            if best_comp is not None:
+                st.session_state.answers['best_comp'] = best_comp
     
     # RECALCULATE progress after all selectboxes have run
     quiz_answered = len([q for q in all_questions if q in st.session_state.answers])
     photo_complete = all([st.session_state.iris_color, st.session_state.hair_color, st.session_state.skin_color])
     
+    # Running score: only answers changed by this rerun are applied. Once no
+    # remaining answer can change the season, the rest are optional.
+    with span("incremental_score"):
+        quiz_score = st.session_state.quiz_score
+        quiz_score.update(st.session_state.answers)
+        provisional = quiz_score.status()
+    quiz_done = quiz_answered == len(all_questions) or provisional['locked']
+    
     # NOW update the progress bar with accurate count
-    if quiz_answered < len(all_questions):
+    if not quiz_done:
         total_steps = len(all_questions)
         progress_placeholder.markdown(f'<p class="progress-text">Step {quiz_answered} of {total_steps}</p>', unsafe_allow_html=True)
         progress_bar_placeholder.progress(quiz_answered / total_steps)
+        if quiz_answered >= PROVISIONAL_MIN_ANSWERS:
+            others = [season_label(s) for s in provisional['contenders'][1:4]]
+            leader_placeholder.caption(
+                f"So far you're leaning **{season_label(provisional['leader'])}**"
+                + (f" — still in reach: {', '.join(others)}" if others else "")
+            )
+    elif quiz_answered < len(all_questions) and not photo_complete:
+        progress_placeholder.markdown(f'<p class="progress-text">Season settled after {quiz_answered} of {len(all_questions)} questions! Final step: Photo sampling</p>', unsafe_allow_html=True)
+        progress_bar_placeholder.progress(1.0)
+        leader_placeholder.info(
+            f"Your answers already point to **{season_label(provisional['leader'])}**, and the "
+            f"remaining questions can't change that, so they're optional. "
+            f"Answering them still fine-tunes your trait breakdown."
+        )
     elif not photo_complete:
         progress_placeholder.markdown(f'<p class="progress-text">Quiz complete! Final step: Photo sampling</p>', unsafe_allow_html=True)
         progress_bar_placeholder.progress(1.0)
@@ -536,197 +585,384 @@ def main():
         progress_bar_placeholder.progress(1.0)
     
     # ===== PHOTO SAMPLING SECTION (Required Step) =====
-    # Show after quiz questions are complete
-    if quiz_answered == len(all_questions):
+    # Show after quiz questions are complete (or the season is settled)
+    if quiz_done:
         st.markdown("---")
         
         if not photo_complete:
-            st.subheader("📸 Photo Color Sampling")
-            st.write("**Final step!** Upload a selfie and sample your iris, hair, and skin colors.")
-            st.caption("Good lighting, no makeup ideal. This helps validate your quiz results.")
-            st.info("📱 **On mobile?** Photo sampling works best on desktop where you can click precisely. You can also complete this step later.")
+            photo_sampler()
+        else:
+            # Sampling is done; the selfie isn't shown again
+            release_upload("selfie_upload")
+        
+        # Show results only when BOTH quiz AND photo are complete
+        if photo_complete:
+            st.markdown("---")
+            st.success("✨ Quiz complete! Here are your results:")
+            
+            # Quiz and photo results (computed once per distinct input,
+            # shared across sessions)
+            results = get_results(
+                st.session_state.answers,
+                st.session_state.iris_color,
+                st.session_state.hair_color,
+                st.session_state.skin_color
+            )
             
-            uploaded_file = st.file_uploader("Upload a photo", type=["jpg", "jpeg", "png"], key="selfie_upload")
+            # Display results (pass photo_result too)
+            display_results(results['traits'], results['result'],
+                            results['photo_result'], results['palette_match'])
+
+
+@st.fragment
+def photo_sampler():
+    """
+    Selfie upload and iris/hair/skin sampling. Runs as a fragment: mode
+    buttons and photo clicks rerun only this section, not the questionnaire.
+    """
+    with fragment_span("photo_sampler"):
+        st.subheader("📸 Photo Color Sampling")
+        st.write("**Final step!** Upload a selfie and sample your iris, hair, and skin colors.")
+        st.caption("Good lighting, no makeup ideal. This helps validate your quiz results.")
+        st.info("📱 **On mobile?** Photo sampling works best on desktop where you can click precisely. You can also complete this step later.")
+    
+        uploaded_file = st.file_uploader("Upload a photo", type=["jpg", "jpeg", "png"], key="selfie_upload")
+        if not uploaded_file:
+            release_upload("selfie_upload")
+    
+        if uploaded_file:
+            from photo import sample_color
+            with span("image_decode"):
+                decoded = get_decoded_upload(uploaded_file, "selfie_upload")
+        
+            st.write("**How to sample:**")
+            st.markdown("""
+            1. Select what you're sampling (Iris, Hair, or Skin) using the buttons below
+            2. Click directly on that area in your photo
+            3. The color will be captured automatically
+            4. Use the Redo button if you need to resample
+            """)
+        
+            # Mode selector buttons
+            st.write("**What are you sampling?**")
+            pcol1, pcol2, pcol3 = st.columns(3)
+        
+            with pcol1:
+                if st.button("👁️ Iris", use_container_width=True, 
+                            type="primary" if st.session_state.picking_mode == 'iris' else "secondary"):
+                    st.session_state.picking_mode = 'iris'
+                    rerun_section()
+            with pcol2:
+                if st.button("💇 Hair", use_container_width=True,
+                            type="primary" if st.session_state.picking_mode == 'hair' else "secondary"):
+                    st.session_state.picking_mode = 'hair'
+                    rerun_section()
+            with pcol3:
+                if st.button("✋ Skin", use_container_width=True,
+                            type="primary" if st.session_state.picking_mode == 'skin' else "secondary"):
+                    st.session_state.picking_mode = 'skin'
+                    rerun_section()
+        
+            st.info(f"👆 Click on the image to sample your **{st.session_state.picking_mode}** color")
+        
+            sampling_area = st.radio(
+                "Sampling area",
+                list(SAMPLING_AREAS),
+                index=1,
+                horizontal=True,
+                key="sampling_area",
+                help="A patch averages nearby pixels and ignores glare and shadows"
+            )
+        
+            # Display the 400px copy (decoded once per upload) and get click coordinates
+            coords = clickable_image(decoded.display, key=f"photo_{uploaded_file.name}")
+        
+            if coords:
+                # Scale coordinates up to the working-resolution copy
+                scale = decoded.display_scale
+                x = int(coords["x"] * scale)
+                y = int(coords["y"] * scale)
             
-            if uploaded_file:
-                image = Image.open(uploaded_file)
-                
-                st.write("**How to sample:**")
-                st.markdown("""
-                1. Select what you're sampling (Iris, Hair, or Skin) using the buttons below
-                2. Click directly on that area in your photo
-                3. The color will be captured automatically
-                4. Use the Redo button if you need to resample
-                """)
-                
-                # Mode selector buttons
-                st.write("**What are you sampling?**")
-                pcol1, pcol2, pcol3 = st.columns(3)
-                
-                with pcol1:
-                    if st.button("👁️ Iris", use_container_width=True, 
-                                type="primary" if st.session_state.picking_mode == 'iris' else "secondary"):
+                # Sample the area around the click (radius scaled up too)
+                radius, shape = SAMPLING_AREAS[sampling_area]
+                with span("sampling"):
+                    color_data = sample_color(decoded.working, x, y, round(radius * scale), shape)
+            
+                if st.session_state.picking_mode == 'iris':
+                    st.session_state.iris_color = color_data
+                elif st.session_state.picking_mode == 'hair':
+                    st.session_state.hair_color = color_data
+                else:
+                    st.session_state.skin_color = color_data
+        
+            # Display sampled colors with REDO buttons
+            st.markdown("---")
+            st.write("**Your Sampled Colors:**")
+            scol1, scol2, scol3 = st.columns(3)
+        
+            with scol1:
+                st.markdown("**👁️ Iris**")
+                if st.session_state.iris_color:
+                    c = st.session_state.iris_color
+                    st.markdown(
+                        f'<div style="background-color: {c["hex"]}; '
+                        f'width: 80px; height: 80px; border-radius: 50%; '
+                        f'border: 3px solid #ddd; margin: 10px 0;"></div>',
+                        unsafe_allow_html=True
+                    )
+                    st.caption(f'{c["hex"]}')
+                    if st.button("🔄 Redo", key="redo_iris"):
+                        st.session_state.iris_color = None
                         st.session_state.picking_mode = 'iris'
-                        st.rerun()
-                with pcol2:
-                    if st.button("💇 Hair", use_container_width=True,
-                                type="primary" if st.session_state.picking_mode == 'hair' else "secondary"):
+                        rerun_section()
+                else:
+                    st.markdown(
+                        '<div style="background-color: #ddd; '
+                        'width: 80px; height: 80px; border-radius: 50%; '
+                        'border: 3px dashed #999; margin: 10px 0;"></div>',
+                        unsafe_allow_html=True
+                    )
+                    st.caption("Not sampled yet")
+        
+            with scol2:
+                st.markdown("**💇 Hair**")
+                if st.session_state.hair_color:
+                    c = st.session_state.hair_color
+                    st.markdown(
+                        f'<div style="background-color: {c["hex"]}; '
+                        f'width: 80px; height: 80px; border-radius: 50%; '
+                        f'border: 3px solid #ddd; margin: 10px 0;"></div>',
+                        unsafe_allow_html=True
+                    )
+                    st.caption(f'{c["hex"]}')
+                    if st.button("🔄 Redo", key="redo_hair"):
+                        st.session_state.hair_color = None
                         st.session_state.picking_mode = 'hair'
-                        st.rerun()
-                with pcol3:
-                    if st.button("✋ Skin", use_container_width=True,
-                                type="primary" if st.session_state.picking_mode == 'skin' else "secondary"):
+                        rerun_section()
+                else:
+                    st.markdown(
+                        '<div style="background-color: #ddd; '
+                        'width: 80px; height: 80px; border-radius: 50%; '
+                        'border: 3px dashed #999; margin: 10px 0;"></div>',
+                        unsafe_allow_html=True
+                    )
+                    st.caption("Not sampled yet")
+        
+            with scol3:
+                st.markdown("**✋ Skin**")
+                if st.session_state.skin_color:
+                    c = st.session_state.skin_color
+                    st.markdown(
+                        f'<div style="background-color: {c["hex"]}; '
+                        f'width: 80px; height: 80px; border-radius: 50%; '
+                        f'border: 3px solid #ddd; margin: 10px 0;"></div>',
+                        unsafe_allow_html=True
+                    )
+                    st.caption(f'{c["hex"]}')
+                    if st.button("🔄 Redo", key="redo_skin"):
+                        st.session_state.skin_color = None
                         st.session_state.picking_mode = 'skin'
-                        st.rerun()
-                
-                st.info(f"👆 Click on the image to sample your **{st.session_state.picking_mode}** color")
-                
-                # Resize image for better mobile experience (max 400px wide)
-                max_width = 400
-                if image.width > max_width:
-                    ratio = max_width / image.width
-                    new_height = int(image.height * ratio)
-                    display_image = image.resize((max_width, new_height))
+                        rerun_section()
                 else:
-                    display_image = image
+                    st.markdown(
+                        '<div style="background-color: #ddd; '
+                        'width: 80px; height: 80px; border-radius: 50%; '
+                        'border: 3px dashed #999; margin: 10px 0;"></div>',
+                        unsafe_allow_html=True
+                    )
+                    st.caption("Not sampled yet")
+        
+            # Check if all colors are now sampled
+            photo_complete = all([st.session_state.iris_color, st.session_state.hair_color, st.session_state.skin_color])
+        
+            if photo_complete:
+                # The results live outside this fragment: rerun the whole page once
+                st.rerun()
+
+
+@st.fragment
+def favorites_picker():
+    """Optional inspiration image and favorite colors (reruns on its own)."""
+    with fragment_span("favorites_picker"):
+        st.markdown("---")
+        st.subheader("🎨 Colors You're Drawn To (Optional)")
+        st.write("Upload any image with colors you love - a painting, outfit, nature photo, whatever calls to you.")
+    
+        fav_file = st.file_uploader("Upload an inspiration image", type=["jpg", "jpeg", "png"], key="fav_upload")
+        if not fav_file:
+            release_upload("fav_upload")
+    
+        if fav_file:
+            from photo import dominant_colors, sample_color
+            with span("image_decode"):
+                fav_decoded = get_decoded_upload(fav_file, "fav_upload")
+        
+            # Dominant colors, extracted once per image
+            extracted = st.session_state.setdefault('dominant_colors', {})
+            if fav_decoded.key not in extracted:
+                with span("dominant_colors"):
+                    extracted[fav_decoded.key] = dominant_colors(fav_decoded.array, n=DOMINANT_COLOR_COUNT)
+            swatches = extracted[fav_decoded.key]
+        
+            st.write("**Main colors in this image:**")
+            cols = st.columns(len(swatches))
+            for i, swatch in enumerate(swatches):
+                with cols[i]:
+                    st.markdown(
+                        f'<div style="background-color: {swatch["hex"]}; '
+                        f'width: 50px; height: 50px; border-radius: 8px; '
+                        f'border: 2px solid #ddd;"></div>',
+                        unsafe_allow_html=True
+                    )
+                    st.caption(f"{swatch['hex']} · {swatch['share']:.0%}")
+        
+            if st.button("➕ Add these to my colors"):
+                for swatch in swatches:
+                    if swatch['hex'] not in st.session_state.favorite_colors:
+                        st.session_state.favorite_colors.append(swatch['hex'])
+        
+            st.write("👆 Or click on specific colors you're drawn to (pick as many as you want)")
+        
+            fav_coords = clickable_image(fav_decoded.display, key=f"fav_{fav_file.name}")
+        
+            if fav_coords:
+                # Scale coordinates up to the working-resolution copy
+                scale = fav_decoded.display_scale
+                x = int(fav_coords["x"] * scale)
+                y = int(fav_coords["y"] * scale)
+            
+                hex_color = sample_color(fav_decoded.working, x, y)['hex']
+            
+                # Avoid duplicates
+                if hex_color not in st.session_state.favorite_colors:
+                    st.session_state.favorite_colors.append(hex_color)
+        
+            # Display picked colors
+            if st.session_state.favorite_colors:
+                st.write("**Your picked colors:**")
+            
+                # Display as swatches in a row
+                cols = st.columns(min(len(st.session_state.favorite_colors), 8))
+                for i, color in enumerate(st.session_state.favorite_colors[:8]):
+                    with cols[i]:
+                        st.markdown(
+                            f'<div style="background-color: {color}; '
+                            f'width: 50px; height: 50px; border-radius: 8px; '
+                            f'border: 2px solid #ddd;"></div>',
+                            unsafe_allow_html=True
+                        )
+                        st.caption(color)
+            
+                # Show overflow if more than 8
+                if len(st.session_state.favorite_colors) > 8:
+                    st.caption(f"...and {len(st.session_state.favorite_colors) - 8} more")
+            
+                if st.button("🗑️ Clear favorites"):
+                    st.session_state.favorite_colors = []
+                    rerun_section()
+
+
+
+@st.fragment
+def booking_form(traits, result, photo_result=None):
+    """Booking form; typing and submitting rerun only the form."""
+    with fragment_span("booking_form"):
+        season = result['season']
+        confidence_percent = result['confidence_percent']
+        runner = result['runner_up']
+        ranked = result['ranked']
+    
+        with st.form("booking_form", clear_on_submit=True):
+            st.markdown("**📅 Book Your Consultation**")
+        
+            name = st.text_input("Full Name*", placeholder="Jane Doe")
+            email = st.text_input("Email*", placeholder="jane@example.com")
+            phone = st.text_input("Phone", placeholder="(555) 123-4567")
+            notes = st.text_area(
+                "Anything we should know?", 
+                placeholder="Questions, concerns, or goals for your consultation",
+                height=100
+            )
+        
+            submitted = st.form_submit_button("Continue to Booking →", use_container_width=True)
+        
+            if submitted:
+                # Validation
+                if not name or not email:
+                    st.error("⚠️ Please fill in your name and email")
+                elif "@" not in email:
+                    st.error("⚠️ Please enter a valid email")
+                else:
+                    # Photo analysis result for storage (a cache hit: the
+                    # results above came from the same inputs)
+                    photo_analysis = photo_result or get_results(
+                        st.session_state.answers,
+                        st.session_state.iris_color,
+                        st.session_state.hair_color,
+                        st.session_state.skin_color
+                    )['photo_result']
                 
-                # Display image and get click coordinates
-                coords = streamlit_image_coordinates(display_image, key=f"photo_{uploaded_file.name}")
+                    # Store in session state with ALL data
+                    st.session_state.booking_info = {
+                        'name': name,
+                        'email': email,
+                        'phone': phone,
+                        'notes': notes,
+                        'season': season,
+                        'confidence': confidence_percent,
+                        'runner_up': runner,
+                        # Raw answers and scores, so bookings can be re-scored
+                        'answers': dict(st.session_state.answers),
+                        'traits': traits,
+                        'season_scores': dict(ranked),
+                        # Photo analysis results
+                        'photo_season': photo_analysis['season'],
+                        'undertone': photo_analysis['undertone'],
+                        'value': photo_analysis['value'],
+                        'chroma': photo_analysis['chroma'],
+                        # Raw color data
+                        'iris_color': st.session_state.iris_color,
+                        'hair_color': st.session_state.hair_color,
+                        'skin_color': st.session_state.skin_color,
+                        # Optional favorite colors
+                        'favorite_colors': st.session_state.favorite_colors
+                    }
+                
+                    # Store locally (Google Sheets export runs in the background)
+                    with span("booking_save"):
+                        success = save_booking(st.session_state.booking_info)
                 
-                if coords:
-                    # Scale coordinates back to original image size
-                    scale = image.width / display_image.width
-                    x = int(coords["x"] * scale)
-                    y = int(coords["y"] * scale)
+                    if success:
+                        st.success(f"✅ Thanks {name}! Your information has been saved.")
                     
-                    # Make sure we're within bounds
-                    x = min(x, image.width - 1)
-                    y = min(y, image.height - 1)
+                        # Build Calendly URL with pre-filled info
+                        calendly_base = "https://calendly.com/owlet358/60min"
+                        params = {
+                            'name': name,
+                            'email': email
+                        }
+                        if phone:
+                            params['a1'] = phone  # Custom field for phone
                     
-                    rgb = image.getpixel((x, y))
-                    if len(rgb) == 4:
-                        rgb = rgb[:3]
-                    r, g, b = rgb
-                    hex_color = f"#{r:02x}{g:02x}{b:02x}"
-                    h, s, v = colorsys.rgb_to_hsv(r/255, g/255, b/255)
+                        calendly_url = f"{calendly_base}?{urllib.parse.urlencode(params)}"
                     
-                    color_data = {
-                        'rgb': rgb,
-                        'hex': hex_color,
-                        'hsv': (int(h * 360), int(s * 100), int(v * 100))
-                    }
+                        # Show booking link
+                        st.info("📅 Click below to schedule your consultation!")
+                        st.link_button("Schedule Your Consultation →", calendly_url, use_container_width=True)
                     
-                    if st.session_state.picking_mode == 'iris':
-                        st.session_state.iris_color = color_data
-                    elif st.session_state.picking_mode == 'hair':
-                        st.session_state.hair_color = color_data
-                    else:
-                        st.session_state.skin_color = color_data
-                
-                # Display sampled colors with REDO buttons
-                st.markdown("---")
-                st.write("**Your Sampled Colors:**")
-                scol1, scol2, scol3 = st.columns(3)
-                
-                with scol1:
-                    st.markdown("**👁️ Iris**")
-                    if st.session_state.iris_color:
-                        c = st.session_state.iris_color
-                        st.markdown(
-                            f'<div style="background-color: {c["hex"]}; '
-                            f'width: 80px; height: 80px; border-radius: 50%; '
-                            f'border: 3px solid #ddd; margin: 10px 0;"></div>',
-                            unsafe_allow_html=True
-                        )
-                        st.caption(f'{c["hex"]}')
-                        if st.button("🔄 Redo", key="redo_iris"):
-                            st.session_state.iris_color = None
-                            st.session_state.picking_mode = 'iris'
-                            st.rerun()
-                    else:
-                        st.markdown(
-                            '<div style="background-color: #ddd; '
-                            'width: 80px; height: 80px; border-radius: 50%; '
-                            'border: 3px dashed #999; margin: 10px 0;"></div>',
-                            unsafe_allow_html=True
-                        )
-                        st.caption("Not sampled yet")
-                
-                with scol2:
-                    st.markdown("**💇 Hair**")
-                    if st.session_state.hair_color:
-                        c = st.session_state.hair_color
-                        st.markdown(
-                            f'<div style="background-color: {c["hex"]}; '
-                            f'width: 80px; height: 80px; border-radius: 50%; '
-                            f'border: 3px solid #ddd; margin: 10px 0;"></div>',
-                            unsafe_allow_html=True
-                        )
-                        st.caption(f'{c["hex"]}')
-                        if st.button("🔄 Redo", key="redo_hair"):
-                            st.session_state.hair_color = None
-                            st.session_state.picking_mode = 'hair'
-                            st.rerun()
-                    else:
-                        st.markdown(
-                            '<div style="background-color: #ddd; '
-                            'width: 80px; height: 80px; border-radius: 50%; '
-                            'border: 3px dashed #999; margin: 10px 0;"></div>',
-                            unsafe_allow_html=True
-                        )
-                        st.caption("Not sampled yet")
-                
-                with scol3:
-                    st.markdown("**✋ Skin**")
-                    if st.session_state.skin_color:
-                        c = st.session_state.skin_color
-                        st.markdown(
-                            f'<div style="background-color: {c["hex"]}; '
-                            f'width: 80px; height: 80px; border-radius: 50%; '
-                            f'border: 3px solid #ddd; margin: 10px 0;"></div>',
-                            unsafe_allow_html=True
-                        )
-                        st.caption(f'{c["hex"]}')
-                        if st.button("🔄 Redo", key="redo_skin"):
-                            st.session_state.skin_color = None
-                            st.session_state.picking_mode = 'skin'
-                            st.rerun()
+                        # Auto-redirect after 3 seconds
+                        st.markdown(f"""
+                        <meta http-equiv="refresh" content="3;url={calendly_url}">
+                        <p style="text-align: center; color: #666; font-size: 0.9em;">
+                        Redirecting to booking page in 3 seconds...
+                        </p>
+                        """, unsafe_allow_html=True)
                     else:
-                        st.markdown(
-                            '<div style="background-color: #ddd; '
-                            'width: 80px; height: 80px; border-radius: 50%; '
-                            'border: 3px dashed #999; margin: 10px 0;"></div>',
-                            unsafe_allow_html=True
-                        )
-                        st.caption("Not sampled yet")
-                
-                # Check if all colors are now sampled
-                photo_complete = all([st.session_state.iris_color, st.session_state.hair_color, st.session_state.skin_color])
-                
-                if photo_complete:
-                    st.success("✅ All colors sampled! Scroll down for your results.")
-        
-        # Show results only when BOTH quiz AND photo are complete
-        if photo_complete:
-            st.markdown("---")
-            st.success("✨ Quiz complete! Here are your results:")
-            
-            # Calculate from quiz
-            traits = calculate_traits(st.session_state.answers)
-            result = determine_season(traits)
-            
-            # Also run photo analysis
-            photo_result = analyze_seasonal(
-                st.session_state.iris_color,
-                st.session_state.hair_color,
-                st.session_state.skin_color
-            )
-            
-            # Display results (pass photo_result too)
-            display_results(traits, result, photo_result)
+                        st.warning("⚠️ There was an issue saving your data, but we've recorded your interest!")
 
 
-def display_results(traits, result, photo_result=None):
+
+def display_results(traits, result, photo_result=None, palette_match=None):
     """Display the season results in a beautiful format."""
     season = result['season']
     confidence_percent = result['confidence_percent']
@@ -766,6 +1002,19 @@ def display_results(traits, result, photo_result=None):
             st.markdown("**Photo suggests:**")
             st.write(f"🎨 **{photo_result['season']}**")
             st.caption(photo_result['season_reason'])
+            
+            # Second opinion: closest palettes by Lab color distance
+            if palette_match is None:
+                from photo import nearest_seasons
+                palette_match = nearest_seasons(
+                    st.session_state.iris_color,
+                    st.session_state.hair_color,
+                    st.session_state.skin_color
+                )
+            closest = ", ".join(
+                f"{season_label(s)} (ΔE {d:.0f})" for s, d in palette_match['ranked'][:3]
+            )
+            st.caption(f"Closest palettes by color distance: {closest}")
         
         # Compare quiz vs photo results
         if photo_result['season'].lower() != season.lower() and photo_result['season'] not in ["Needs draping", "Could be any season"]:
@@ -839,90 +1088,39 @@ def display_results(traits, result, photo_result=None):
     # Color palette
     st.subheader("🎨 Your Recommended Colors")
     
-    if season in palettes:
-        user_palette = palettes[season]
+    registry = load_palette_registry()
+    if season in registry:
+        with span("palette_render"):
+            # Create color grid
+            colors = registry.colors(season)
         
-        # Create color grid
-        colors = list(user_palette.items())
-        
-        # Display in rows of 5
-        for i in range(0, len(colors), 5):
-            cols = st.columns(5)
-            for j, col in enumerate(cols):
-                if i + j < len(colors):
-                    color_name, hex_code = colors[i + j]
-                    with col:
-                        st.markdown(
-                            f'<div style="background-color: {hex_code}; '
-                            f'height: 60px; border-radius: 8px; margin-bottom: 5px; '
-                            f'border: 2px solid #ddd;"></div>',
-                            unsafe_allow_html=True
-                        )
-                        st.caption(f"**{color_name.title()}**")
-                        st.caption(f"`{hex_code}`")
+            # Display in rows of 5
+            for i in range(0, len(colors), 5):
+                cols = st.columns(5)
+                for j, col in enumerate(cols):
+                    if i + j < len(colors):
+                        color_name, hex_code = colors[i + j]
+                        with col:
+                            st.markdown(
+                                f'<div style="background-color: {hex_code}; '
+                                f'height: 60px; border-radius: 8px; margin-bottom: 5px; '
+                                f'border: 2px solid #ddd;"></div>',
+                                unsafe_allow_html=True
+                            )
+                            st.caption(f"**{color_name}**")
+                            st.caption(f"`{hex_code}`")
         
         # Downloadable palette
         st.markdown("---")
-        palette_text = "\n".join([f"{name.title()}: {hex_code}" for name, hex_code in user_palette.items()])
         st.download_button(
             label="💾 Download Your Palette",
-            data=palette_text,
+            data=registry.palette_text(season),
             file_name=f"{season}_palette.txt",
             mime="text/plain"
         )
     
     # ===== COLORS YOU'RE DRAWN TO (Optional) =====
-    st.markdown("---")
-    st.subheader("🎨 Colors You're Drawn To (Optional)")
-    st.write("Upload any image with colors you love - a painting, outfit, nature photo, whatever calls to you.")
-    
-    fav_file = st.file_uploader("Upload an inspiration image", type=["jpg", "jpeg", "png"], key="fav_upload")
-    
-    if fav_file:
-        fav_image = Image.open(fav_file)
-        
-        st.write("👆 Click on colors you're drawn to (pick as many as you want)")
-        
-        fav_coords = streamlit_image_coordinates(fav_image, key=f"fav_{fav_file.name}")
-        
-        if fav_coords:
-            x = fav_coords["x"]
-            y = fav_coords["y"]
-            
-            rgb = fav_image.getpixel((x, y))
-            if len(rgb) == 4:
-                rgb = rgb[:3]
-            
-            r, g, b = rgb
-            hex_color = f"#{r:02x}{g:02x}{b:02x}"
-            
-            # Avoid duplicates
-            if hex_color not in st.session_state.favorite_colors:
-                st.session_state.favorite_colors.append(hex_color)
-        
-        # Display picked colors
-        if st.session_state.favorite_colors:
-            st.write("**Your picked colors:**")
-            
-            # Display as swatches in a row
-            cols = st.columns(min(len(st.session_state.favorite_colors), 8))
-            for i, color in enumerate(st.session_state.favorite_colors[:8]):
-                with cols[i]:
-                    st.markdown(
-                        f'<div style="background-color: {color}; '
-                        f'width: 50px; height: 50px; border-radius: 8px; '
-                        f'border: 2px solid #ddd;"></div>',
-                        unsafe_allow_html=True
-                    )
-                    st.caption(color)
-            
-            # Show overflow if more than 8
-            if len(st.session_state.favorite_colors) > 8:
-                st.caption(f"...and {len(st.session_state.favorite_colors) - 8} more")
-            
-            if st.button("🗑️ Clear favorites"):
-                st.session_state.favorite_colors = []
-                st.rerun()
+    favorites_picker()
 
     # CTA
     st.markdown("---")
@@ -932,90 +1130,12 @@ def display_results(traits, result, photo_result=None):
     
     with col1:
         # Booking form
-        with st.form("booking_form", clear_on_submit=True):
-            st.markdown("**📅 Book Your Consultation**")
-            
-            name = st.text_input("Full Name*", placeholder="Jane Doe")
-            email = st.text_input("Email*", placeholder="jane@example.com")
-            phone = st.text_input("Phone", placeholder="(555) 123-4567")
-            notes = st.text_area(
-                "Anything we should know?", 
-                placeholder="Questions, concerns, or goals for your consultation",
-                height=100
-            )
-            
-            submitted = st.form_submit_button("Continue to Booking →", use_container_width=True)
-            
-            if submitted:
-                # Validation
-                if not name or not email:
-                    st.error("⚠️ Please fill in your name and email")
-                elif "@" not in email:
-                    st.error("⚠️ Please enter a valid email")
-                else:
-                    # Get photo analysis result for storage
-                    photo_analysis = analyze_seasonal(
-                        st.session_state.iris_color,
-                        st.session_state.hair_color,
-                        st.session_state.skin_color
-                    )
-                    
-                    # Store in session state with ALL data
-                    st.session_state.booking_info = {
-                        'name': name,
-                        'email': email,
-                        'phone': phone,
-                        'notes': notes,
-                        'season': season,
-                        'confidence': confidence_percent,
-                        # Photo analysis results
-                        'photo_season': photo_analysis['season'],
-                        'undertone': photo_analysis['undertone'],
-                        'value': photo_analysis['value'],
-                        'chroma': photo_analysis['chroma'],
-                        # Raw color data
-                        'iris_color': st.session_state.iris_color,
-                        'hair_color': st.session_state.hair_color,
-                        'skin_color': st.session_state.skin_color,
-                        # Optional favorite colors
-                        'favorite_colors': st.session_state.favorite_colors
-                    }
-                    
-                    # Save to Google Sheets
-                    with st.spinner("Saving your information..."):
-                        success = save_to_google_sheets(st.session_state.booking_info)
-                    
-                    if success:
-                        st.success(f"✅ Thanks {name}! Your information has been saved.")
-                        
-                        # Build Calendly URL with pre-filled info
-                        calendly_base = "https://calendly.com/owlet358/60min"
-                        params = {
-                            'name': name,
-                            'email': email
-                        }
-                        if phone:
-                            params['a1'] = phone  # Custom field for phone
-                        
-                        calendly_url = f"{calendly_base}?{urllib.parse.urlencode(params)}"
-                        
-                        # Show booking link
-                        st.info("📅 Click below to schedule your consultation!")
-                        st.link_button("Schedule Your Consultation →", calendly_url, use_container_width=True)
-                        
-                        # Auto-redirect after 3 seconds
-                        st.markdown(f"""
-                        <meta http-equiv="refresh" content="3;url={calendly_url}">
-                        <p style="text-align: center; color: #666; font-size: 0.9em;">
-                        Redirecting to booking page in 3 seconds...
-                        </p>
-                        """, unsafe_allow_html=True)
-                    else:
-                        st.warning("⚠️ There was an issue saving your data, but we've recorded your interest!")
+        booking_form(traits, result, photo_result)
     
     with col2:
         if st.button("🔄 Retake Quiz", use_container_width=True):
             st.session_state.answers = {}
+            release_session_images()
             st.session_state.iris_color = None
             st.session_state.hair_color = None
             st.session_state.skin_color = None
@@ -1025,4 +1145,7 @@ def display_results(traits, result, photo_result=None):
 
 
 if __name__ == "__main__":
-    main()
+    start_metrics_export()
+    with span("rerun"):
+        main()
+    maybe_write_file()
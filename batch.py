@@ -0,0 +1,174 @@
+# RFG Palette System - Batch Scoring
+# Vectorized versions of engine.calculate_traits() / engine.determine_season()
+# for scoring many submissions at once (answer table build, re-scoring,
+# recipe tuning).
+#
+# Usage:  from batch import score_batch
+#         result = score_batch({'eye_color': [...], 'hair_color': [...], ...})
+#
+# Kept out of engine.py so the app and the scoring service, which only score
+# one client at a time, don't pay for importing numpy. The batch functions
+# share engine's compiled rule tables and do every float operation in the
+# same order as the scalar code, so results are identical.
+
+import numpy as np
+
+from engine import (
+    QUESTION_KEYS,
+    TRAIT_KEYS,
+    compile_recipes,
+    compile_trait_rules,
+    recipe_weights,
+)
+
+
+def compile_trait_arrays(tables):
+    """
+    Turn engine.compile_trait_rules() tables into arrays for the batch path.
+
+    Returns:
+        list of (question, {answer: row_index}, uint64 packed rows) with the
+        "*" fallback as the last row
+    """
+    return [
+        (question, {a: i for i, a in enumerate(packed_rows)},
+         np.array([*packed_rows.values(), fallback], dtype="<u8"))
+        for question, packed_rows, fallback in tables['packed']
+    ]
+
+
+_TRAIT_TABLES = compile_trait_rules()
+_TRAIT_ARRAYS = compile_trait_arrays(_TRAIT_TABLES)
+_RECIPE_ROWS = recipe_weights(*compile_recipes())
+
+
+def _answer_column(columns, key, n):
+    """Fetch one answer column as an array (missing column = all None)."""
+    values = columns.get(key)
+    if values is None:
+        return np.full(n, None, dtype=object)
+    values = np.asarray(values)
+    if values.shape != (n,):
+        raise ValueError(f"Answer column '{key}' has shape {values.shape}, expected ({n},)")
+    return values
+
+
+def _option_rows(values, option_index):
+    """Map an answer column to rows of a compiled rule table (fallback = last row)."""
+    rows = np.full(len(values), len(option_index), dtype=np.intp)
+    for option, i in option_index.items():
+        rows[values == option] = i
+    return rows
+
+
+def calculate_traits_batch(columns):
+    """
+    Vectorized calculate_traits() over a columnar set of answers.
+
+    Args:
+        columns: dict mapping each key in QUESTION_KEYS to a sequence of
+            answers (one entry per client, all the same length)
+
+    Returns:
+        int64 array of shape (n_clients, len(TRAIT_KEYS)), columns in TRAIT_KEYS order
+    """
+    lengths = {len(columns[k]) for k in QUESTION_KEYS if columns.get(k) is not None}
+    if len(lengths) > 1:
+        raise ValueError("All answer columns must have the same length")
+    n = lengths.pop() if lengths else 0
+
+    # Add up packed rows, then unpack one byte per trait
+    packed = np.zeros(n, dtype="<u8")
+    for question, option_index, packed_rows in _TRAIT_ARRAYS:
+        packed += packed_rows[_option_rows(_answer_column(columns, question, n), option_index)]
+
+    for required, packed_row in _TRAIT_TABLES['combos']:
+        matched = np.ones(n, dtype=bool)
+        for question, allowed in required:
+            matched &= np.isin(_answer_column(columns, question, n), allowed)
+        packed[matched] += np.uint64(packed_row)
+
+    traits = packed.view(np.uint8).reshape(n, 8)[:, :len(TRAIT_KEYS)].astype(np.int64)
+
+    return traits
+
+
+def determine_season_batch(traits, recipes=None):
+    """
+    Vectorized determine_season() over a traits matrix.
+
+    Args:
+        traits: int array of shape (n_clients, len(TRAIT_KEYS)) from calculate_traits_batch()
+        recipes: season recipe dict to score with (defaults to SEASON_RECIPES)
+
+    Returns:
+        dict with keys:
+            - 'seasons': tuple of season names (column order of 'season_scores')
+            - 'season_scores': float array (n_clients, n_seasons)
+            - 'winner' / 'runner_up': int arrays indexing into 'seasons'
+            - 'winner_score' / 'runner_score': float arrays
+            - 'confidence_percent': int array 0-100
+    """
+    recipe_rows = _RECIPE_ROWS if recipes is None else recipe_weights(*compile_recipes(recipes))
+    seasons = tuple(season for season, _ in recipe_rows)
+    trait_columns = np.ascontiguousarray(np.asarray(traits).T, dtype=np.float64)
+    n = trait_columns.shape[1]
+
+    # Score each season: traits x recipe matrix, skipping zero weights and
+    # summing in TRAIT_KEYS order exactly like the scalar path
+    scores = np.zeros((len(seasons), n))
+    for j, (_, weights) in enumerate(recipe_rows):
+        for i, w in weights:
+            scores[j] += trait_columns[i] * w
+    scores = scores.T
+
+    # Partial selection of winner + runner up (argmax keeps the first of any
+    # tie, like the stable sort)
+    rows = np.arange(n)
+    winner = np.argmax(scores, axis=1) if n else np.zeros(0, dtype=np.intp)
+    masked = scores.copy()
+    masked[rows, winner] = -np.inf
+    runner = np.argmax(masked, axis=1) if n else np.zeros(0, dtype=np.intp)
+    winner_score = scores[rows, winner]
+    runner_score = scores[rows, runner]
+
+    # Calculate confidence (sequential sum so the average matches sum() exactly)
+    total = np.zeros(n)
+    for j in range(scores.shape[1]):
+        total += scores[:, j]
+    average_score = total / scores.shape[1]
+    raw_lead = winner_score - average_score
+    gap = winner_score - runner_score
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accuracy_calc = ((raw_lead + gap) / winner_score) * 100
+    confidence_percent = np.where(
+        winner_score > 0, np.rint(np.clip(accuracy_calc, 0, 100)), 0
+    ).astype(np.int64)
+
+    return {
+        'seasons': seasons,
+        'season_scores': scores,
+        'winner': winner,
+        'runner_up': runner,
+        'winner_score': winner_score,
+        'runner_score': runner_score,
+        'confidence_percent': confidence_percent,
+    }
+
+
+def score_batch(columns, recipes=None):
+    """
+    Score many quiz submissions in one pass.
+
+    Args:
+        columns: dict mapping each key in QUESTION_KEYS to a sequence of answers
+        recipes: season recipe dict to score with (defaults to SEASON_RECIPES)
+
+    Returns:
+        determine_season_batch() result plus 'traits' (the traits matrix)
+    """
+    traits = calculate_traits_batch(columns)
+    result = determine_season_batch(traits, recipes)
+    result['traits'] = traits
+    return result
@@ -0,0 +1,387 @@
+# RFG Palette System - Benchmarks
+# Times the engine and photo classifier hot paths and gates regressions.
+#
+# Usage:  python bench.py --save           # record bench_baseline.json
+#         python bench.py                  # compare against it; exit 1 on a regression
+#         python bench.py --exhaustive     # also run every answer combination
+#
+#         python bench.py --imports          # app.py cold-import budget report
+#
+# Each case calls one function over a fixed input set and records ops/sec,
+# p50/p99 latency (per call) and the median peak memory a call allocates.
+# A case regresses when its p50 is more than --threshold slower than the
+# baseline's.
+#
+# --imports imports app.py in fresh interpreters under -X importtime and
+# fails if the import takes longer than --import-budget or pulls in a
+# subsystem that should only load on first use (DEFERRED_IMPORTS).
+
+import argparse
+import colorsys
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from engine import (
+    QUESTION_KEYS,
+    QUESTION_OPTIONS,
+    calculate_traits,
+    determine_season,
+    trait_summary,
+    detect_tensions,
+    irl_tests_for,
+    IncrementalScore,
+)
+from photo import analyze_seasonal, nearest_seasons
+from service import handle_request
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE_PATH = os.path.join(REPO_DIR, "bench_baseline.json")
+
+# Inputs in each randomized set (fixed seed, so runs are comparable)
+RANDOM_SET_SIZE = 20000
+# Share of randomized answer sets with one question left unanswered
+MISSING_RATE = 0.02
+# Calls traced for the allocation measurement (tracing is slow)
+ALLOC_SAMPLE = 500
+WARMUP_CALLS = 200
+# Allowed p50 slowdown against the baseline before the run fails
+DEFAULT_THRESHOLD = 0.20
+
+# Cold import of app.py allowed before --imports fails (cumulative, ms)
+IMPORT_BUDGET_MS = 800
+# Fresh interpreters per import measurement (the median is reported)
+IMPORT_RUNS = 5
+# Modules app.py loads on first use, never at startup
+DEFERRED_IMPORTS = ('PIL', 'streamlit_image_coordinates', 'image_pipeline',
+                    'gspread', 'google.auth', 'sheets_client', 'sheets_writer', 'pyarrow',
+                    'numpy', 'photo', 'palette_registry', 'lookup')
+
+
+# ----- Input sets -----
+
+def random_answers(n=RANDOM_SET_SIZE, seed=0):
+    rng = random.Random(seed)
+    sets = []
+    for _ in range(n):
+        answers = {q: rng.choice(QUESTION_OPTIONS[q]) for q in QUESTION_KEYS}
+        if rng.random() < MISSING_RATE:
+            del answers[rng.choice(QUESTION_KEYS)]
+        sets.append(answers)
+    return sets
+
+
+def exhaustive_answers():
+    """Every combination of answers (lazily; about 2.3 million)."""
+    for combo in itertools.product(*(QUESTION_OPTIONS[q] for q in QUESTION_KEYS)):
+        yield dict(zip(QUESTION_KEYS, combo))
+
+
+def exhaustive_traits():
+    """Every distinct trait dict the quiz can produce."""
+    seen = {}
+    for answers in exhaustive_answers():
+        traits = calculate_traits(answers)
+        seen.setdefault(tuple(traits.values()), traits)
+    return list(seen.values())
+
+
+def random_colors(n=RANDOM_SET_SIZE // 4, seed=0):
+    """(iris, hair, skin) sampled-color dicts with random RGB."""
+    rng = random.Random(seed)
+
+    def color():
+        r, g, b = (rng.randrange(256) for _ in range(3))
+        h, s, v = colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
+        return {'rgb': (r, g, b), 'hex': f"#{r:02x}{g:02x}{b:02x}",
+                'hsv': (int(h * 360), int(s * 100), int(v * 100))}
+
+    return [(color(), color(), color()) for _ in range(n)]
+
+
+# ----- Measurement -----
+
+def measure(func, inputs):
+    """
+    Time func(*args) for every args tuple in inputs.
+
+    Returns:
+        dict with 'calls', 'ops_per_sec', 'p50_us', 'p99_us', 'alloc_bytes'
+    """
+    # Inputs may be a generator too large to hold (the exhaustive answer
+    # set), so only the first few are kept for warmup and allocation tracing
+    inputs = iter(inputs)
+    head = list(itertools.islice(inputs, max(WARMUP_CALLS, ALLOC_SAMPLE)))
+    for args in head[:WARMUP_CALLS]:
+        func(*args)
+
+    clock = time.perf_counter_ns
+    latencies = []
+    record = latencies.append
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for args in itertools.chain(head, inputs):
+            start = clock()
+            func(*args)
+            record(clock() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    peaks = []
+    try:
+        for args in head[:ALLOC_SAMPLE]:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            func(*args)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        'calls': len(latencies),
+        'ops_per_sec': round(len(latencies) / (total / 1e9), 1) if total else 0.0,
+        'p50_us': round(latencies[len(latencies) // 2] / 1e3, 3),
+        'p99_us': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] / 1e3, 3),
+        'alloc_bytes': int(statistics.median(peaks)) if peaks else 0,
+    }
+
+
+def _service_score(body):
+    return handle_request("POST", "/score", body)
+
+
+def benchmark_cases(exhaustive=False):
+    """
+    Yield (case name, function, input args) for every benchmark.
+
+    The exhaustive sets are only built when asked for.
+    """
+    answers = random_answers()
+    traits = [calculate_traits(a) for a in answers]
+    results = [determine_season(t) for t in traits]
+    colors = random_colors()
+
+    yield "calculate_traits/random", calculate_traits, [(a,) for a in answers]
+    yield "determine_season/random", determine_season, [(t,) for t in traits]
+    yield "trait_summary/random", trait_summary, [(t,) for t in traits]
+    yield "detect_tensions/random", detect_tensions, [(t,) for t in traits]
+    yield "irl_tests_for/random", irl_tests_for, [
+        (r['season'], r['runner_up'], t) for r, t in zip(results, traits)]
+    # One answer applied to a running quiz score, then its provisional status
+    quiz_score = IncrementalScore()
+    steps = [(q, a[q]) for a in answers for q in QUESTION_KEYS if q in a]
+    yield "incremental/answer", quiz_score.answer, steps
+    yield "incremental/status", quiz_score.status, [()] * len(answers)
+    yield "analyze_seasonal/random", analyze_seasonal, colors
+    yield "nearest_seasons/random", nearest_seasons, colors
+    # The scoring service's per-request work (parse, validate, score, encode)
+    yield "service/score", _service_score, [(json.dumps({'answers': a}).encode(),) for a in answers]
+
+    if exhaustive:
+        yield "calculate_traits/exhaustive", calculate_traits, ((a,) for a in exhaustive_answers())
+        all_traits = exhaustive_traits()
+        all_results = [determine_season(t) for t in all_traits]
+        yield "determine_season/exhaustive", determine_season, [(t,) for t in all_traits]
+        yield "trait_summary/exhaustive", trait_summary, [(t,) for t in all_traits]
+        yield "detect_tensions/exhaustive", detect_tensions, [(t,) for t in all_traits]
+        yield "irl_tests_for/exhaustive", irl_tests_for, [
+            (r['season'], r['runner_up'], t) for r, t in zip(all_results, all_traits)]
+
+
+def run(exhaustive=False, only=None, log=print):
+    """Run the suite. Returns {case name: measurement}."""
+    results = {}
+    for name, func, inputs in benchmark_cases(exhaustive):
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results[name] = measure(func, inputs)
+        r = results[name]
+        log(f"{name:<30} {r['ops_per_sec']:>12,.0f} ops/s   p50 {r['p50_us']:>8.2f} us   "
+            f"p99 {r['p99_us']:>8.2f} us   {r['alloc_bytes']:>7,} B/call")
+    return results
+
+
+# ----- Import time -----
+
+def _parse_importtime(stderr):
+    """-X importtime output -> list of (module, depth, self us, cumulative us)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the column header
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_times(module="app", runs=IMPORT_RUNS):
+    """
+    Import a module in fresh interpreters under -X importtime.
+
+    One unmeasured run goes first, so bytecode caches are warm (as on a
+    deployed container).
+
+    Returns:
+        dict with 'total_ms' (median cumulative import time), 'direct'
+        (list of (module, median cumulative ms) for what the module imports
+        first, slowest first) and 'loaded' (every module imported)
+    """
+    command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    runs_rows = []
+    for i in range(runs + 1):
+        proc = subprocess.run(command, cwd=REPO_DIR, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+        if i:
+            runs_rows.append(_parse_importtime(proc.stderr))
+
+    # A module's own imports are listed one level deeper, just before it
+    totals, direct = [], {}
+    for rows in runs_rows:
+        children = []
+        for name, depth, _, cumulative_us in rows:
+            if depth == 1:
+                children.append((name, cumulative_us))
+            elif depth == 0:
+                if name == module:
+                    totals.append(cumulative_us)
+                    for child, child_us in children:
+                        direct.setdefault(child, []).append(child_us)
+                children = []
+    direct = sorted(((name, round(statistics.median(v) / 1e3, 1)) for name, v in direct.items()),
+                    key=lambda item: -item[1])
+    return {
+        'total_ms': round(statistics.median(totals) / 1e3, 1),
+        'direct': direct,
+        'loaded': sorted({name for name, _, _, _ in runs_rows[0]}),
+    }
+
+
+def check_imports(times, budget_ms=IMPORT_BUDGET_MS):
+    """Problems with an import_times() result: over budget, or deferred modules loaded."""
+    problems = []
+    if times['total_ms'] > budget_ms:
+        problems.append(f"import took {times['total_ms']:.0f} ms (budget {budget_ms:.0f} ms)")
+    loaded = set(times['loaded'])
+    for name in DEFERRED_IMPORTS:
+        if name in loaded:
+            problems.append(f"{name} is imported at startup (it should load on first use)")
+    return problems
+
+
+def format_imports(times, budget_ms=IMPORT_BUDGET_MS, top=12):
+    lines = [f"Cold import of app.py: {times['total_ms']:.0f} ms (budget {budget_ms:.0f} ms, "
+             f"median of {IMPORT_RUNS} runs)", "", "Slowest direct imports:"]
+    for name, ms in times['direct'][:top]:
+        lines.append(f"  {name:<32} {ms:>8.1f} ms")
+    return "\n".join(lines)
+
+
+# ----- Baselines -----
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'system': platform.system(),
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Cases whose p50 latency regressed past the threshold.
+
+    Returns:
+        list of (case name, baseline p50, current p50, relative change)
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before or not before['p50_us']:
+            continue
+        change = current['p50_us'] / before['p50_us'] - 1
+        if change > threshold:
+            regressions.append((name, before['p50_us'], current['p50_us'], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine and photo classifier.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--exhaustive", action="store_true", help="also run every answer combination")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed p50 slowdown, as a fraction (default: 0.20)")
+    parser.add_argument("--only", nargs="*", help="run only cases whose name contains one of these")
+    parser.add_argument("--out", help="also write this run's results as JSON here")
+    parser.add_argument("--imports", action="store_true",
+                        help="report app.py cold-import time instead; exit 1 over budget")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_MS,
+                        help=f"cold-import budget in ms (default: {IMPORT_BUDGET_MS})")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        times = import_times()
+        print(format_imports(times, args.import_budget))
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({'environment': environment(), 'imports': times}, f, indent=2)
+        problems = check_imports(times, args.import_budget)
+        if problems:
+            print("\nImport budget exceeded:")
+            for problem in problems:
+                print(f"  {problem}")
+            return 1
+        print("\nWithin the import budget; deferred subsystems stay unloaded")
+        return 0
+
+    results = run(args.exhaustive, args.only)
+    report = {'environment': environment(), 'results': results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"\nNo baseline at {args.baseline} - record one with: python bench.py --save")
+        return 0
+
+    if baseline.get('environment') != report['environment']:
+        print("\nNote: baseline was recorded on a different environment:", baseline.get('environment'))
+    regressions = compare(results, baseline, args.threshold)
+    if not regressions:
+        print(f"\nNo regressions beyond {args.threshold:.0%} of the baseline p50")
+        return 0
+    print(f"\nRegressions (p50 more than {args.threshold:.0%} slower than baseline):")
+    for name, before, now, change in regressions:
+        print(f"  {name:<30} {before:>8.2f} us -> {now:>8.2f} us  ({change:+.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,11 @@
 # RFG Palette System - Scoring Engine
 # This module handles all the season determination logic
+#
+# Pure Python on purpose: the app and the scoring service import it for
+# one-client-at-a-time scoring, and numpy would add ~100 ms to their cold
+# start. Vectorized scoring lives in batch.py.
+
+from metrics import span
 
 
 # IMPROVED RECIPES - Gets 10/12 passing
@@ -26,171 +32,253 @@ SEASON_RECIPES = {
 }
 
 
-def calculate_traits(answers):
-    """
-    Takes a dict of user answers and returns a dict of trait scores.
-    
-    Args:
-        answers: dict with keys like 'eye_color', 'hair_color', 'skin_tone', etc.
-    
-    Returns:
-        dict of trait scores like {'cool': 12, 'warm': 5, 'soft': 8, ...}
-    """
-    # Initialize trait buckets
-    traits = {
-        "cool": 0,
-        "warm": 0,
-        "soft": 0,
-        "bright": 0,
-        "contrast_high": 0,
-        "contrast_low": 0,
-        "light": 0,
-        "deep": 0,
-    }
-    
-    # Constants
-    PRIMARY = 2  # Multiplier for primary traits
-    cool_vein_colors = ["blue", "purple", "lavender", "violet"]
-    warm_vein_colors = ["green", "blue-green", "teal"]
-    
-    # Extract answers
-    skin_tone = answers.get("skin_tone")
-    jewelry = answers.get("jewelry")
-    veins = answers.get("veins")
-    eyes = answers.get("eyes")
-    contrast = answers.get("contrast")
-    hair_color = answers.get("hair_color")
-    eye_color = answers.get("eye_color")
-    black_test = answers.get("black_test")
-    white_test = answers.get("white_test")
-    wrong_metal = answers.get("wrong_metal")
-    worst_color = answers.get("worst_color")
-    best_comp = answers.get("best_comp")
-    
+# Quiz question keys, in the order the questionnaire asks them
+QUESTION_KEYS = (
+    'eye_color', 'hair_color', 'skin_tone', 'jewelry', 'veins', 'eyes',
+    'contrast', 'black_test', 'white_test', 'wrong_metal', 'worst_color', 'best_comp'
+)
+
+# Answer options offered for each question (the full answer space)
+QUESTION_OPTIONS = {
+    'eye_color': ("blue", "green", "brown", "hazel"),
+    'hair_color': ("blonde", "light brown", "dark brown", "black", "red"),
+    'skin_tone': ("warm", "cool", "neutral"),
+    'jewelry': ("gold", "silver", "both"),
+    'veins': ("blue", "green", "blue-green", "purple"),
+    'eyes': ("bright", "soft"),
+    'contrast': ("high", "low"),
+    'black_test': ("yes", "softened", "no"),
+    'white_test': ("optic", "soft", "cream"),
+    'wrong_metal': ("gold_sallow", "silver_gray", "no_diff"),
+    'worst_color': ("mustard", "camel", "icypink", "black", "hotpink"),
+    'best_comp': ("dusty_rose", "coral", "cobalt", "rust", "icy_lavender", "chartreuse"),
+}
+
+# Canonical trait order (matches the buckets built by calculate_traits)
+TRAIT_KEYS = (
+    "cool", "warm", "soft", "bright",
+    "contrast_high", "contrast_low", "light", "deep",
+)
+
+PRIMARY = 2  # Multiplier for primary traits
+
+# Trait rules: question -> answer -> points added to each trait.
+# "*" applies to any other answer (including an unanswered question).
+TRAIT_RULES = {
     # 1. Skin Tone (Primary) - Multiplied
-    if skin_tone == "cool":
-        traits["cool"] += (2 * PRIMARY)
-    elif skin_tone == "warm":
-        traits["warm"] += (2 * PRIMARY)
-    else:  # neutral
-        traits["cool"] += (1 * PRIMARY)
-        traits["warm"] += (1 * PRIMARY)
-    
+    "skin_tone": {
+        "cool": {"cool": 2 * PRIMARY},
+        "warm": {"warm": 2 * PRIMARY},
+        "*":    {"cool": 1 * PRIMARY, "warm": 1 * PRIMARY},  # neutral
+    },
     # 2. Jewelry (Secondary) - Standard
-    if jewelry == "silver":
-        traits["cool"] += 1
-    elif jewelry == "gold":
-        traits["warm"] += 1
-    else:  # both
-        traits["cool"] += 1
-        traits["warm"] += 1
-    
+    "jewelry": {
+        "silver": {"cool": 1},
+        "gold":   {"warm": 1},
+        "*":      {"cool": 1, "warm": 1},  # both
+    },
     # 3. Veins (Secondary) - Standard
-    if veins in cool_vein_colors:
-        traits["cool"] += 2
-    elif veins in warm_vein_colors:
-        traits["warm"] += 2
-    
+    "veins": {
+        "blue":       {"cool": 2},
+        "purple":     {"cool": 2},
+        "lavender":   {"cool": 2},
+        "violet":     {"cool": 2},
+        "green":      {"warm": 2},
+        "blue-green": {"warm": 2},
+        "teal":       {"warm": 2},
+    },
     # 4. Eye Quality (Primary) - Multiplied
-    if eyes == "soft":
-        traits["soft"] += (2 * PRIMARY)
-    else:
-        traits["bright"] += (2 * PRIMARY)
-    
+    "eyes": {
+        "soft": {"soft": 2 * PRIMARY},
+        "*":    {"bright": 2 * PRIMARY},
+    },
     # 5. Contrast (Secondary) - Standard
-    if contrast == "high":
-        traits["contrast_high"] += 2
-        traits["deep"] += 1
-    else:
-        traits["contrast_low"] += 2
-        traits["soft"] += 1
-    
+    "contrast": {
+        "high": {"contrast_high": 2, "deep": 1},
+        "*":    {"contrast_low": 2, "soft": 1},
+    },
     # 6. Hair Depth (Primary) - Multiplied
-    if hair_color in ["black", "dark brown"]:
-        traits["deep"] += (2 * PRIMARY)
-    elif hair_color == "blonde":
-        traits["light"] += (2 * PRIMARY)
-    elif hair_color == "red":
-        traits["warm"] += (2 * PRIMARY)
-    
+    "hair_color": {
+        "black":      {"deep": 2 * PRIMARY},
+        "dark brown": {"deep": 2 * PRIMARY},
+        "blonde":     {"light": 2 * PRIMARY},
+        "red":        {"warm": 2 * PRIMARY},
+    },
     # 7. Eye Color (Primary) - Multiplied
-    if eye_color in ["blue", "green"]:
-        traits["cool"] += (1 * PRIMARY)
-        traits["bright"] += 1
-    elif eye_color == "brown":
-        traits["deep"] += 1
-        if hair_color in ["black", "dark brown"]:
-            traits["warm"] += 1  # Dark hair + brown eyes often warm
-    elif eye_color == "hazel":
-        traits["warm"] += (1 * PRIMARY)
-        traits["soft"] += 1
-    
+    "eye_color": {
+        "blue":  {"cool": 1 * PRIMARY, "bright": 1},
+        "green": {"cool": 1 * PRIMARY, "bright": 1},
+        "brown": {"deep": 1},
+        "hazel": {"warm": 1 * PRIMARY, "soft": 1},
+    },
     # 8. Black Test (High Signal for Contrast/Depth)
-    if black_test == "yes":
-        traits["contrast_high"] += (2 * PRIMARY)
-        traits["deep"] += 1
-    elif black_test == "softened":
-        traits["contrast_high"] += 1
-        traits["soft"] += 1
-    else:  # no
-        traits["contrast_low"] += (2 * PRIMARY)
-        traits["soft"] += 1
-    
+    "black_test": {
+        "yes":      {"contrast_high": 2 * PRIMARY, "deep": 1},
+        "softened": {"contrast_high": 1, "soft": 1},
+        "*":        {"contrast_low": 2 * PRIMARY, "soft": 1},  # no
+    },
     # 9. White Test (Moderate Signal)
-    if white_test == "optic":
-        traits["cool"] += 1
-        traits["bright"] += 1
-    elif white_test == "soft":
-        traits["cool"] += 1
-        traits["soft"] += 1
-    else:  # cream
-        traits["warm"] += 1
-        traits["soft"] += 1
-    
+    "white_test": {
+        "optic": {"cool": 1, "bright": 1},
+        "soft":  {"cool": 1, "soft": 1},
+        "*":     {"warm": 1, "soft": 1},  # cream
+    },
     # 10. Wrong Metal Effect (High Signal for Undertone)
-    if wrong_metal == "gold_sallow":
-        traits["cool"] += (2 * PRIMARY)
-    elif wrong_metal == "silver_gray":
-        traits["warm"] += (2 * PRIMARY)
-    # no_diff -> neutral, no change
-    
+    "wrong_metal": {
+        "gold_sallow": {"cool": 2 * PRIMARY},
+        "silver_gray": {"warm": 2 * PRIMARY},
+        # no_diff -> neutral, no change
+    },
     # 11. Worst Color (Moderate Signal)
-    if worst_color == "mustard":
-        traits["cool"] += (1 * PRIMARY)
-    elif worst_color == "icypink":
-        traits["warm"] += (1 * PRIMARY)
-    elif worst_color == "black":
-        traits["soft"] += 2
-        traits["contrast_low"] += 1
-    elif worst_color == "hotpink":
-        traits["soft"] += 1
-        traits["cool"] += 1
-    elif worst_color == "camel":
-        traits["cool"] += 1
-        traits["soft"] += 1
-    
+    "worst_color": {
+        "mustard": {"cool": 1 * PRIMARY},
+        "icypink": {"warm": 1 * PRIMARY},
+        "black":   {"soft": 2, "contrast_low": 1},
+        "hotpink": {"soft": 1, "cool": 1},
+        "camel":   {"cool": 1, "soft": 1},
+    },
     # 12. Best Compliment (Lower Signal - Subjective)
-    if best_comp == "dusty_rose":
-        traits["soft"] += 2
-        traits["cool"] += 1
-    elif best_comp == "coral":
-        traits["warm"] += 2
-        traits["bright"] += 1
-    elif best_comp == "cobalt":
-        traits["cool"] += 2
-        traits["bright"] += 1
-        traits["contrast_high"] += 1
-    elif best_comp == "rust":
-        traits["warm"] += 2
-        traits["deep"] += 1
-    elif best_comp == "icy_lavender":
-        traits["cool"] += 2
-        traits["light"] += 1
-    elif best_comp == "chartreuse":
-        traits["warm"] += 1
-        traits["bright"] += 2
-    
-    return traits
+    "best_comp": {
+        "dusty_rose":   {"soft": 2, "cool": 1},
+        "coral":        {"warm": 2, "bright": 1},
+        "cobalt":       {"cool": 2, "bright": 1, "contrast_high": 1},
+        "rust":         {"warm": 2, "deep": 1},
+        "icy_lavender": {"cool": 2, "light": 1},
+        "chartreuse":   {"warm": 1, "bright": 2},
+    },
+}
+
+# Combination rules: (required answers, points) applied when every listed
+# question has one of the listed answers
+TRAIT_COMBOS = [
+    # Dark hair + brown eyes often warm
+    ({"eye_color": ("brown",), "hair_color": ("black", "dark brown")}, {"warm": 1}),
+]
+
+
+def _pack_row(row):
+    """Pack a trait row into one int, one byte per trait (TRAIT_KEYS order)."""
+    return int.from_bytes(bytes(row), "little")
+
+
+def compile_trait_rules(rules=TRAIT_RULES, combos=TRAIT_COMBOS):
+    """
+    Compile trait rules into lookup tables.
+    
+    Each answer's trait points become a row in TRAIT_KEYS order, packed into
+    a single integer with one byte per trait. Adding up 12 answers is then 12
+    integer additions (batch.py turns the same rows into uint64 arrays).
+    
+    Returns:
+        dict with keys:
+            - 'packed': list of (question, {answer: packed_row}, fallback_packed_row)
+            - 'combos': list of (required answers, packed_row)
+    """
+    tables = []
+    for question in QUESTION_KEYS:
+        options = rules.get(question, {})
+        answers = [a for a in options if a != "*"]
+        deltas = [options[a] for a in answers] + [options.get("*", {})]
+        rows = [[delta.get(k, 0) for k in TRAIT_KEYS] for delta in deltas]
+        tables.append((question, answers, rows))
+    combo_rows = [
+        (tuple(required.items()), [points.get(k, 0) for k in TRAIT_KEYS])
+        for required, points in combos
+    ]
+    
+    # Packed rows only work while every trait total fits in its byte
+    if len(TRAIT_KEYS) > 8:
+        raise ValueError("Packed trait rows hold at most 8 traits")
+    lowest = min(min(row) for _, _, rows in tables for row in rows)
+    # Highest total per trait: best answer to every question plus every combo
+    highest = [0] * len(TRAIT_KEYS)
+    for row in [list(map(max, zip(*rows))) for _, _, rows in tables] + [row for _, row in combo_rows]:
+        highest = [h + v for h, v in zip(highest, row)]
+    if lowest < 0 or max(highest) > 255:
+        raise ValueError("Trait rules must give 0-255 points per trait")
+    
+    packed = [
+        (question, {a: _pack_row(row) for a, row in zip(answers, rows)}, _pack_row(rows[-1]))
+        for question, answers, rows in tables
+    ]
+    compiled_combos = [(required, _pack_row(row)) for required, row in combo_rows]
+    
+    return {'packed': packed, 'combos': compiled_combos}
+
+
+_TRAIT_TABLES = compile_trait_rules()
+
+
+def calculate_traits(answers):
+    """
+    Takes a dict of user answers and returns a dict of trait scores.
+    
+    Args:
+        answers: dict with keys like 'eye_color', 'hair_color', 'skin_tone', etc.
+    
+    Returns:
+        dict of trait scores like {'cool': 12, 'warm': 5, 'soft': 8, ...}
+    """
+    # Add up one precomputed (packed) trait row per question
+    get = answers.get
+    total = 0
+    for question, packed_rows, fallback in _TRAIT_TABLES['packed']:
+        total += packed_rows.get(get(question), fallback)
+    
+    for required, packed_row in _TRAIT_TABLES['combos']:
+        for question, allowed in required:
+            if get(question) not in allowed:
+                break
+        else:
+            total += packed_row
+    
+    return dict(zip(TRAIT_KEYS, total.to_bytes(len(TRAIT_KEYS), "little")))
+
+
+def compile_recipes(recipes=SEASON_RECIPES):
+    """
+    Compile season recipes into a weight matrix.
+    
+    Returns:
+        (seasons, matrix) where seasons is a tuple of season names and matrix
+        is a list of len(seasons) rows, each a list of float trait weights in
+        TRAIT_KEYS order
+    """
+    trait_index = {key: i for i, key in enumerate(TRAIT_KEYS)}
+    matrix = [[0.0] * len(TRAIT_KEYS) for _ in recipes]
+    for j, recipe in enumerate(recipes.values()):
+        for k, w in recipe.items():
+            if k not in trait_index:
+                raise ValueError(f"Unknown trait '{k}' in recipe for {list(recipes)[j]}")
+            matrix[j][trait_index[k]] = float(w)
+    return tuple(recipes), matrix
+
+
+def recipe_weights(seasons, matrix):
+    """Nonzero (trait_index, weight) pairs of each matrix row, in TRAIT_KEYS order."""
+    return [
+        (season, tuple((i, float(w)) for i, w in enumerate(row) if w))
+        for season, row in zip(seasons, matrix)
+    ]
+
+
+SEASON_KEYS, RECIPE_MATRIX = compile_recipes()
+_RECIPE_ROWS = recipe_weights(SEASON_KEYS, RECIPE_MATRIX)
+
+
+def _score_seasons(traits):
+    """Season scores (in SEASON_KEYS order) and their sum for a trait dict."""
+    # Score each season: recipe matrix x trait vector, summed in TRAIT_KEYS order
+    vector = [traits[k] for k in TRAIT_KEYS]
+    season_scores = {}
+    total = 0
+    for season, weights in _RECIPE_ROWS:
+        score = 0
+        for i, w in weights:
+            score += vector[i] * w
+        season_scores[season] = score
+        total += score
+    return season_scores, total
 
 
 def determine_season(traits):
@@ -210,19 +298,15 @@ def determine_season(traits):
             - 'runner_score': int
             - 'ranked': list of (season, score) tuples sorted by score
     """
-    # Score each season
-    season_scores = {}
-    for season, recipe in SEASON_RECIPES.items():
-        season_scores[season] = sum(traits[k] * w for k, w in recipe.items())
+    season_scores, total = _score_seasons(traits)
     
-    # Pick winner + runner up
+    # Rank seasons (the full ranking is part of the result)
     ranked = sorted(season_scores.items(), key=lambda x: x[1], reverse=True)
     winner, winner_score = ranked[0]
     runner, runner_score = ranked[1]
     
     # Calculate confidence
-    all_scores = list(season_scores.values())
-    average_score = sum(all_scores) / len(all_scores)
+    average_score = total / len(season_scores)
     raw_lead = winner_score - average_score
     gap = winner_score - runner_score
     
@@ -232,18 +316,10 @@ def determine_season(traits):
     else:
         confidence_percent = 0
     
-    # Confidence label
-    if confidence_percent > 75:
-        confidence_label = "High (Clear Winner)"
-    elif confidence_percent > 45:
-        confidence_label = "Medium (Likely Match)"
-    else:
-        confidence_label = "Low (Borderline/Mixed)"
-    
     return {
         'season': winner,
         'confidence_percent': confidence_percent,
-        'confidence_label': confidence_label,
+        'confidence_label': confidence_label(confidence_percent),
         'winner_score': winner_score,
         'runner_up': runner,
         'runner_score': runner_score,
@@ -251,6 +327,301 @@ def determine_season(traits):
     }
 
 
+def confidence_label(confidence_percent):
+    """Describe a confidence percentage."""
+    if confidence_percent > 75:
+        return "High (Clear Winner)"
+    elif confidence_percent > 45:
+        return "Medium (Likely Match)"
+    else:
+        return "Low (Borderline/Mixed)"
+
+
+# ----- Precomputed answer table -----
+# lookup.py can precompute every answer combination into a table; once one
+# is attached here, quick_result() serves results from it in O(1).
+
+_answer_table = None
+
+
+def use_answer_table(table):
+    """Serve quick_result() from a lookup.AnswerTable (None = live scoring only)."""
+    global _answer_table
+    _answer_table = table
+
+
+def quick_result(answers):
+    """
+    Result for a set of answers, from the answer table when possible.
+    
+    Falls back to calculate_traits() + determine_season() when no table is
+    attached or the answers aren't in the table (e.g. missing/unknown options).
+    A table hit is returned as stored, season scores included, with no
+    rescoring.
+    
+    Returns:
+        determine_season() result plus 'traits'
+    """
+    if _answer_table is not None:
+        with span("answer_table"):
+            hit = _answer_table.lookup(answers)
+        if hit is not None:
+            return hit
+    
+    with span("calculate_traits"):
+        traits = calculate_traits(answers)
+    with span("determine_season"):
+        result = determine_season(traits)
+    result['traits'] = traits
+    return result
+
+
+# ----- Incremental scoring -----
+# Scores the questionnaire while it is being answered. Each answer swaps the
+# blank question's precomputed (packed, integer) trait row for its own, so
+# an answer costs the same however many came before it, and season scores
+# come from the exact trait totals the way determine_season() computes them.
+# The state also keeps, for every pair of seasons, the most the
+# still-unanswered questions could move one ahead of the other; once no
+# season can catch the leader - whatever the remaining answers are, or if
+# they stay blank - the winner is locked.
+
+# Float slack when deciding that a lead can't be overturned
+LOCK_EPSILON = 1e-9
+
+
+def _unpack_row(packed):
+    """Packed trait row (see _pack_row) -> list of ints in TRAIT_KEYS order."""
+    return list(packed.to_bytes(len(TRAIT_KEYS), "little"))
+
+
+def _season_deltas(matrix, row):
+    """Season-score change for one trait row: matrix x row."""
+    return [sum(w * v for w, v in zip(weights, row)) for weights in matrix]
+
+
+def _gains(deltas):
+    """
+    Bounds over a set of possible season-score changes (one row per outcome).
+    
+    Returns:
+        (most each season can gain, least, pair) where pair is flat, row-major
+        over (season s, season t): the most season s can gain on season t
+    """
+    seasons = list(zip(*deltas))
+    pair = [max(a - b for a, b in zip(s, t)) for s in seasons for t in seasons]
+    return [max(s) for s in seasons], [min(s) for s in seasons], pair
+
+
+def compile_incremental(tables=_TRAIT_TABLES, matrix=RECIPE_MATRIX, options=QUESTION_OPTIONS):
+    """
+    Compile the trait rule tables into per-answer deltas for IncrementalScore.
+    
+    Gain bounds are season-score changes relative to leaving the question
+    blank, over every offered option plus leaving it blank.
+    
+    Returns:
+        dict with keys:
+            - 'questions': {question: (packed rows, fallback packed row, gains)}
+            - 'combos': list of (required answers, packed row, gains)
+    """
+    questions = {}
+    nothing = [0.0] * len(matrix)
+    for question, packed_rows, fallback in tables['packed']:
+        blank = _season_deltas(matrix, _unpack_row(fallback))
+        deltas = []
+        for a in options.get(question, ()):
+            scores = _season_deltas(matrix, _unpack_row(packed_rows.get(a, fallback)))
+            deltas.append([s - b for s, b in zip(scores, blank)])
+        deltas.append(nothing)
+        questions[question] = (packed_rows, fallback, _gains(deltas))
+    combos = []
+    for required, packed_row in tables['combos']:
+        delta = _season_deltas(matrix, _unpack_row(packed_row))
+        combos.append((required, packed_row, _gains([nothing, delta])))
+    return {'questions': questions, 'combos': combos}
+
+
+_INCREMENTAL_TABLES = compile_incremental()
+_SEASON_INDEX = {season: i for i, season in enumerate(SEASON_KEYS)}
+
+
+class IncrementalScore:
+    """
+    Quiz score kept up to date one answer at a time.
+    
+    Unanswered questions count as blank, as in calculate_traits(), so
+    traits() always equals calculate_traits(answers), and scores() and
+    ranked() are exactly what determine_season() gives for those traits
+    (same summation, same tie order).
+    
+    Args:
+        answers: optional dict of question -> answer to start from
+    """
+    
+    def __init__(self, answers=None, tables=None):
+        self._tables = tables or _INCREMENTAL_TABLES
+        questions = self._tables['questions']
+        n = len(SEASON_KEYS)
+        self.answers = {}
+        self._packed = 0
+        self._gain_max = [0.0] * n
+        self._gain_min = [0.0] * n
+        self._pair = [0.0] * (n * n)
+        for _, fallback, gains in questions.values():
+            self._packed += fallback
+            self._add_gains(gains, 1)
+        
+        # Combination rules by question, and whether each is 'open' (could
+        # still apply), 'met' or 'failed'
+        self._combo_status = [None] * len(self._tables['combos'])
+        self._combos_for = {q: [] for q in questions}
+        for i, (required, _, _) in enumerate(self._tables['combos']):
+            for question, _ in required:
+                self._combos_for[question].append(i)
+            self._update_combo(i)
+        
+        if answers:
+            self.update(answers)
+    
+    def _add_gains(self, gains, sign):
+        gain_max, gain_min, pair = gains
+        self._gain_max = [a + sign * b for a, b in zip(self._gain_max, gain_max)]
+        self._gain_min = [a + sign * b for a, b in zip(self._gain_min, gain_min)]
+        self._pair = [a + sign * b for a, b in zip(self._pair, pair)]
+    
+    def _update_combo(self, i):
+        required, packed_row, gains = self._tables['combos'][i]
+        status = 'met'
+        for question, allowed in required:
+            option = self.answers.get(question)
+            if option is None:
+                status = 'open'
+            elif option not in allowed:
+                status = 'failed'
+                break
+        old = self._combo_status[i]
+        if status == old:
+            return
+        if old == 'met':
+            self._packed -= packed_row
+        elif old == 'open':
+            self._add_gains(gains, -1)
+        if status == 'met':
+            self._packed += packed_row
+        elif status == 'open':
+            self._add_gains(gains, 1)
+        self._combo_status[i] = status
+    
+    def answer(self, question, option):
+        """
+        Record, change or (with option None) clear one answer.
+        
+        Returns:
+            True if the answer changed
+        """
+        if question not in self._tables['questions']:
+            raise ValueError(f"Unknown question '{question}'")
+        current = self.answers.get(question)
+        if option == current:
+            return False
+        packed_rows, fallback, gains = self._tables['questions'][question]
+        self._packed += packed_rows.get(option, fallback) - packed_rows.get(current, fallback)
+        if current is None:
+            self._add_gains(gains, -1)
+        elif option is None:
+            self._add_gains(gains, 1)
+        
+        if option is None:
+            del self.answers[question]
+        else:
+            self.answers[question] = option
+        for i in self._combos_for[question]:
+            self._update_combo(i)
+        return True
+    
+    def update(self, answers):
+        """
+        Bring the state in line with a full answers dict (questions missing
+        from it are cleared). Only changed answers cost anything.
+        
+        Returns:
+            number of answers that changed
+        """
+        return sum(self.answer(q, answers.get(q)) for q in self._tables['questions'])
+    
+    @property
+    def answered(self):
+        return len(self.answers)
+    
+    def remaining(self):
+        """Unanswered questions, in QUESTION_KEYS order."""
+        return [q for q in QUESTION_KEYS if q not in self.answers]
+    
+    def traits(self):
+        """Trait scores so far (equal to calculate_traits(self.answers))."""
+        return dict(zip(TRAIT_KEYS, self._packed.to_bytes(len(TRAIT_KEYS), "little")))
+    
+    def scores(self):
+        """Season scores for the answers so far, season -> float (as determine_season)."""
+        season_scores, _ = _score_seasons(self.traits())
+        return season_scores
+    
+    def ranked(self):
+        """(season, score) tuples, highest first (ties keep SEASON_KEYS order)."""
+        return sorted(self.scores().items(), key=lambda x: x[1], reverse=True)
+    
+    def bounds(self):
+        """Lowest and highest score each season can still end on: season -> (low, high)."""
+        scores = self.scores().values()
+        return {
+            season: (score + lo, score + hi)
+            for season, score, lo, hi in zip(SEASON_KEYS, scores, self._gain_min, self._gain_max)
+        }
+    
+    def contenders(self, ranked=None):
+        """
+        Seasons that could still finish level with or ahead of the current
+        leader, leader first, then by score.
+        """
+        ranked = ranked or self.ranked()
+        leader, lead = ranked[0]
+        # Lead over each season if the remaining answers all favor that season
+        # (LOCK_EPSILON absorbs rounding in the precomputed gains)
+        n = len(SEASON_KEYS)
+        gain_on_leader = self._pair[_SEASON_INDEX[leader]::n]
+        return [season for season, score in ranked
+                if season == leader or lead - score - gain_on_leader[_SEASON_INDEX[season]] <= LOCK_EPSILON]
+    
+    def locked(self):
+        """True once the leader wins however the remaining questions are answered (or left blank)."""
+        return len(self.contenders()) == 1
+    
+    def status(self):
+        """
+        Provisional result for the answers so far.
+        
+        Returns:
+            dict with keys:
+                - 'answered': number of questions answered
+                - 'leader' / 'leader_score': current top season and its score
+                - 'runner_up' / 'runner_score': second place
+                - 'contenders': seasons that can still catch the leader
+                - 'locked': True if the leader can no longer be overtaken
+        """
+        ranked = self.ranked()
+        contenders = self.contenders(ranked)
+        return {
+            'answered': self.answered,
+            'leader': ranked[0][0],
+            'leader_score': ranked[0][1],
+            'runner_up': ranked[1][0],
+            'runner_score': ranked[1][1],
+            'contenders': contenders,
+            'locked': len(contenders) == 1,
+        }
+
+
 def trait_label(key):
     """Turn internal trait keys into human-friendly labels."""
     labels = {
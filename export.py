@@ -0,0 +1,207 @@
+# RFG Palette System - Submission Export
+# Streams stored submissions into a Parquet file for analytics.
+#
+# Usage:  python export.py submissions.parquet [--db bookings.sqlite3]
+#         python export.py submissions.parquet --sheet-csv bookings_sheet.csv
+#
+# Rows are read and written one batch at a time (one Parquet row group per
+# batch), so memory stays flat however many submissions there are. Colors
+# are split into numeric hue/saturation/value columns instead of the sheet's
+# "H20 S35 V80" strings, and answers keep one column per question so the
+# file feeds straight into batch.score_batch (see iter_answer_columns).
+
+import argparse
+import csv
+import json
+import re
+import sys
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from engine import QUESTION_KEYS
+from storage import COLUMNS, DEFAULT_DB_PATH, PHOTO_FEATURES, TIMESTAMP_FORMAT, SQLiteStore
+
+# Rows per batch read from the source (and per Parquet row group)
+ROW_GROUP_SIZE = 100_000
+
+# Contact details are left out unless asked for
+CONTACT_COLUMNS = ('name', 'email', 'phone', 'notes')
+
+_SQL_TYPES = {
+    'TEXT': pa.string(),
+    'INTEGER': pa.int32(),
+    'REAL': pa.float64(),
+}
+_SPECIAL_TYPES = {
+    'created_at': pa.timestamp('s'),
+    'favorite_colors': pa.list_(pa.string()),
+}
+
+
+def export_schema(include_contact=False):
+    """Arrow schema of an export: 'id' then storage.COLUMNS with numeric types."""
+    fields = [pa.field('id', pa.int64())]
+    for name, kind in COLUMNS:
+        if name in CONTACT_COLUMNS and not include_contact:
+            continue
+        fields.append(pa.field(name, _SPECIAL_TYPES.get(name) or _SQL_TYPES[kind.split()[0]]))
+    return pa.schema(fields)
+
+
+def _hex_lists(values, list_type):
+    # Favorites are stored as JSON lists of hex codes, which never contain
+    # brackets, quotes or ", ", so they split without a JSON parse per row
+    inner = pc.replace_substring_regex(pa.array(values, pa.string()), pattern=r'[\[\]"]', replacement='')
+    empty = pa.scalar([], list_type)
+    lists = pc.if_else(pc.equal(inner, ''), empty, pc.split_pattern(inner, pattern=', '))
+    return lists.fill_null(empty)
+
+
+def _record_batch(columns, schema):
+    arrays = []
+    for field in schema:
+        values = columns[field.name]
+        if field.name == 'created_at':
+            arrays.append(pc.strptime(pa.array(values, pa.string()), format=TIMESTAMP_FORMAT, unit='s'))
+        elif field.name == 'favorite_colors':
+            arrays.append(_hex_lists(values, field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_store_batches(db_path=DEFAULT_DB_PATH, batch_size=ROW_GROUP_SIZE, include_contact=False):
+    """Stream bookings from the SQLite store as Arrow record batches."""
+    schema = export_schema(include_contact)
+    store = SQLiteStore(db_path)
+    try:
+        for rows in store.iter_rows(schema.names, batch_size):
+            yield _record_batch(dict(zip(schema.names, zip(*rows))), schema)
+    finally:
+        store.close()
+
+
+# ----- Legacy sheet rows -----
+# Bookings saved before the SQLite store only exist in the Google Sheet. A
+# CSV download of it can be exported too; it has no answers, traits or scores.
+
+_SHEET_COLUMNS = (
+    'created_at', 'name', 'email', 'phone', 'notes', 'season', 'confidence',
+    'photo_season', 'undertone', 'value', 'chroma',
+    'iris_hex', 'iris_hsv', 'hair_hex', 'hair_hsv', 'skin_hex', 'skin_hsv',
+    'favorite_colors',
+)
+_HSV_PATTERN = re.compile(r"H(-?\d+)\s+S(-?\d+)\s+V(-?\d+)")
+
+
+def parse_hsv(text):
+    """'H20 S35 V80' -> (20, 35, 80), or (None, None, None) if blank/unparseable."""
+    match = _HSV_PATTERN.fullmatch((text or "").strip())
+    return tuple(int(v) for v in match.groups()) if match else (None, None, None)
+
+
+def _sheet_record(cells, row_id):
+    cells = dict(zip(_SHEET_COLUMNS, cells))
+    record = {'id': row_id}
+    for name in ('created_at', 'name', 'email', 'phone', 'notes', 'season',
+                 'photo_season', 'undertone', 'value', 'chroma'):
+        record[name] = cells.get(name) or None
+    confidence = (cells.get('confidence') or '').strip()
+    record['confidence'] = int(confidence) if confidence.isdigit() else None
+    for feature in PHOTO_FEATURES:
+        record[f'{feature}_hex'] = cells.get(f'{feature}_hex') or None
+        (record[f'{feature}_h'], record[f'{feature}_s'],
+         record[f'{feature}_v']) = parse_hsv(cells.get(f'{feature}_hsv'))
+    favorites = [c.strip() for c in (cells.get('favorite_colors') or '').split(',') if c.strip()]
+    record['favorite_colors'] = json.dumps(favorites)
+    return record
+
+
+def iter_sheet_batches(csv_path, batch_size=ROW_GROUP_SIZE, include_contact=False):
+    """Stream rows of a downloaded bookings sheet (CSV) as Arrow record batches."""
+    schema = export_schema(include_contact)
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        batch = []
+        for row_id, cells in enumerate(csv.reader(f), start=1):
+            # Skip a header row if the sheet has one
+            if row_id == 1 and cells and not cells[0][:1].isdigit():
+                continue
+            batch.append(_sheet_record(cells, row_id))
+            if len(batch) == batch_size:
+                yield _record_batch({name: [r.get(name) for r in batch] for name in schema.names}, schema)
+                batch = []
+        if batch:
+            yield _record_batch({name: [r.get(name) for r in batch] for name in schema.names}, schema)
+
+
+def write_parquet(batches, path, schema=None):
+    """
+    Write record batches to a Parquet file, one row group per batch.
+
+    Returns:
+        number of rows written
+    """
+    rows = 0
+    writer = None
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = pq.ParquetWriter(path, schema or batch.schema, compression="zstd")
+            writer.write_batch(batch, row_group_size=max(batch.num_rows, 1))
+            rows += batch.num_rows
+        if writer is None:
+            writer = pq.ParquetWriter(path, schema, compression="zstd")
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def iter_answer_columns(path, batch_size=ROW_GROUP_SIZE, columns=()):
+    """
+    Stream an export's answers in the column form batch.score_batch takes.
+
+    Args:
+        path: Parquet file written by this module
+        batch_size: rows per yielded batch
+        columns: extra columns to include (e.g. 'id', 'season')
+
+    Yields:
+        dicts of column name -> numpy array; answers are keyed by question
+        (object arrays, None where unanswered), extras by their own names
+    """
+    answer_columns = [f'answer_{q}' for q in QUESTION_KEYS]
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=[*answer_columns, *columns]):
+        out = {q: np.asarray(batch.column(f'answer_{q}').to_pylist(), dtype=object)
+               for q in QUESTION_KEYS}
+        for name in columns:
+            out[name] = batch.column(name).to_numpy(zero_copy_only=False)
+        yield out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export stored submissions to Parquet.")
+    parser.add_argument("out", help="Parquet file to write")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", default=DEFAULT_DB_PATH, help="SQLite booking store (default)")
+    source.add_argument("--sheet-csv", help="CSV download of the legacy bookings sheet")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE)
+    parser.add_argument("--include-contact", action="store_true",
+                        help="also export name, email, phone and notes")
+    args = parser.parse_args(argv)
+
+    if args.sheet_csv:
+        batches = iter_sheet_batches(args.sheet_csv, args.row_group_size, args.include_contact)
+    else:
+        batches = iter_store_batches(args.db, args.row_group_size, args.include_contact)
+    rows = write_parquet(batches, args.out, export_schema(args.include_contact))
+    print(f"Wrote {rows:,} submissions to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+# RFG Palette System - Fake Sheets API
+# A local HTTP stand-in for Google's token endpoint and the two Sheets API
+# calls the booking export makes (spreadsheet metadata and values:append),
+# so the real client path in sheets_client.py can be exercised offline.
+#
+# Usage:  python fake_sheets.py --port 8765 --credentials fake_service_account.json
+#         (then point GoogleSheet / get_connection at http://127.0.0.1:8765
+#         with the written credentials)
+#
+# In code:
+#   server = FakeSheetsServer().start()
+#   sheet = GoogleSheet(server.credentials_info(), api_base=server.url)
+#
+# Access tokens are issued for token_lifetime seconds and checked on every
+# API call. Latency, failures and token lifetime are adjustable while it runs.
+
+import argparse
+import json
+import re
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+FAKE_SHEET_KEY = 'fake-bookings-sheet'
+DEFAULT_TOKEN_LIFETIME = 3600
+
+_METADATA_PATH = re.compile(r"^/v4/spreadsheets/([^/]+)$")
+_APPEND_PATH = re.compile(r"^/v4/spreadsheets/([^/]+)/values/([^/]+):append$")
+
+
+def _private_key_pem():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode("ascii")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so a pooled client reuses its connections
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle's
+        # algorithm and delayed ACKs add ~40 ms to every kept-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.fake.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._reply(status, {'error': {'code': status, 'message': message, 'status': 'ERROR'}})
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def _handle(self, method):
+        fake = self.server.fake
+        path = urllib.parse.urlsplit(self.path).path
+        body = self._body()
+        fake.count('requests')
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        if method == "POST" and path == "/token":
+            self._reply(200, fake.issue_token())
+            return
+        if not fake.token_ok(self.headers.get("Authorization", "")):
+            self._error(401, "Request had invalid authentication credentials.")
+            return
+        status = fake.take_failure()
+        if status:
+            self._error(status, "Simulated failure.")
+            return
+
+        match = _METADATA_PATH.match(path)
+        if method == "GET" and match:
+            if match.group(1) != fake.sheet_key:
+                self._error(404, "Requested entity was not found.")
+                return
+            fake.count('metadata')
+            self._reply(200, fake.metadata())
+            return
+        match = _APPEND_PATH.match(path)
+        if method == "POST" and match:
+            if match.group(1) != fake.sheet_key:
+                self._error(404, "Requested entity was not found.")
+                return
+            rows = json.loads(body or b"{}").get('values', [])
+            fake.count('appends')
+            self._reply(200, fake.append(rows))
+            return
+        self._error(404, f"No fake handler for {method} {path}")
+
+
+class FakeSheetsServer:
+    """
+    In-process fake of the Sheets API on a local port.
+
+    Attributes you can change while it runs:
+        latency: seconds added to every response
+        token_lifetime: expires_in for newly issued tokens
+        fail_next: list of HTTP status codes to answer the next API calls with
+
+    rows holds everything appended; counters holds request, connection,
+    token, metadata and append counts.
+    """
+
+    def __init__(self, port=0, host="127.0.0.1", sheet_key=FAKE_SHEET_KEY,
+                 token_lifetime=DEFAULT_TOKEN_LIFETIME, latency=0.0):
+        self.sheet_key = sheet_key
+        self.token_lifetime = token_lifetime
+        self.latency = latency
+        self.fail_next = []
+        self.rows = []
+        self.counters = {'requests': 0, 'connections': 0, 'tokens': 0, 'metadata': 0, 'appends': 0}
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._private_key = None
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-sheets", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def credentials_info(self):
+        """A service account dict whose token endpoint is this server."""
+        if self._private_key is None:
+            self._private_key = _private_key_pem()
+        return {
+            'type': 'service_account',
+            'project_id': 'rfg-fake',
+            'private_key_id': 'fake',
+            'private_key': self._private_key,
+            'client_email': 'bookings@rfg-fake.iam.gserviceaccount.com',
+            'client_id': '0',
+            'token_uri': f"{self.url}/token",
+        }
+
+    # ----- Request handling (called from handler threads) -----
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def issue_token(self):
+        with self._lock:
+            self.counters['tokens'] += 1
+            token = f"fake-token-{self.counters['tokens']}"
+            self._tokens[token] = time.time() + self.token_lifetime
+        return {'access_token': token, 'expires_in': self.token_lifetime, 'token_type': 'Bearer'}
+
+    def token_ok(self, authorization):
+        token = authorization.removeprefix("Bearer ").strip()
+        with self._lock:
+            return self._tokens.get(token, 0) > time.time()
+
+    def revoke_tokens(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def take_failure(self):
+        with self._lock:
+            return self.fail_next.pop(0) if self.fail_next else None
+
+    def metadata(self):
+        return {
+            'spreadsheetId': self.sheet_key,
+            'properties': {'title': 'Bookings', 'locale': 'en_US', 'timeZone': 'Etc/UTC'},
+            'sheets': [{'properties': {
+                'sheetId': 0, 'title': 'Sheet1', 'index': 0, 'sheetType': 'GRID',
+                'gridProperties': {'rowCount': 1000, 'columnCount': 26},
+            }}],
+        }
+
+    def append(self, rows):
+        with self._lock:
+            start = len(self.rows) + 1
+            self.rows.extend(rows)
+            end = len(self.rows)
+        return {
+            'spreadsheetId': self.sheet_key,
+            'updates': {
+                'spreadsheetId': self.sheet_key,
+                'updatedRange': f"Sheet1!A{start}:R{end}",
+                'updatedRows': len(rows),
+                'updatedColumns': max((len(r) for r in rows), default=0),
+                'updatedCells': sum(len(r) for r in rows),
+            },
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local fake of the Sheets API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--credentials", help="write a matching service account JSON here")
+    parser.add_argument("--token-lifetime", type=int, default=DEFAULT_TOKEN_LIFETIME)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args(argv)
+
+    server = FakeSheetsServer(args.port, token_lifetime=args.token_lifetime, latency=args.latency).start()
+    if args.credentials:
+        with open(args.credentials, "w", encoding="utf-8") as f:
+            json.dump(server.credentials_info(), f, indent=2)
+    print(f"Fake Sheets API on {server.url} (sheet key {server.sheet_key})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
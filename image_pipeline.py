@@ -0,0 +1,298 @@
+# RFG Palette System - Image Pipeline
+# Decodes uploaded photos once and keeps display/working copies for reuse
+# across Streamlit reruns, keyed by a hash of the upload's bytes, within
+# per-session and process-wide memory budgets.
+#
+# Memory use is published as gauges on the metrics registry (see metrics.py).
+
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from metrics import registry as metrics_registry
+
+# Width of the copy shown in the photo picker
+DISPLAY_WIDTH = 400
+# Longest side of the copy colors are sampled from
+WORKING_MAX_SIDE = 2048
+
+# Decoded bytes one session may hold (selfie + inspiration image fit easily)
+SESSION_BUDGET_BYTES = 48 * 1024 * 1024
+# Decoded bytes held across all sessions in the process
+GLOBAL_BUDGET_BYTES = 512 * 1024 * 1024
+# Seconds without activity after which a session's images are released
+# (Streamlit doesn't tell us when a session ends)
+SESSION_IDLE_SECONDS = 30 * 60
+
+
+def content_key(data):
+    """Hash of an upload's bytes, used as its cache key."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class DecodedImage:
+    """
+    One decoded upload.
+
+    Attributes:
+        key: content hash of the upload
+        original_size: (width, height) of the file as uploaded
+        working: RGB PIL image, longest side at most WORKING_MAX_SIDE
+        display: RGB PIL image, DISPLAY_WIDTH wide (or smaller if the photo is)
+        array: read-only uint8 array (height, width, 3) of the working image
+    """
+
+    def __init__(self, key, original_size, working, display):
+        self.key = key
+        self.original_size = original_size
+        self.working = working
+        self.display = display
+        self.array = np.asarray(working)
+
+    @property
+    def display_scale(self):
+        """Working-image pixels per display pixel."""
+        return self.working.width / self.display.width
+
+    @property
+    def nbytes(self):
+        """Approximate memory held: working bitmap, its array copy and the display copy."""
+        display_bytes = 0 if self.display is self.working else self.display.width * self.display.height * 3
+        return 2 * self.array.nbytes + display_bytes
+
+
+def open_working(source, max_side=WORKING_MAX_SIDE):
+    """
+    Decode an image straight to its working copy.
+
+    JPEGs are decoded in draft mode, letting the decoder downscale by up to
+    8x while decompressing instead of building the full-resolution bitmap.
+
+    Args:
+        source: file path or binary file object (read lazily by PIL)
+        max_side: longest side of the result
+
+    Returns:
+        (original (width, height), RGB PIL image)
+    """
+    image = Image.open(source)
+    original_size = image.size
+
+    scale = max_side / max(original_size)
+    if scale < 1:
+        target = (max(1, int(original_size[0] * scale)), max(1, int(original_size[1] * scale)))
+        image.draft("RGB", target)
+    working = image.convert("RGB")
+    working.thumbnail((max_side, max_side))
+    return original_size, working
+
+
+def decode_image(data, key=None):
+    """Decode an upload into a DecodedImage (see open_working)."""
+    original_size, working = open_working(io.BytesIO(data))
+
+    if working.width > DISPLAY_WIDTH:
+        display = working.resize((DISPLAY_WIDTH, int(working.height * DISPLAY_WIDTH / working.width)))
+    else:
+        display = working
+
+    return DecodedImage(key or content_key(data), original_size, working, display)
+
+
+class ImageMemoryManager:
+    """
+    Decoded images shared by every session, held under byte budgets.
+
+    Each session holds references to the images it has opened; an image is
+    freed once no session references it. A session over its own budget drops
+    its least recently used images. When the whole process is over the global
+    budget, images are released from the coldest sessions (least recently
+    active) first, and sessions idle for session_idle seconds release
+    everything. A dropped image is simply decoded again if its session asks
+    for it later.
+
+    Thread-safe; one instance serves every Streamlit session in the process.
+    """
+
+    def __init__(self, session_budget=SESSION_BUDGET_BYTES, global_budget=GLOBAL_BUDGET_BYTES,
+                 session_idle=SESSION_IDLE_SECONDS):
+        self.session_budget = session_budget
+        self.global_budget = global_budget
+        self.session_idle = session_idle
+        self._images = {}
+        self._refs = {}
+        # session -> OrderedDict of image keys, both ordered coldest first
+        self._sessions = OrderedDict()
+        self._last_active = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.sessions_released = 0
+
+    def get(self, data, key=None, session=None):
+        """
+        Decoded image for these bytes, decoding only if it isn't held.
+
+        Args:
+            data: the uploaded file's bytes
+            key: content_key(data), if the caller already has it
+            session: id of the session using the image
+        """
+        key = key or content_key(data)
+        with self._lock:
+            self._release_idle()
+            decoded = self._images.get(key)
+            if decoded is not None:
+                self.hits += 1
+                self._hold(session, key)
+                return decoded
+            self.misses += 1
+
+        decoded = decode_image(data, key)
+        with self._lock:
+            if key in self._images:
+                decoded = self._images[key]
+            else:
+                self._images[key] = decoded
+                self._refs[key] = 0
+                self._bytes += decoded.nbytes
+            self._hold(session, key)
+        return decoded
+
+    def release(self, session, key):
+        """Drop one image a session holds (e.g. its upload was replaced or removed)."""
+        with self._lock:
+            if key in self._sessions.get(session, ()):
+                self._release(session, key)
+
+    def release_session(self, session):
+        """Drop every image a session holds (e.g. when it ends or starts over)."""
+        with self._lock:
+            if session in self._sessions:
+                self.sessions_released += 1
+            for key in list(self._sessions.get(session, ())):
+                self._release(session, key)
+
+    def _release_idle(self):
+        # Sessions are ordered least recently active first
+        cutoff = time.monotonic() - self.session_idle
+        while self._sessions:
+            session = next(iter(self._sessions))
+            if self._last_active[session] > cutoff:
+                break
+            self.sessions_released += 1
+            for key in list(self._sessions[session]):
+                self._release(session, key)
+
+    def _hold(self, session, key):
+        held = self._sessions.setdefault(session, OrderedDict())
+        if key not in held:
+            held[key] = None
+            self._refs[key] += 1
+        held.move_to_end(key)
+        self._sessions.move_to_end(session)
+        self._last_active[session] = time.monotonic()
+        self._enforce_budgets(session, key)
+
+    def _release(self, session, key):
+        held = self._sessions[session]
+        del held[key]
+        if not held:
+            del self._sessions[session]
+            del self._last_active[session]
+        self._refs[key] -= 1
+        if self._refs[key] == 0:
+            del self._refs[key]
+            self._bytes -= self._images.pop(key).nbytes
+            self.evictions += 1
+
+    def _session_bytes(self, session):
+        return sum(self._images[key].nbytes for key in self._sessions.get(session, ()))
+
+    def _enforce_budgets(self, session, keep):
+        # The image being handed out is never dropped, even if it alone is
+        # over budget
+        held = self._sessions[session]
+        while len(held) > 1 and self._session_bytes(session) > self.session_budget:
+            self._release(session, next(iter(held)))
+
+        while self._bytes > self.global_budget:
+            victim = next(((s, k) for s, keys in self._sessions.items()
+                           for k in keys if k != keep), None)
+            if victim is None:
+                break
+            self._release(*victim)
+
+    def stats(self):
+        """
+        Current memory use.
+
+        Returns:
+            dict with 'images', 'bytes', 'sessions', 'session_bytes' (session ->
+            bytes held), the two budgets, and 'hits'/'misses'/'evictions'/
+            'sessions_released' counts
+        """
+        with self._lock:
+            return {
+                'images': len(self._images),
+                'bytes': self._bytes,
+                'sessions': len(self._sessions),
+                'session_bytes': {s: self._session_bytes(s) for s in self._sessions},
+                'session_budget': self.session_budget,
+                'global_budget': self.global_budget,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'sessions_released': self.sessions_released,
+            }
+
+
+_manager = ImageMemoryManager()
+
+
+def get_image(data, key=None, session=None):
+    """Decoded image for an upload's bytes, from the process-wide manager."""
+    return _manager.get(data, key, session)
+
+
+def release_image(session, key):
+    """Release one of a session's images in the process-wide manager."""
+    _manager.release(session, key)
+
+
+def release_session(session):
+    """Release everything a session holds in the process-wide manager."""
+    _manager.release_session(session)
+
+
+def image_memory_stats():
+    """Memory use of the process-wide manager (see ImageMemoryManager.stats)."""
+    return _manager.stats()
+
+
+def _image_gauges():
+    stats = _manager.stats()
+    largest = max(stats['session_bytes'].values(), default=0)
+    return [
+        ("rfg_image_memory_bytes", "gauge", "Decoded image bytes held across all sessions.", stats['bytes']),
+        ("rfg_image_memory_budget_bytes", "gauge", "Process-wide decoded image budget.", stats['global_budget']),
+        ("rfg_image_session_largest_bytes", "gauge", "Decoded image bytes held by the largest session.", largest),
+        ("rfg_image_session_budget_bytes", "gauge", "Per-session decoded image budget.", stats['session_budget']),
+        ("rfg_images_held", "gauge", "Decoded images held.", stats['images']),
+        ("rfg_image_sessions", "gauge", "Sessions holding decoded images.", stats['sessions']),
+        ("rfg_image_cache_hits_total", "counter", "Uploads served without decoding.", stats['hits']),
+        ("rfg_image_cache_misses_total", "counter", "Uploads decoded.", stats['misses']),
+        ("rfg_image_evictions_total", "counter", "Decoded images freed.", stats['evictions']),
+        ("rfg_image_sessions_released_total", "counter",
+         "Sessions whose images were released (ended, restarted or idle).", stats['sessions_released']),
+    ]
+
+
+metrics_registry.add_gauges("image_pipeline", _image_gauges)
@@ -0,0 +1,268 @@
+# RFG Palette System - Load Test
+# Drives app.py headlessly (Streamlit's AppTest) through the whole client
+# flow with N concurrent sessions and reports rerun latency per step,
+# memory per session and throughput.
+#
+# Usage:  python loadtest.py --sessions 8 --flows 2
+#
+# Each simulated client answers the questions (one rerun each) until the app
+# reports its season settled (at most 12), uploads a synthetic selfie,
+# samples iris/hair/skin, gets results and submits the booking form.
+# Bookings go to a throwaway SQLite store and the local stand-in sheet (or,
+# with --sheet-backend fake, through the real Sheets client to a local fake
+# of the API), never to Google Sheets.
+#
+# All sessions live in this one process and share its caches and image
+# memory, like sessions on one app server. AppTest swaps a process-wide
+# runtime in for each rerun, so reruns from different sessions take turns;
+# the time a rerun spends waiting for its turn is reported separately as
+# queueing delay. (On a real server CPU-bound reruns also share one core's
+# worth of Python through the GIL.)
+
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Seconds a single rerun may take before AppTest gives up
+RERUN_TIMEOUT = 60
+
+STEPS = ('load', 'answer', 'upload', 'pick_mode', 'sample', 'book')
+
+_PICK_BUTTONS = {'iris': "👁️ Iris", 'hair': "💇 Hair", 'skin': "✋ Skin"}
+
+
+def synthetic_selfie(seed, size=(1200, 1600)):
+    """JPEG bytes of a smooth random gradient image (width, height)."""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    corners = rng.integers(40, 230, size=(2, 2, 3)).astype(np.float32)
+    fy = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    fx = np.linspace(0, 1, width, dtype=np.float32)[None, :, None]
+    image = (corners[0, 0] * (1 - fy) * (1 - fx) + corners[0, 1] * (1 - fy) * fx
+             + corners[1, 0] * fy * (1 - fx) + corners[1, 1] * fy * fx)
+    image += rng.normal(0, 6, size=image.shape).astype(np.float32)
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).save(buffer, "JPEG", quality=88)
+    return buffer.getvalue()
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class Recorder:
+    """Runs reruns one at a time and collects per-step latencies."""
+
+    def __init__(self):
+        self.timings = {step: [] for step in STEPS}
+        self.waits = []
+        self.errors = []
+        self._lock = threading.Lock()
+        self._turn = threading.Lock()
+
+    def run(self, at, step):
+        queued = time.perf_counter()
+        with self._turn:
+            start = time.perf_counter()
+            at.run(timeout=RERUN_TIMEOUT)
+            elapsed = time.perf_counter() - start
+        with self._lock:
+            self.timings[step].append(elapsed)
+            self.waits.append(start - queued)
+        if at.exception:
+            raise RuntimeError(f"{step}: {at.exception[0].value}")
+
+
+def client_flow(recorder, seed, image_size):
+    """One simulated client, start to booking. Raises if any step fails."""
+    from engine import QUESTION_KEYS, QUESTION_OPTIONS
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    at = AppTest.from_file(APP_PATH, default_timeout=RERUN_TIMEOUT)
+    recorder.run(at, 'load')
+
+    # Widgets are looked up again after every rerun; elements from an
+    # earlier run don't carry new values
+    for i, q in enumerate(QUESTION_KEYS):
+        at.selectbox[i].set_value(rng.choice(QUESTION_OPTIONS[q]))
+        recorder.run(at, 'answer')
+        # The rest are optional once no answer can change the season
+        if at.session_state.quiz_score.locked():
+            break
+
+    name = f"selfie_{seed}.jpg"
+    at.file_uploader[0].set_value((name, synthetic_selfie(seed, image_size), "image/jpeg"))
+    recorder.run(at, 'upload')
+
+    for feature, label in _PICK_BUTTONS.items():
+        if at.session_state.picking_mode != feature:
+            next(b for b in at.button if b.label == label).click()
+            recorder.run(at, 'pick_mode')
+        # A click on the photo, as streamlit_image_coordinates reports it
+        at.session_state[f"photo_{name}"] = {"x": rng.randrange(20, 380), "y": rng.randrange(20, 280)}
+        recorder.run(at, 'sample')
+    if not at.session_state.skin_color:
+        raise RuntimeError("sampling did not complete")
+
+    at.text_input[0].set_value(f"Client {seed}")
+    at.text_input[1].set_value(f"client{seed}@example.com")
+    next(b for b in at.button if "Continue to Booking" in str(b.label)).click()
+    recorder.run(at, 'book')
+    if not any("Thanks" in s.value for s in at.success):
+        raise RuntimeError("booking was not confirmed")
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def summarize(recorder, sessions, flows, elapsed, rss_before, rss_after):
+    """Aggregate a run into a JSON-friendly dict."""
+    from image_pipeline import image_memory_stats
+
+    steps = {}
+    for step, values in recorder.timings.items():
+        if values:
+            steps[step] = {
+                'reruns': len(values),
+                'p50_ms': round(statistics.median(values) * 1e3, 1),
+                'p95_ms': round(_percentile(values, 0.95) * 1e3, 1),
+                'p99_ms': round(_percentile(values, 0.99) * 1e3, 1),
+                'max_ms': round(max(values) * 1e3, 1),
+            }
+    if recorder.waits:
+        steps['queueing'] = {
+            'reruns': len(recorder.waits),
+            'p50_ms': round(statistics.median(recorder.waits) * 1e3, 1),
+            'p95_ms': round(_percentile(recorder.waits, 0.95) * 1e3, 1),
+            'p99_ms': round(_percentile(recorder.waits, 0.99) * 1e3, 1),
+            'max_ms': round(max(recorder.waits) * 1e3, 1),
+        }
+    reruns = sum(len(v) for v in recorder.timings.values())
+    completed = sessions * flows - len(recorder.errors)
+    images = image_memory_stats()
+    memory = {
+        'image_bytes_held': images['bytes'],
+        'largest_session_image_bytes': (max(images['session_bytes'].values())
+                                    if images['session_bytes'] else 0),
+    }
+    if rss_before is not None and rss_after is not None:
+        memory['rss_growth_bytes'] = rss_after - rss_before
+        memory['rss_growth_per_session'] = (rss_after - rss_before) // max(completed, 1)
+    return {
+        'sessions': sessions,
+        'flows_per_session': flows,
+        'completed_flows': completed,
+        'errors': recorder.errors,
+        'elapsed_s': round(elapsed, 2),
+        'flows_per_s': round(completed / elapsed, 3) if elapsed else 0.0,
+        'reruns_per_s': round(reruns / elapsed, 2) if elapsed else 0.0,
+        # Questions answered before the season settled (12 = never settled early)
+        'questions_per_flow': (round(len(recorder.timings['answer']) / (sessions * flows), 2)
+                               if sessions * flows else 0.0),
+        'steps': steps,
+        'memory': memory,
+    }
+
+
+def run_load(sessions=4, flows=1, image_size=(1200, 1600), sheet_backend="local", log=print):
+    """
+    Run `sessions` concurrent clients, each going through the flow `flows` times.
+
+    Returns:
+        summary dict (see summarize)
+    """
+    workdir = tempfile.mkdtemp(prefix="rfg-loadtest-")
+    os.environ.update({
+        "RFG_SHEET_BACKEND": sheet_backend,
+        "RFG_BOOKINGS_DB": os.path.join(workdir, "bookings.sqlite3"),
+        "RFG_BOOKING_QUEUE": os.path.join(workdir, "booking_queue.sqlite3"),
+        "RFG_LOCAL_SHEET": os.path.join(workdir, "local_sheet.csv"),
+    })
+    recorder = Recorder()
+
+    def session(index):
+        for flow in range(flows):
+            seed = index * 1000 + flow
+            try:
+                client_flow(recorder, seed, image_size)
+            except Exception as e:
+                recorder.errors.append(f"session {index} flow {flow}: {e}")
+        log(f"  session {index + 1}/{sessions} finished")
+
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(session, range(sessions)))
+    elapsed = time.perf_counter() - start
+    summary = summarize(recorder, sessions, flows, elapsed, rss_before, _rss_bytes())
+    summary['workdir'] = workdir
+    return summary
+
+
+def format_summary(summary):
+    lines = [
+        f"{summary['sessions']} sessions x {summary['flows_per_session']} flows: "
+        f"{summary['completed_flows']} completed in {summary['elapsed_s']} s "
+        f"({summary['flows_per_s']} flows/s, {summary['reruns_per_s']} reruns/s)",
+        f"Questions answered per flow: {summary['questions_per_flow']} of 12 (the rest skipped once the season settled)",
+        "",
+        f"{'step':<10} {'reruns':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}",
+    ]
+    for step in (*STEPS, 'queueing'):
+        s = summary['steps'].get(step)
+        if s:
+            lines.append(f"{step:<10} {s['reruns']:>7} {s['p50_ms']:>9} {s['p95_ms']:>9} "
+                         f"{s['p99_ms']:>9} {s['max_ms']:>9}")
+    memory = summary['memory']
+    lines += ["", f"Decoded images held: {memory['image_bytes_held'] / 2**20:.1f} MiB "
+                  f"(largest session {memory['largest_session_image_bytes'] / 2**20:.1f} MiB)"]
+    if 'rss_growth_bytes' in memory:
+        lines.append(f"RSS growth: {memory['rss_growth_bytes'] / 2**20:.1f} MiB "
+                     f"({memory['rss_growth_per_session'] / 2**20:.1f} MiB per completed flow)")
+    if summary['errors']:
+        lines += ["", f"{len(summary['errors'])} failed flows:"] + [f"  {e}" for e in summary['errors']]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the quiz flow with concurrent headless sessions.")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent clients")
+    parser.add_argument("--flows", type=int, default=1, help="full flows per client")
+    parser.add_argument("--image-size", default="1200x1600", help="synthetic selfie WIDTHxHEIGHT")
+    parser.add_argument("--sheet-backend", choices=("local", "fake", "none"), default="local",
+                        help="where bookings are exported (see app.get_bookings)")
+    parser.add_argument("--json", help="also write the summary as JSON here")
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.image_size.lower().split("x"))
+    summary = run_load(args.sessions, args.flows, (width, height), args.sheet_backend)
+    print()
+    print(format_summary(summary))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# RFG Palette System - Answer Lookup Table
+# Precomputes the quiz result for every possible combination of answers.
+#
+# Build with:  python lookup.py build
+#
+# The table is a flat file: a small header followed by one packed record per
+# answer combination, ordered by mixed-radix index (question order from
+# QUESTION_KEYS, option order from QUESTION_OPTIONS). It is memory-mapped on
+# load, so lookups don't read the whole file.
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from engine import (
+    SEASON_RECIPES,
+    TRAIT_RULES,
+    TRAIT_COMBOS,
+    QUESTION_KEYS,
+    QUESTION_OPTIONS,
+    TRAIT_KEYS,
+    confidence_label,
+)
+from batch import score_batch
+
+TABLE_MAGIC = b"RFGLUT01"
+HEADER_SIZE = 64
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "answer_table.bin")
+
+# One record per answer combination. Seasons are indexes into SEASON_RECIPES;
+# 'ranked' is every season, highest score first, and 'scores' the exact
+# determine_season() scores, so a hit needs no rescoring.
+RECORD_DTYPE = np.dtype([
+    ("confidence", np.uint8),
+    ("traits", np.uint8, (len(TRAIT_KEYS),)),
+    ("ranked", np.uint8, (len(SEASON_RECIPES),)),
+    ("scores", "<f8", (len(SEASON_RECIPES),)),
+])
+# The same record layout, for reading one record without numpy
+RECORD_STRUCT = struct.Struct(f"<B{len(TRAIT_KEYS)}B{len(SEASON_RECIPES)}B{len(SEASON_RECIPES)}d")
+
+RADICES = tuple(len(QUESTION_OPTIONS[q]) for q in QUESTION_KEYS)
+TABLE_SIZE = int(np.prod(RADICES))
+
+# Index weight of each question (first question is most significant)
+STRIDES = tuple(int(np.prod(RADICES[i + 1:])) for i in range(len(RADICES)))
+
+# Per question: option -> its contribution to the index (option position x stride)
+_OPTION_OFFSETS = tuple(
+    (q, {option: i * stride for i, option in enumerate(QUESTION_OPTIONS[q])})
+    for q, stride in zip(QUESTION_KEYS, STRIDES)
+)
+
+
+def table_fingerprint():
+    """
+    Hash of everything the table layout and contents depend on (recipes,
+    trait rules and the answer space).
+
+    A table whose header doesn't carry this exact digest is stale and is
+    never served.
+    """
+    payload = json.dumps({
+        "recipes": SEASON_RECIPES,
+        "rules": TRAIT_RULES,
+        "combos": TRAIT_COMBOS,
+        "questions": QUESTION_KEYS,
+        "options": QUESTION_OPTIONS,
+        "traits": TRAIT_KEYS,
+        "record": RECORD_DTYPE.descr,
+    }, sort_keys=False)
+    return hashlib.sha256(payload.encode("utf-8")).digest()
+
+
+def answer_index(answers):
+    """Mixed-radix index of a full set of answers, or None if any is missing/unknown."""
+    get = answers.get
+    index = 0
+    for q, offsets in _OPTION_OFFSETS:
+        offset = offsets.get(get(q))
+        if offset is None:
+            return None
+        index += offset
+    return index
+
+
+def _header(fingerprint):
+    header = TABLE_MAGIC + fingerprint + np.uint64(TABLE_SIZE).tobytes()
+    return header.ljust(HEADER_SIZE, b"\0")
+
+
+def build_table(path=DEFAULT_TABLE_PATH, chunk_size=1 << 18):
+    """
+    Enumerate every answer combination through the batch scorer into a table file.
+
+    Writes to a temporary file first and swaps it into place, so a reader
+    never sees a half-written table.
+    """
+    options = {q: np.asarray(QUESTION_OPTIONS[q]) for q in QUESTION_KEYS}
+    tmp_path = path + ".tmp"
+
+    with open(tmp_path, "wb") as f:
+        f.write(_header(table_fingerprint()))
+    records = np.memmap(tmp_path, dtype=RECORD_DTYPE, mode="r+",
+                        offset=HEADER_SIZE, shape=(TABLE_SIZE,))
+
+    for start in range(0, TABLE_SIZE, chunk_size):
+        stop = min(start + chunk_size, TABLE_SIZE)
+        digits = np.unravel_index(np.arange(start, stop), RADICES)
+        columns = {q: options[q][d] for q, d in zip(QUESTION_KEYS, digits)}
+        result = score_batch(columns)
+
+        chunk = records[start:stop]
+        chunk["confidence"] = result["confidence_percent"]
+        chunk["traits"] = result["traits"]
+        # Stable sort keeps tied seasons in recipe order, like determine_season()
+        chunk["ranked"] = np.argsort(-result["season_scores"], axis=1, kind="stable")
+        chunk["scores"] = result["season_scores"]
+
+    records.flush()
+    del records
+    os.replace(tmp_path, path)
+    return path
+
+
+class AnswerTable:
+    """A loaded (memory-mapped) answer table."""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.seasons = tuple(SEASON_RECIPES)
+
+    def lookup(self, answers):
+        """
+        Result for a full set of answers, or None if they aren't in the table.
+
+        Returns:
+            the determine_season() result plus 'traits', as
+            engine.quick_result() returns it
+        """
+        index = answer_index(answers)
+        if index is None:
+            return None
+        fields = RECORD_STRUCT.unpack_from(self.buffer, HEADER_SIZE + index * RECORD_STRUCT.size)
+        n_traits = len(TRAIT_KEYS)
+        n_seasons = len(self.seasons)
+        confidence_percent = fields[0]
+        order = fields[1 + n_traits:1 + n_traits + n_seasons]
+        scores = fields[1 + n_traits + n_seasons:]
+        ranked = [(self.seasons[i], scores[i]) for i in order]
+        return {
+            'season': ranked[0][0],
+            'confidence_percent': confidence_percent,
+            'confidence_label': confidence_label(confidence_percent),
+            'winner_score': ranked[0][1],
+            'runner_up': ranked[1][0],
+            'runner_score': ranked[1][1],
+            'ranked': ranked,
+            'traits': dict(zip(TRAIT_KEYS, fields[1:1 + n_traits])),
+        }
+
+
+def load_table(path=DEFAULT_TABLE_PATH):
+    """
+    Memory-map a table file.
+
+    Returns:
+        AnswerTable, or None if the file is missing, malformed or stale
+    """
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or not header.startswith(TABLE_MAGIC):
+            return None
+        fingerprint = header[len(TABLE_MAGIC):len(TABLE_MAGIC) + 32]
+        if fingerprint != table_fingerprint():
+            return None
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(buffer) != HEADER_SIZE + TABLE_SIZE * RECORD_STRUCT.size:
+        buffer.close()
+        return None
+    return AnswerTable(buffer)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or check the quiz answer lookup table.")
+    parser.add_argument("command", choices=["build", "check"])
+    parser.add_argument("--path", default=DEFAULT_TABLE_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build_table(args.path)
+        print(f"Wrote {TABLE_SIZE:,} records to {args.path}")
+        return 0
+
+    if load_table(args.path) is None:
+        print(f"{args.path} is missing or stale - rebuild with: python lookup.py build")
+        return 1
+    print(f"{args.path} is current")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+# RFG Palette System - Metrics
+# Opt-in timing spans around named phases of a rerun, aggregated into
+# histograms and exported in Prometheus text format.
+#
+# Enable with RFG_METRICS=1, then expose the histograms with one or both of:
+#   RFG_METRICS_PORT=9464           serve http://127.0.0.1:9464/metrics
+#   RFG_METRICS_FILE=/path/rfg.prom rewrite a textfile-collector file
+#
+# While disabled, span() hands back one shared no-op context manager, so an
+# instrumented phase costs a function call and an attribute check.
+#
+# Subsystems can also publish point-in-time values (memory held, cache
+# counts) with add_gauges(); those are read only when the metrics are
+# exported.
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_NAME = "rfg_phase_seconds"
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Minimum seconds between rewrites of the metrics file
+FILE_WRITE_INTERVAL = 10.0
+
+
+class Histogram:
+    """Latency histogram for one phase (per-bucket counts, summed up on export)."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Span:
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class MetricsRegistry:
+    """Histograms by phase name. Thread-safe."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        """Context manager timing one phase (a no-op while disabled)."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        """Copy of the histograms: phase -> (bucket counts, sum, count)."""
+        with self._lock:
+            return {name: (list(h.counts), h.total, h.count) for name, h in self._histograms.items()}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def add_gauges(self, source, collect):
+        """
+        Publish values read at export time.
+
+        Args:
+            source: name of the subsystem (registering it again replaces it)
+            collect: function returning a list of (metric name, type, help,
+                value), type being "gauge" or "counter"
+        """
+        with self._lock:
+            self._gauges[source] = collect
+
+    def collect_gauges(self):
+        """Current (metric name, type, help, value) of every registered source."""
+        with self._lock:
+            sources = list(self._gauges.items())
+        values = []
+        for _, collect in sorted(sources):
+            values.extend(collect())
+        return values
+
+    def render_prometheus(self):
+        """All histograms in Prometheus text exposition format."""
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent in each phase of a quiz rerun.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        for name, (counts, total, count) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, n in zip((*BUCKETS, "+Inf"), counts):
+                cumulative += n
+                le = bound if bound == "+Inf" else repr(bound)
+                lines.append(f'{METRIC_NAME}_bucket{{phase="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_sum{{phase="{name}"}} {total!r}')
+            lines.append(f'{METRIC_NAME}_count{{phase="{name}"}} {count}')
+        for name, kind, help_text, value in self.collect_gauges():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(enabled=os.environ.get("RFG_METRICS", "") not in ("", "0"))
+
+
+def span(name):
+    """Time a named phase on the process-wide registry."""
+    return registry.span(name) if registry.enabled else _NULL_SPAN
+
+
+def enable(on=True):
+    registry.enabled = on
+
+
+# ----- Export -----
+
+def write_prometheus_file(path):
+    """Atomically rewrite a Prometheus textfile with the current histograms."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(registry.render_prometheus())
+    os.replace(tmp_path, path)
+
+
+_last_file_write = [0.0]
+
+
+def maybe_write_file(path=None):
+    """Rewrite RFG_METRICS_FILE (or path) if FILE_WRITE_INTERVAL has passed."""
+    path = path or os.environ.get("RFG_METRICS_FILE")
+    if not path or not registry.enabled:
+        return False
+    now = time.monotonic()
+    if now - _last_file_write[0] < FILE_WRITE_INTERVAL:
+        return False
+    _last_file_write[0] = now
+    write_prometheus_file(path)
+    return True
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serve /metrics from a daemon thread. Returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,136 @@
+# RFG Palette System - Palette Registry
+# Parses palettes.py once per process into contiguous color arrays
+# (sRGB, linear RGB, CIELAB) for rendering and color comparisons.
+
+from functools import lru_cache
+
+import numpy as np
+
+from palettes import palettes
+
+# sRGB (D65) -> CIE XYZ
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+_XYZ_SCALED = (_RGB_TO_XYZ / _D65_WHITE[:, None]).T
+
+# Lab = f(X/Xn, Y/Yn, Z/Zn) @ _F_TO_LAB + _LAB_OFFSET
+_DELTA = 6 / 29
+_F_TO_LAB = np.array([
+    [0.0, 500.0, 0.0],
+    [116.0, -500.0, 200.0],
+    [0.0, 0.0, -200.0],
+])
+_LAB_OFFSET = np.array([-16.0, 0.0, 0.0])
+
+
+def hex_to_rgb(hex_code):
+    """'#RRGGBB' -> (r, g, b) ints 0-255."""
+    hex_code = hex_code.lstrip("#")
+    return tuple(int(hex_code[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _srgb_curve(c):
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+
+# Linear value of each 8-bit sRGB level
+_LINEAR_LUT = _srgb_curve(np.arange(256) / 255.0)
+
+
+def srgb_to_linear(rgb):
+    """sRGB values (0-255, any shape ending in 3) -> linear RGB floats 0-1."""
+    rgb = np.asarray(rgb)
+    if rgb.dtype.kind in "ui":
+        return _LINEAR_LUT[rgb]
+    return _srgb_curve(rgb / 255.0)
+
+
+def linear_to_lab(linear):
+    """Linear RGB floats 0-1 (any shape ending in 3) -> CIELAB (D65)."""
+    xyz = np.asarray(linear, dtype=np.float64) @ _XYZ_SCALED
+    f = np.where(xyz > _DELTA ** 3, np.cbrt(xyz), xyz / (3 * _DELTA ** 2) + 4 / 29)
+    return f @ _F_TO_LAB + _LAB_OFFSET
+
+
+def rgb_to_lab(rgb):
+    """sRGB values (uint8 0-255, any shape ending in 3) -> CIELAB (D65)."""
+    return linear_to_lab(srgb_to_linear(rgb))
+
+
+def _read_only(array):
+    array.setflags(write=False)
+    return array
+
+
+class PaletteRegistry:
+    """
+    Every palette color in one flat table.
+
+    Row i of each array describes the same color. Rows are grouped by season
+    in palettes.py order; season_slices maps a season to its rows.
+
+    Attributes:
+        names: tuple of color names
+        hex_codes: tuple of '#RRGGBB' strings
+        season_keys: tuple of season names
+        season_index: int array, row -> index into season_keys
+        season_slices: dict of season -> slice of rows
+        srgb: uint8 array (n, 3)
+        linear: float32 array (n, 3), linear RGB 0-1
+        lab: float32 array (n, 3), CIELAB (D65)
+    """
+
+    def __init__(self, palette_data):
+        names, hex_codes, season_index = [], [], []
+        self.season_keys = tuple(palette_data)
+        self.season_slices = {}
+        for s, season in enumerate(self.season_keys):
+            start = len(names)
+            for name, hex_code in palette_data[season].items():
+                names.append(name)
+                hex_codes.append(hex_code)
+                season_index.append(s)
+            self.season_slices[season] = slice(start, len(names))
+
+        self.names = tuple(names)
+        self.hex_codes = tuple(hex_codes)
+        self.season_index = _read_only(np.array(season_index, dtype=np.intp))
+        srgb = np.array([hex_to_rgb(h) for h in hex_codes], dtype=np.uint8).reshape(-1, 3)
+        linear = srgb_to_linear(srgb)
+        self.srgb = _read_only(srgb)
+        self.linear = _read_only(linear.astype(np.float32))
+        self.lab = _read_only(linear_to_lab(linear).astype(np.float32))
+
+        # Pre-rendered text for the results page and palette download
+        self._colors = {
+            season: tuple((names[i].title(), hex_codes[i]) for i in range(*rows.indices(len(names))))
+            for season, rows in self.season_slices.items()
+        }
+        self._palette_text = {
+            season: "\n".join(f"{name}: {hex_code}" for name, hex_code in colors)
+            for season, colors in self._colors.items()
+        }
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, season):
+        return season in self.season_slices
+
+    def colors(self, season):
+        """Tuple of (display name, hex code) for a season's palette."""
+        return self._colors[season]
+
+    def palette_text(self, season):
+        """Downloadable 'Name: #hex' text for a season's palette."""
+        return self._palette_text[season]
+
+
+@lru_cache(maxsize=1)
+def get_registry():
+    """The process-wide registry built from palettes.py."""
+    return PaletteRegistry(palettes)
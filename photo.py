@@ -0,0 +1,374 @@
+# RFG Palette System - Photo Analysis
+# Classifies colors sampled from a client photo (iris, hair, skin)
+
+from functools import lru_cache
+
+import numpy as np
+
+from palette_registry import get_registry, rgb_to_lab
+
+
+# ----- Color sampling -----
+
+# Pixels whose lightness sits further than this many (robust) standard
+# deviations from the patch median are treated as highlights or shadows.
+# The tolerance never drops below MIN_LIGHTNESS_TOLERANCE (L* units), so a
+# nearly flat patch still sheds a stray glint.
+OUTLIER_CUTOFF = 2.5
+MIN_LIGHTNESS_TOLERANCE = 2.0
+
+
+def rgb_to_hsv(rgb):
+    """
+    Vectorized colorsys.rgb_to_hsv.
+    
+    Args:
+        rgb: float array (..., 3) with channels 0-1
+    
+    Returns:
+        float array (..., 3) of hue, saturation, value, each 0-1
+    """
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    rangec = maxc - minc
+    chromatic = rangec > 0
+    safe_range = np.where(chromatic, rangec, 1.0)
+    
+    s = np.where(chromatic, rangec / np.where(maxc > 0, maxc, 1.0), 0.0)
+    rc = (maxc - r) / safe_range
+    gc = (maxc - g) / safe_range
+    bc = (maxc - b) / safe_range
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(chromatic, (h / 6.0) % 1.0, 0.0)
+    return np.stack([h, s, maxc], axis=-1)
+
+
+def _color_data(rgb, hsv, lab=None, pixels=1):
+    """Build the sampled-color dict stored in session state."""
+    r, g, b = rgb
+    h, s, v = hsv
+    color_data = {
+        'rgb': (r, g, b),
+        'hex': f"#{r:02x}{g:02x}{b:02x}",
+        'hsv': (int(h * 360), int(s * 100), int(v * 100)),
+        'pixels': pixels,
+    }
+    if lab is not None:
+        color_data['lab'] = tuple(round(float(c), 1) for c in lab)
+    return color_data
+
+
+def sample_color(image, x, y, radius=0, shape="square"):
+    """
+    Sample a color around (x, y) in a PIL image.
+    
+    Only the patch around the click is cropped and converted, so this stays
+    cheap on full-resolution phone photos. Within the patch, pixels whose
+    lightness is an outlier (specular highlights, shadows) are dropped and
+    the rest are averaged: RGB and Lab as plain means, HSV with a
+    saturation-weighted circular mean for hue.
+    
+    Args:
+        image: PIL image
+        x, y: pixel coordinates in image
+        radius: patch radius in pixels (0 = the single clicked pixel)
+        shape: "square" (a (2r+1) x (2r+1) patch) or "circle"
+    
+    Returns:
+        dict with 'rgb', 'hex', 'hsv' (degrees, %, %), 'lab' and 'pixels'
+        (how many pixels were averaged)
+    """
+    x = min(max(int(x), 0), image.width - 1)
+    y = min(max(int(y), 0), image.height - 1)
+    box = (max(x - radius, 0), max(y - radius, 0),
+           min(x + radius + 1, image.width), min(y + radius + 1, image.height))
+    patch = np.asarray(image.crop(box).convert("RGB"), dtype=np.uint8).reshape(-1, 3)
+    
+    if shape == "circle" and radius > 0:
+        yy, xx = np.mgrid[box[1]:box[3], box[0]:box[2]]
+        patch = patch[((xx - x) ** 2 + (yy - y) ** 2 <= radius ** 2).ravel()]
+    
+    lab = rgb_to_lab(patch)
+    hsv = rgb_to_hsv(patch / 255.0)
+    
+    if len(patch) == 1:
+        return _color_data(tuple(int(c) for c in patch[0]), hsv[0], lab[0])
+    
+    # Drop lightness outliers (median absolute deviation, scaled to ~1 sigma)
+    lightness = lab[:, 0]
+    median = np.median(lightness)
+    spread = 1.4826 * np.median(np.abs(lightness - median))
+    keep = np.abs(lightness - median) <= max(OUTLIER_CUTOFF * spread, MIN_LIGHTNESS_TOLERANCE)
+    patch, lab, hsv = patch[keep], lab[keep], hsv[keep]
+    
+    # Hue is an angle: average it on the circle, weighted by saturation
+    angle = hsv[:, 0] * 2 * np.pi
+    weight = hsv[:, 1]
+    hue = np.arctan2((weight * np.sin(angle)).sum(), (weight * np.cos(angle)).sum())
+    hue = (hue / (2 * np.pi)) % 1.0 if weight.sum() > 0 else 0.0
+    
+    mean_rgb = tuple(int(c) for c in np.rint(patch.mean(axis=0)))
+    # (rounded so float noise in the mean doesn't truncate 40% down to 39%)
+    mean_hsv = np.round((hue, hsv[:, 1].mean(), hsv[:, 2].mean()), 9)
+    return _color_data(mean_rgb, mean_hsv, lab.mean(axis=0), pixels=len(patch))
+
+
+def analyze_seasonal(iris, hair, skin):
+    """
+    Analyze iris, hair, and skin colors to suggest a season.
+    """
+    iris_h, iris_s, iris_v = iris['hsv']
+    hair_h, hair_s, hair_v = hair['hsv']
+    skin_h, skin_s, skin_v = skin['hsv']
+    
+    # UNDERTONE
+    if 20 <= skin_h <= 70:
+        undertone = "Warm"
+        undertone_reason = f"Skin hue {skin_h}° is in warm range"
+    elif skin_h >= 300 or skin_h <= 20:
+        undertone = "Cool"
+        undertone_reason = f"Skin hue {skin_h}° is in cool range"
+    else:
+        undertone = "Neutral"
+        undertone_reason = f"Skin hue {skin_h}° is between warm and cool"
+    
+    # VALUE
+    avg_value = (skin_v * 2 + hair_v + iris_v) / 4
+    if avg_value >= 65:
+        value = "Light"
+        value_reason = f"Average value {avg_value:.0f}% is light"
+    elif avg_value <= 40:
+        value = "Dark"
+        value_reason = f"Average value {avg_value:.0f}% is dark"
+    else:
+        value = "Medium"
+        value_reason = f"Average value {avg_value:.0f}% is medium"
+    
+    # CHROMA
+    avg_sat = (iris_s + hair_s) / 2
+    if avg_sat >= 50:
+        chroma = "Clear"
+        chroma_reason = f"Average saturation {avg_sat:.0f}% is high"
+    elif avg_sat <= 30:
+        chroma = "Muted"
+        chroma_reason = f"Average saturation {avg_sat:.0f}% is low"
+    else:
+        chroma = "Moderate"
+        chroma_reason = f"Average saturation {avg_sat:.0f}% is moderate"
+    
+    # SEASON
+    if undertone == "Warm":
+        if value == "Light" and chroma == "Clear":
+            season = "Spring"
+            season_reason = "Warm + light + clear = Spring"
+        elif chroma == "Muted":
+            season = "Autumn"
+            season_reason = "Warm + muted = Autumn family"
+        else:
+            season = "Spring/Autumn"
+            season_reason = "Warm undertone, mixed signals"
+    elif undertone == "Cool":
+        if chroma == "Muted" or value == "Light":
+            season = "Summer"
+            season_reason = "Cool + muted or light = Summer family"
+        elif chroma == "Clear" and value in ["Dark", "Medium"]:
+            season = "Winter"
+            season_reason = "Cool + clear + darker = Winter family"
+        else:
+            season = "Summer/Winter"
+            season_reason = "Cool undertone, mixed signals"
+    else:
+        if chroma == "Muted":
+            season = "Soft Summer or Soft Autumn"
+            season_reason = "Neutral + muted = Soft seasons"
+        else:
+            season = "Needs draping"
+            season_reason = "Neutral undertone - need in-person draping"
+    
+    return {
+        'undertone': undertone, 'undertone_reason': undertone_reason,
+        'value': value, 'value_reason': value_reason,
+        'chroma': chroma, 'chroma_reason': chroma_reason,
+        'season': season, 'season_reason': season_reason
+    }
+
+
+# ----- Nearest-season classification in CIELAB -----
+# Scores sampled colors by CIE76 distance (Euclidean in Lab) to every
+# palette color. With 120 palette colors a flat vectorized scan over the
+# prebuilt Lab matrix is faster than walking a tree index.
+
+# How much each sampled feature counts toward a season's distance
+FEATURE_WEIGHTS = {'iris': 1.0, 'hair': 1.0, 'skin': 2.0}
+_WEIGHTS = np.array(list(FEATURE_WEIGHTS.values())) / sum(FEATURE_WEIGHTS.values())
+
+
+class SeasonColorIndex:
+    """Palette colors in CIELAB, grouped by season for per-season nearest lookups."""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.lab = registry.lab.astype(np.float64)
+        self.lab_squared = (self.lab ** 2).sum(axis=1)
+        self.season_keys = registry.season_keys
+        self.season_starts = np.array(
+            [registry.season_slices[s].start for s in self.season_keys], dtype=np.intp
+        )
+
+    def distances(self, lab_samples):
+        """
+        Distance from each sample to its nearest color in every season.
+
+        Args:
+            lab_samples: float array (n_samples, 3)
+
+        Returns:
+            (season_distance, closest_row): season_distance has shape
+            (n_samples, n_seasons); closest_row is the registry row of each
+            sample's single closest palette color
+        """
+        # |x - y|^2 = |x|^2 - 2 x.y + |y|^2, with |y|^2 precomputed
+        squared = (lab_samples ** 2).sum(axis=1)[:, None] - 2 * lab_samples @ self.lab.T + self.lab_squared
+        dist = np.sqrt(np.maximum(squared, 0))
+        return np.minimum.reduceat(dist, self.season_starts, axis=1), dist.argmin(axis=1)
+
+
+@lru_cache(maxsize=1)
+def get_season_index():
+    """The process-wide Lab index built from palettes.py."""
+    return SeasonColorIndex(get_registry())
+
+
+def nearest_seasons(iris, hair, skin):
+    """
+    Rank seasons by how close the sampled colors sit to each season's palette.
+
+    Args:
+        iris, hair, skin: sampled color dicts with an 'rgb' tuple
+
+    Returns:
+        dict with keys:
+            - 'season': closest season name
+            - 'ranked': list of (season, distance) tuples, closest first;
+              distance is the weighted mean Lab distance of the samples to
+              that season's nearest colors
+            - 'nearest': dict of feature -> (season, color name, hex, distance)
+              for the single closest palette color to each sample
+    """
+    index = get_season_index()
+    features = {'iris': iris, 'hair': hair, 'skin': skin}
+    lab = rgb_to_lab([features[f]['rgb'][:3] for f in FEATURE_WEIGHTS])
+    nearest_distance, closest_row = index.distances(lab)
+
+    season_distance = _WEIGHTS @ nearest_distance
+    order = np.argsort(season_distance, kind="stable")
+
+    registry = index.registry
+    nearest = {}
+    for i, feature in enumerate(FEATURE_WEIGHTS):
+        row = int(closest_row[i])
+        s = int(registry.season_index[row])
+        nearest[feature] = (index.season_keys[s], registry.names[row],
+                            registry.hex_codes[row], float(nearest_distance[i, s]))
+
+    return {
+        'season': index.season_keys[order[0]],
+        'ranked': [(index.season_keys[s], float(season_distance[s])) for s in order],
+        'nearest': nearest,
+    }
+
+
+# ----- Dominant colors -----
+# Quantizes an image into its top colors: a strided pixel sample is binned
+# into a 15-bit (5 bits per channel) histogram, then the occupied bins are
+# clustered by weighted k-means in CIELAB with a fixed iteration budget.
+
+# Pixels sampled from the image (evenly strided) before binning
+DOMINANT_SAMPLE_PIXELS = 1 << 16
+DOMINANT_ITERATIONS = 12
+_BIN_BITS = 5
+
+
+def _sample_pixels(image, max_pixels):
+    # Grayscale, palette, CMYK, ... PIL images: sample their RGB rendering
+    # (PIL isn't imported here, so check by duck type)
+    if hasattr(image, "convert") and getattr(image, "mode", "RGB") not in ("RGB", "RGBA"):
+        image = image.convert("RGB")
+    pixels = np.asarray(image)
+    if pixels.ndim == 2:
+        pixels = np.repeat(pixels[:, :, None], 3, axis=2)
+    height, width = pixels.shape[:2]
+    step = max(1, int(np.ceil(np.sqrt(height * width / max_pixels))))
+    return pixels[::step, ::step, :3].reshape(-1, 3)
+
+
+def _seed_centers(lab, weights, k):
+    # Deterministic k-means++: start from the heaviest bin, then repeatedly
+    # take the bin with the most weight * squared distance to the chosen set
+    centers = [lab[np.argmax(weights)]]
+    nearest = ((lab - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        centers.append(lab[np.argmax(weights * nearest)])
+        nearest = np.minimum(nearest, ((lab - centers[-1]) ** 2).sum(axis=1))
+    return np.array(centers)
+
+
+def dominant_colors(image, n=6, max_pixels=DOMINANT_SAMPLE_PIXELS, iterations=DOMINANT_ITERATIONS):
+    """
+    Top-N dominant colors of an image.
+
+    Args:
+        image: PIL image in any mode, or uint8 array (height, width) for
+            grayscale or (height, width, 3 or 4)
+        n: number of colors to return (fewer if the image has fewer)
+        max_pixels: how many pixels to sample before clustering
+        iterations: k-means iteration budget
+
+    Returns:
+        list of dicts with 'rgb', 'hex' and 'share' (fraction of the image's
+        pixels), largest share first
+    """
+    pixels = _sample_pixels(image, max_pixels)
+    shift = 8 - _BIN_BITS
+    quantized = (pixels >> shift).astype(np.intp)
+    codes = (quantized[:, 0] << (2 * _BIN_BITS)) | (quantized[:, 1] << _BIN_BITS) | quantized[:, 2]
+
+    n_bins = 1 << (3 * _BIN_BITS)
+    counts = np.bincount(codes, minlength=n_bins)
+    occupied = np.flatnonzero(counts)
+    weights = counts[occupied].astype(np.float64)
+    # Mean actual color of each bin rather than the bin's corner
+    rgb = np.stack([np.bincount(codes, weights=pixels[:, c], minlength=n_bins)[occupied]
+                    for c in range(3)], axis=1) / weights[:, None]
+    lab = rgb_to_lab(rgb)
+
+    k = min(n, len(occupied))
+    centers = _seed_centers(lab, weights, k)
+    labels = None
+    for _ in range(iterations):
+        squared = (lab ** 2).sum(axis=1)[:, None] - 2 * lab @ centers.T + (centers ** 2).sum(axis=1)
+        new_labels = squared.argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        mass = np.bincount(labels, weights=weights, minlength=k)
+        for c in range(3):
+            total = np.bincount(labels, weights=weights * lab[:, c], minlength=k)
+            # An emptied cluster keeps its previous center
+            centers[:, c] = np.where(mass > 0, total / np.maximum(mass, 1e-12), centers[:, c])
+
+    mass = np.bincount(labels, weights=weights, minlength=k)
+    swatches = []
+    for cluster in np.argsort(-mass, kind="stable"):
+        if mass[cluster] == 0:
+            continue
+        members = labels == cluster
+        mean = (rgb[members] * weights[members, None]).sum(axis=0) / mass[cluster]
+        r, g, b = (int(v) for v in np.clip(np.rint(mean), 0, 255))
+        swatches.append({
+            'rgb': (r, g, b),
+            'hex': f"#{r:02x}{g:02x}{b:02x}",
+            'share': float(mass[cluster] / weights.sum()),
+        })
+    return swatches
@@ -0,0 +1,241 @@
+# RFG Palette System - Batch Photo Analysis
+# Samples iris/hair/skin colors from many photos at coordinates marked in
+# advance (the assisted-consult workflow) and classifies each one, without
+# the interactive picker.
+#
+# Usage:  python photo_batch.py marks.jsonl --out results.jsonl [--workers 4]
+#
+# The manifest is JSON Lines, one record per photo:
+#   {"id": "c-104", "image": "photos/c-104.jpg",
+#    "iris": [812, 640], "hair": [700, 180], "skin": [905, 1010]}
+# or a CSV with columns id, image, iris_x, iris_y, hair_x, hair_y, skin_x, skin_y.
+# Coordinates are pixels in the original photo; image paths are relative to
+# the manifest.
+#
+# Photos are decoded in a process pool, each straight to a working copy
+# (JPEG draft mode, see image_pipeline.open_working), and only a few are in
+# flight at a time, so memory stays flat however long the manifest is.
+# Results come out in manifest order; a record that fails gets an 'error'
+# instead of stopping the run.
+
+import argparse
+import csv
+import json
+import os
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from image_pipeline import DISPLAY_WIDTH, open_working
+from photo import analyze_seasonal, nearest_seasons, sample_color
+from storage import PHOTO_FEATURES
+
+# Patch radius in display pixels (DISPLAY_WIDTH wide), as the app's default
+# "7x7 patch"; scaled to each photo's working copy
+DEFAULT_RADIUS = 3
+# Records queued per worker; bounds how many photos are in memory at once
+IN_FLIGHT_PER_WORKER = 2
+# Palettes listed per photo in the nearest-palette ranking
+NEAREST_TOP = 3
+
+
+# ----- Manifest -----
+
+def _csv_record(row, number):
+    record = {'id': row.get('id') or str(number), 'image': row.get('image') or ''}
+    for feature in PHOTO_FEATURES:
+        x, y = row.get(f'{feature}_x'), row.get(f'{feature}_y')
+        try:
+            record[feature] = (float(x), float(y)) if x and y else None
+        except ValueError:
+            raise ValueError(f"bad {feature} coordinates ({x!r}, {y!r})")
+    return record
+
+
+def _json_record(line, number):
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("expected a JSON object")
+    record.setdefault('id', str(number))
+    return record
+
+
+def read_manifest(path):
+    """
+    Yield manifest records as dicts with 'id', 'image' and feature -> (x, y).
+
+    A record that can't be parsed yields {'id', 'image', 'error'} (id is its
+    line or row number) instead of stopping the read.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            lines = ((number, row, _csv_record) for number, row in enumerate(csv.DictReader(f), start=1))
+        else:
+            lines = ((number, line, _json_record) for number, line in enumerate(f, start=1) if line.strip())
+        for number, line, parse in lines:
+            try:
+                record = parse(line, number)
+            except ValueError as e:
+                yield {'id': str(number), 'image': None, 'error': f"record {number}: {type(e).__name__}: {e}"}
+                continue
+            record['image'] = os.path.join(base, str(record.get('image') or ''))
+            yield record
+
+
+# ----- Worker -----
+
+def analyze_record(record, radius=DEFAULT_RADIUS, shape="square"):
+    """
+    Decode one photo, sample the marked points and classify them.
+
+    Returns:
+        dict with 'id', 'image', 'size', 'colors' (feature -> rgb/hex/hsv),
+        the analyze_seasonal fields, 'nearest' (closest palettes by Lab
+        distance) and timings; or 'id', 'image' and 'error'
+    """
+    out = {'id': record.get('id'), 'image': record.get('image')}
+    if 'error' in record:
+        out['error'] = record['error']
+        return out
+    working = None
+    try:
+        missing = [f for f in PHOTO_FEATURES if not record.get(f)]
+        if missing:
+            raise ValueError(f"no coordinates for {', '.join(missing)}")
+
+        start = time.perf_counter()
+        original_size, working = open_working(record['image'])
+        decoded = time.perf_counter()
+
+        # Marks are in original pixels; the working copy may be downscaled
+        scale = working.width / original_size[0]
+        patch_radius = round(radius * working.width / min(DISPLAY_WIDTH, working.width))
+        colors = {}
+        for feature in PHOTO_FEATURES:
+            x, y = record[feature]
+            if not (0 <= x < original_size[0] and 0 <= y < original_size[1]):
+                raise ValueError(f"{feature} point ({x}, {y}) is outside the "
+                                 f"{original_size[0]}x{original_size[1]} photo")
+            colors[feature] = sample_color(working, x * scale, y * scale, patch_radius, shape)
+
+        analysis = analyze_seasonal(colors['iris'], colors['hair'], colors['skin'])
+        nearest = nearest_seasons(colors['iris'], colors['hair'], colors['skin'])
+        done = time.perf_counter()
+    except Exception as e:
+        out['error'] = f"{type(e).__name__}: {e}"
+        return out
+    finally:
+        if working is not None:
+            working.close()
+
+    out['size'] = list(original_size)
+    out['colors'] = {f: {'rgb': list(c['rgb']), 'hex': c['hex'], 'hsv': list(c['hsv'])}
+                     for f, c in colors.items()}
+    out.update(analysis)
+    out['nearest'] = [[season, round(float(distance), 1)] for season, distance in nearest['ranked'][:NEAREST_TOP]]
+    out['decode_ms'] = round((decoded - start) * 1e3, 1)
+    out['analyze_ms'] = round((done - decoded) * 1e3, 1)
+    return out
+
+
+# ----- Pool -----
+
+def analyze_batch(records, workers=None, radius=DEFAULT_RADIUS, shape="square"):
+    """
+    Analyze records across a process pool.
+
+    Yields:
+        one result per record (see analyze_record), in input order
+    """
+    workers = workers or os.cpu_count()
+    window = workers * IN_FLIGHT_PER_WORKER
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for record in records:
+            pending.append(pool.submit(analyze_record, record, radius, shape))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _max_child_rss_bytes():
+    # Linux reports ru_maxrss in KiB
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+
+
+def run(manifest, out, workers=None, radius=DEFAULT_RADIUS, shape="square", log=None):
+    """
+    Analyze every record of a manifest, writing JSON Lines to out.
+
+    Returns:
+        throughput report dict
+    """
+    start = time.perf_counter()
+    images = failed = 0
+    decode_ms = analyze_ms = 0.0
+    for result in analyze_batch(read_manifest(manifest), workers, radius, shape):
+        out.write(json.dumps(result) + "\n")
+        images += 1
+        if 'error' in result:
+            failed += 1
+            if log:
+                log(f"  {result['id']}: {result['error']}")
+        else:
+            decode_ms += result['decode_ms']
+            analyze_ms += result['analyze_ms']
+    elapsed = time.perf_counter() - start
+    succeeded = images - failed
+    return {
+        'images': images,
+        'failed': failed,
+        'workers': workers or os.cpu_count(),
+        'elapsed_s': round(elapsed, 2),
+        'images_per_s': round(images / elapsed, 2) if elapsed else 0.0,
+        'mean_decode_ms': round(decode_ms / succeeded, 1) if succeeded else None,
+        'mean_analyze_ms': round(analyze_ms / succeeded, 1) if succeeded else None,
+        'max_worker_rss_mib': round(_max_child_rss_bytes() / 2**20, 1),
+    }
+
+
+def format_report(report):
+    lines = [
+        f"Analyzed {report['images']:,} photos ({report['failed']:,} failed) in {report['elapsed_s']} s "
+        f"with {report['workers']} workers: {report['images_per_s']} images/s",
+    ]
+    if report['mean_decode_ms'] is not None:
+        lines.append(f"Per photo: decode {report['mean_decode_ms']} ms, "
+                     f"sample + classify {report['mean_analyze_ms']} ms (mean, in a worker)")
+    lines.append(f"Largest worker RSS: {report['max_worker_rss_mib']} MiB")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze many photos at pre-marked iris/hair/skin points.")
+    parser.add_argument("manifest", help="JSON Lines (or .csv) of id, image and coordinates")
+    parser.add_argument("--out", help="results as JSON Lines (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="decode processes (default: all cores)")
+    parser.add_argument("--radius", type=int, default=DEFAULT_RADIUS,
+                        help=f"patch radius in {DISPLAY_WIDTH}px display pixels (0 = single pixel)")
+    parser.add_argument("--shape", choices=("square", "circle"), default="square")
+    parser.add_argument("--report", help="also write the throughput report as JSON here")
+    args = parser.parse_args(argv)
+
+    log = lambda message: print(message, file=sys.stderr)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as out:
+            report = run(args.manifest, out, args.workers, args.radius, args.shape, log)
+    else:
+        report = run(args.manifest, sys.stdout, args.workers, args.radius, args.shape, log)
+    log(format_report(report))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+# RFG Palette System - Re-scoring Archived Submissions
+# Re-scores past submissions with the current engine and reports who would
+# flip seasons after a change to SEASON_RECIPES or the trait rules.
+#
+# Usage:  python export.py submissions.parquet
+#         python rescore.py submissions.parquet [--report flips.json]
+#
+# Each Parquet row group is one job for the process pool. Finished jobs are
+# recorded in a checkpoint file, so an interrupted run picks up where it
+# stopped when started again with the same arguments.
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from batch import score_batch
+from engine import QUESTION_KEYS, season_label
+from lookup import table_fingerprint
+
+# Confidence shift histogram: new minus stored confidence, in 10-point bins
+SHIFT_EDGES = np.arange(-100, 101, 10)
+# Flipped submission ids kept per season pair, as examples for the report
+EXAMPLES_PER_FLIP = 5
+
+_ANSWER_COLUMNS = [f'answer_{q}' for q in QUESTION_KEYS]
+
+
+def _empty_summary():
+    return {
+        'rows': 0,
+        'skipped': 0,
+        'flipped': 0,
+        'flips': {},
+        'examples': {},
+        'confidence_changed': 0,
+        'confidence_shift_sum': 0,
+        'confidence_shift_histogram': [0] * (len(SHIFT_EDGES) - 1),
+    }
+
+
+def rescore_row_group(path, index):
+    """
+    Re-score one row group of an export.
+
+    Rows with no answers at all (legacy sheet rows) are skipped.
+
+    Returns:
+        summary dict (see merge_summaries)
+    """
+    table = pq.ParquetFile(path).read_row_group(index, columns=['id', 'season', 'confidence', *_ANSWER_COLUMNS])
+    answers = {q: np.asarray(table.column(f'answer_{q}').to_pylist(), dtype=object) for q in QUESTION_KEYS}
+    answered = np.zeros(table.num_rows, dtype=bool)
+    for column in answers.values():
+        answered |= column != None  # noqa: E711 (elementwise None check)
+
+    summary = _empty_summary()
+    summary['skipped'] = int((~answered).sum())
+    if not answered.any():
+        return summary
+
+    ids = table.column('id').to_numpy(zero_copy_only=False)[answered]
+    old_season = np.asarray(table.column('season').to_pylist(), dtype=object)[answered]
+    old_confidence = table.column('confidence').to_numpy(zero_copy_only=False)[answered]
+    result = score_batch({q: column[answered] for q, column in answers.items()})
+    new_season = np.asarray(result['seasons'], dtype=object)[result['winner']]
+
+    flipped = new_season != old_season
+    flips = Counter(zip(old_season[flipped].tolist(), new_season[flipped].tolist()))
+    examples = {}
+    for row_id, old, new in zip(ids[flipped].tolist(), old_season[flipped].tolist(), new_season[flipped].tolist()):
+        pair = examples.setdefault(f"{old}|{new}", [])
+        if len(pair) < EXAMPLES_PER_FLIP:
+            pair.append(int(row_id))
+
+    has_confidence = ~np.isnan(old_confidence.astype(np.float64))
+    shift = result['confidence_percent'][has_confidence] - old_confidence[has_confidence].astype(np.int64)
+
+    summary['rows'] = int(answered.sum())
+    summary['flipped'] = int(flipped.sum())
+    summary['flips'] = {f"{old}|{new}": count for (old, new), count in flips.items()}
+    summary['examples'] = examples
+    summary['confidence_changed'] = int(np.count_nonzero(shift))
+    summary['confidence_shift_sum'] = int(shift.sum())
+    summary['confidence_shift_histogram'] = np.histogram(shift, SHIFT_EDGES)[0].tolist()
+    return summary
+
+
+def merge_summaries(summaries):
+    """
+    Combine per-row-group summaries.
+
+    Returns:
+        dict with 'rows' (re-scored), 'skipped' (no answers), 'flipped',
+        'flips' ('old|new' -> count), 'examples' ('old|new' -> submission ids),
+        'confidence_changed', 'confidence_shift_sum' and
+        'confidence_shift_histogram' (counts per SHIFT_EDGES bin)
+    """
+    total = _empty_summary()
+    for summary in summaries:
+        for key in ('rows', 'skipped', 'flipped', 'confidence_changed', 'confidence_shift_sum'):
+            total[key] += summary[key]
+        for pair, count in summary['flips'].items():
+            total['flips'][pair] = total['flips'].get(pair, 0) + count
+        for pair, ids in summary['examples'].items():
+            kept = total['examples'].setdefault(pair, [])
+            kept.extend(ids[:EXAMPLES_PER_FLIP - len(kept)])
+        total['confidence_shift_histogram'] = [
+            a + b for a, b in zip(total['confidence_shift_histogram'], summary['confidence_shift_histogram'])]
+    return total
+
+
+# ----- Checkpoints -----
+
+def run_key(path):
+    """
+    Identifies a run: the input file and the engine version. A checkpoint
+    from a different input or engine is never reused.
+    """
+    stat = os.stat(path)
+    return {
+        'input': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'engine': table_fingerprint().hex(),
+    }
+
+
+def load_checkpoint(checkpoint_path, key):
+    """Finished row groups (index -> summary) from a matching checkpoint, else {}."""
+    try:
+        with open(checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if checkpoint.get('key') != key:
+        return {}
+    return {int(i): summary for i, summary in checkpoint.get('done', {}).items()}
+
+
+def save_checkpoint(checkpoint_path, key, done):
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({'key': key, 'done': {str(i): s for i, s in sorted(done.items())}}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def rescore(path, checkpoint_path=None, workers=None, log=print):
+    """
+    Re-score every row group of an export across a process pool.
+
+    Args:
+        path: Parquet file written by export.py
+        checkpoint_path: where progress is recorded (default: path + '.rescore.json')
+        workers: pool size (default: all cores)
+
+    Returns:
+        merged summary (see merge_summaries)
+    """
+    checkpoint_path = checkpoint_path or path + ".rescore.json"
+    key = run_key(path)
+    groups = pq.ParquetFile(path).metadata.num_row_groups
+    done = load_checkpoint(checkpoint_path, key)
+    todo = [i for i in range(groups) if i not in done]
+    if done:
+        log(f"Resuming: {len(done)} of {groups} row groups already done")
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {pool.submit(rescore_row_group, path, i): i for i in todo}
+            for future in as_completed(futures):
+                done[futures[future]] = future.result()
+                save_checkpoint(checkpoint_path, key, done)
+                log(f"  row group {futures[future] + 1}/{groups} done ({len(done)}/{groups})")
+
+    return merge_summaries(done[i] for i in range(groups))
+
+
+def format_report(summary):
+    """Human-readable flip and confidence-shift report."""
+    rows = summary['rows']
+    lines = [f"Re-scored {rows:,} submissions ({summary['skipped']:,} without answers skipped)"]
+    if not rows:
+        return "\n".join(lines)
+
+    lines.append(f"Flipped season: {summary['flipped']:,} ({summary['flipped'] / rows:.2%})")
+    if summary['flips']:
+        lines += ["", "Flips (stored -> now):"]
+        for pair, count in sorted(summary['flips'].items(), key=lambda item: -item[1]):
+            old, new = pair.split("|")
+            examples = ", ".join(str(i) for i in summary['examples'].get(pair, []))
+            lines.append(f"  {season_label(old) if old != 'None' else '(none)':<15} -> "
+                         f"{season_label(new):<15} {count:>9,}   e.g. #{examples}")
+
+    net = Counter()
+    for pair, count in summary['flips'].items():
+        old, new = pair.split("|")
+        net[old] -= count
+        net[new] += count
+    lines += ["", "Net change per season:"]
+    for season, change in sorted(net.items(), key=lambda item: item[1]):
+        if change:
+            lines.append(f"  {season_label(season) if season != 'None' else '(none)':<15} {change:>+9,}")
+
+    histogram = summary['confidence_shift_histogram']
+    scored = sum(histogram)
+    if scored:
+        lines += ["", f"Confidence shift (now - stored): {summary['confidence_changed']:,} changed, "
+                      f"mean {summary['confidence_shift_sum'] / scored:+.2f} points"]
+        for low, high, count in zip(SHIFT_EDGES[:-1], SHIFT_EDGES[1:], histogram):
+            if count:
+                lines.append(f"  {low:>+4} to {high:>+4}  {count:>9,}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score archived submissions with the current engine.")
+    parser.add_argument("export", help="Parquet file written by export.py")
+    parser.add_argument("--checkpoint", help="progress file (default: <export>.rescore.json)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--report", help="also write the summary as JSON here")
+    args = parser.parse_args(argv)
+
+    summary = rescore(args.export, args.checkpoint, args.workers)
+    print()
+    print(format_report(summary))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nWrote {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
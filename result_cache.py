@@ -0,0 +1,87 @@
+# RFG Palette System - Result Cache
+# Quiz and photo results memoized per distinct input, shared by every
+# session in the process.
+#
+# A result depends only on the 12 answers and the three sampled colors, so
+# those (as plain tuples) are the cache key. Reruns that only change other
+# state - a favorite color, typing into the booking form - and the booking
+# submit itself are lookups instead of recomputing the engine and the
+# photo classifiers.
+#
+# Cached dicts are shared between sessions: treat them as read-only.
+
+from functools import lru_cache
+
+from engine import QUESTION_KEYS, quick_result
+from metrics import span
+
+# Distinct (answers, samples) inputs kept; least recently used go first
+RESULT_CACHE_SIZE = 4096
+
+
+def answers_key(answers):
+    """The answers as a tuple in QUESTION_KEYS order (None where unanswered)."""
+    return tuple(answers.get(q) for q in QUESTION_KEYS)
+
+
+def color_key(color):
+    """A sampled color dict as ((r, g, b), (h, s, v)), or None if not sampled."""
+    if not color:
+        return None
+    return tuple(color['rgb'][:3]), tuple(color['hsv'])
+
+
+@lru_cache(maxsize=RESULT_CACHE_SIZE)
+def _compute(answer_tuple, samples):
+    answers = {q: a for q, a in zip(QUESTION_KEYS, answer_tuple) if a is not None}
+    # From the answer table when one is attached (see engine.use_answer_table);
+    # quick_result() times the table hit or the live phases itself
+    result = quick_result(answers)
+    traits = result['traits']
+
+    photo_result = palette_match = None
+    if all(samples):
+        # Imported here: questionnaire-only results don't need numpy
+        from photo import analyze_seasonal, nearest_seasons
+        iris, hair, skin = ({'rgb': rgb, 'hsv': hsv} for rgb, hsv in samples)
+        with span("analyze_seasonal"):
+            photo_result = analyze_seasonal(iris, hair, skin)
+        with span("nearest_seasons"):
+            palette_match = nearest_seasons(iris, hair, skin)
+    return {
+        'traits': traits,
+        'result': result,
+        'photo_result': photo_result,
+        'palette_match': palette_match,
+    }
+
+
+def get_results(answers, iris=None, hair=None, skin=None):
+    """
+    Quiz and photo results for one client, computed once per distinct input.
+
+    Args:
+        answers: dict of question -> answer
+        iris, hair, skin: sampled color dicts with 'rgb' and 'hsv'
+
+    Returns:
+        dict with keys:
+            - 'traits': calculate_traits(answers)
+            - 'result': engine.quick_result(answers) (the determine_season()
+              result, plus 'traits')
+            - 'photo_result': analyze_seasonal(iris, hair, skin), or None
+              unless all three colors are sampled
+            - 'palette_match': nearest_seasons(iris, hair, skin), or None
+    """
+    samples = (color_key(iris), color_key(hair), color_key(skin))
+    return _compute(answers_key(answers), samples)
+
+
+def result_cache_stats():
+    """Hits, misses and size of the shared result cache."""
+    info = _compute.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+
+def clear_result_cache():
+    _compute.cache_clear()
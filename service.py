@@ -0,0 +1,427 @@
+# RFG Palette System - Scoring Service
+# Headless HTTP/JSON API around the engine, for partner sites and the mobile
+# app: no Streamlit session per user. Standard library only.
+#
+# Usage:  python service.py --port 8080 [--workers 4]
+#
+# Endpoints:
+#   GET  /questions          questions and their answer options
+#   POST /score              {"answers": {...}} -> one result
+#                            {"batch": [{...}, ...]} -> {"results": [...]}
+#   GET  /palettes           season keys and labels
+#   GET  /palettes/<season>  that season's colors
+#   GET  /health, /stats     liveness; request counts, latency, cache
+#   GET  /metrics            Prometheus text (with RFG_METRICS=1, see metrics.py)
+#
+# Connections are kept alive (HTTP/1.1). Each result is encoded once per
+# distinct answer set and then served from an LRU, so repeat answer sets
+# cost a dict lookup. --workers starts that many processes sharing the port
+# (SO_REUSEPORT), each running its own event loop.
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from collections import deque
+from functools import lru_cache
+
+from engine import (
+    QUESTION_KEYS,
+    QUESTION_OPTIONS,
+    SEASON_KEYS,
+    calculate_traits,
+    determine_season,
+    detect_tensions,
+    irl_tests_for,
+    season_label,
+)
+from metrics import registry as metrics_registry, span
+from palette_registry import get_registry
+
+DEFAULT_PORT = 8080
+
+# Distinct answer sets whose encoded result is kept
+SCORE_CACHE_SIZE = 65536
+# Answer sets accepted in one batch request
+MAX_BATCH = 1000
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 1 << 20
+# Seconds an idle kept-alive connection stays open
+KEEPALIVE_TIMEOUT = 15
+# Batch entries scored between yields to the event loop
+BATCH_CHUNK = 100
+# Recent request latencies kept for /stats
+LATENCY_WINDOW = 10000
+
+_STATUS_TEXT = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+                405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large",
+                500: "Internal Server Error"}
+
+# Partner sites call the API from the browser
+_CORS_HEADERS = (
+    b"Access-Control-Allow-Origin: *\r\n"
+    b"Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+    b"Access-Control-Allow-Headers: Content-Type\r\n"
+)
+
+_OPTION_SETS = {q: frozenset(QUESTION_OPTIONS[q]) for q in QUESTION_KEYS}
+
+
+class RequestError(Exception):
+    """A request the service refuses; carries the HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _encode(payload):
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+# ----- Scoring -----
+
+def answer_tuple(answers):
+    """
+    Validate an answers object and return it in QUESTION_KEYS order.
+
+    Unanswered questions may be left out or null. Raises RequestError for
+    unknown questions or options.
+    """
+    if not isinstance(answers, dict):
+        raise RequestError(400, "answers must be an object of question -> option")
+    unknown = [q for q in answers if q not in _OPTION_SETS]
+    if unknown:
+        raise RequestError(400, f"unknown question(s): {', '.join(sorted(map(str, unknown)))}")
+    values = []
+    for q in QUESTION_KEYS:
+        value = answers.get(q)
+        if value is not None and not isinstance(value, str):
+            raise RequestError(400, f"option for {q} must be a string, got {type(value).__name__}")
+        if value is not None and value not in _OPTION_SETS[q]:
+            raise RequestError(400, f"invalid option for {q}: {value!r}")
+        values.append(value)
+    return tuple(values)
+
+
+@lru_cache(maxsize=SCORE_CACHE_SIZE)
+def score_json(answers):
+    """
+    Full result for one answer tuple, as encoded JSON.
+
+    Returns:
+        bytes of an object with the season, confidence, runner-up, ranked
+        season scores, traits, tensions and in-person tests
+    """
+    traits = calculate_traits({q: a for q, a in zip(QUESTION_KEYS, answers) if a is not None})
+    result = determine_season(traits)
+    season, runner = result['season'], result['runner_up']
+    return _encode({
+        'season': season,
+        'season_label': season_label(season),
+        'confidence_percent': result['confidence_percent'],
+        'confidence_label': result['confidence_label'],
+        'winner_score': result['winner_score'],
+        'runner_up': runner,
+        'runner_up_label': season_label(runner),
+        'runner_score': result['runner_score'],
+        'ranked': result['ranked'],
+        'traits': traits,
+        'tensions': detect_tensions(traits),
+        'irl_tests': irl_tests_for(season, runner, traits),
+    })
+
+
+def _parse_json(body):
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise RequestError(400, "body is not valid JSON")
+
+
+def score_request(body):
+    """
+    Handle a POST /score body.
+
+    Returns:
+        (encoded response, list of answer tuples still to score) - the list
+        is non-empty only for batches, which are finished by score_batch_json
+    """
+    request = _parse_json(body)
+    if not isinstance(request, dict):
+        raise RequestError(400, "expected an object with 'answers' or 'batch'")
+    if 'batch' in request:
+        batch = request['batch']
+        if not isinstance(batch, list):
+            raise RequestError(400, "batch must be a list of answers objects")
+        if len(batch) > MAX_BATCH:
+            raise RequestError(413, f"batch is limited to {MAX_BATCH} answer sets")
+        return None, [answer_tuple(answers) for answers in batch]
+    if 'answers' in request:
+        return score_json(answer_tuple(request['answers'])), None
+    raise RequestError(400, "expected an object with 'answers' or 'batch'")
+
+
+async def score_batch_json(answer_sets):
+    """Encoded {"results": [...]} for a batch, yielding to the loop between chunks."""
+    parts = []
+    for i in range(0, len(answer_sets), BATCH_CHUNK):
+        if i:
+            # Other connections get a turn during big batches
+            await asyncio.sleep(0)
+        parts.append(b",".join(score_json(a) for a in answer_sets[i:i + BATCH_CHUNK]))
+    return b'{"results":[' + b",".join(parts) + b"]}"
+
+
+# ----- Static payloads -----
+
+@lru_cache(maxsize=1)
+def questions_json():
+    return _encode({'questions': [{'key': q, 'options': list(QUESTION_OPTIONS[q])} for q in QUESTION_KEYS]})
+
+
+@lru_cache(maxsize=1)
+def palettes_json():
+    return _encode({'seasons': [{'key': s, 'label': season_label(s)} for s in SEASON_KEYS]})
+
+
+@lru_cache(maxsize=None)
+def palette_json(season):
+    registry = get_registry()
+    if season not in registry:
+        raise RequestError(404, f"unknown season: {season}")
+    return _encode({
+        'season': season,
+        'label': season_label(season),
+        'colors': [{'name': name, 'hex': hex_code} for name, hex_code in registry.colors(season)],
+    })
+
+
+# ----- Routing -----
+
+class ServiceStats:
+    """Request counts and recent latencies for /stats."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.connections = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self):
+        values = sorted(self.latencies)
+        info = score_json.cache_info()
+        stats = {
+            'pid': os.getpid(),
+            'uptime_s': round(time.time() - self.started, 1),
+            'requests': self.requests,
+            'errors': self.errors,
+            'connections': self.connections,
+            'score_cache': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize},
+        }
+        if values:
+            stats['latency_ms'] = {
+                'p50': round(values[len(values) // 2] * 1e3, 3),
+                'p99': round(values[min(len(values) - 1, int(len(values) * 0.99))] * 1e3, 3),
+                'max': round(values[-1] * 1e3, 3),
+            }
+        return stats
+
+
+stats = ServiceStats()
+
+
+def handle_request(method, path, body=b""):
+    """
+    Route one request.
+
+    Returns:
+        (status, encoded JSON body or None, answer tuples of a batch still to
+        score or None)
+    """
+    path = path.split("?", 1)[0]
+    if method == "OPTIONS":
+        return 204, None, None
+    if path == "/score":
+        if method != "POST":
+            raise RequestError(405, "use POST")
+        with span("service_score"):
+            payload, batch = score_request(body)
+        return 200, payload, batch
+    if method != "GET":
+        raise RequestError(405, "use GET")
+    if path == "/questions":
+        return 200, questions_json(), None
+    if path == "/palettes":
+        return 200, palettes_json(), None
+    if path.startswith("/palettes/"):
+        return 200, palette_json(path[len("/palettes/"):]), None
+    if path == "/health":
+        return 200, b'{"status":"ok"}', None
+    if path == "/stats":
+        return 200, _encode(stats.snapshot()), None
+    if path == "/metrics":
+        return 200, metrics_registry.render_prometheus().encode("utf-8"), None
+    raise RequestError(404, f"no such endpoint: {path}")
+
+
+# ----- HTTP -----
+
+def _response(status, body, keep_alive, content_type=b"application/json"):
+    head = [b"HTTP/1.1 %d %s\r\n" % (status, _STATUS_TEXT.get(status, "Error").encode("ascii")),
+            _CORS_HEADERS]
+    if body is not None:
+        head.append(b"Content-Type: %s\r\nContent-Length: %d\r\n" % (content_type, len(body)))
+    else:
+        head.append(b"Content-Length: 0\r\n")
+    head.append(b"Connection: keep-alive\r\n\r\n" if keep_alive else b"Connection: close\r\n\r\n")
+    return b"".join(head) + (body or b"")
+
+
+async def _read_request(reader):
+    """(method, path, version, headers, body), or None when the client is done."""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise RequestError(413, "request headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise RequestError(400, "malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+
+    body = b""
+    if 'transfer-encoding' in headers:
+        raise RequestError(411, "send a Content-Length (chunked bodies aren't supported)")
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise RequestError(400, "Content-Length must be a non-negative integer")
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413, f"body is limited to {MAX_BODY_BYTES} bytes")
+    if length:
+        try:
+            body = await reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            # Client went away mid-body
+            return None
+    return method, path, version, headers, body
+
+
+def _keep_alive(version, headers):
+    connection = headers.get('connection', '').lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+async def _serve_connection(reader, writer):
+    stats.connections += 1
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except RequestError as e:
+                stats.errors += 1
+                writer.write(_response(e.status, _encode({'error': str(e)}), keep_alive=False))
+                break
+            if request is None:
+                break
+            method, path, version, headers, body = request
+            keep_alive = _keep_alive(version, headers)
+
+            start = time.perf_counter()
+            stats.requests += 1
+            try:
+                status, payload, batch = handle_request(method, path, body)
+                if batch is not None:
+                    payload = await score_batch_json(batch)
+            except RequestError as e:
+                stats.errors += 1
+                status, payload = e.status, _encode({'error': str(e)})
+            except Exception:
+                logging.exception("Error handling %s %s", method, path)
+                stats.errors += 1
+                status, payload = 500, _encode({'error': "internal error"})
+            content_type = b"text/plain; version=0.0.4" if path == "/metrics" else b"application/json"
+            writer.write(_response(status, payload, keep_alive, content_type))
+            stats.latencies.append(time.perf_counter() - start)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, reuse_port=False, ready=None):
+    """Run the service until cancelled."""
+    # Warm the engine, registry and static payloads before taking traffic
+    score_json(tuple(QUESTION_OPTIONS[q][0] for q in QUESTION_KEYS))
+    questions_json(), palettes_json()
+    for season in SEASON_KEYS:
+        palette_json(season)
+
+    server = await asyncio.start_server(_serve_connection, host, port, reuse_port=reuse_port)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+def _worker(host, port):
+    try:
+        asyncio.run(serve(host, port, reuse_port=True))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the scoring engine over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes sharing the port, one event loop each")
+    args = parser.parse_args(argv)
+
+    print(f"Scoring service on http://{args.host}:{args.port} ({args.workers} worker(s))")
+    if args.workers <= 1:
+        try:
+            asyncio.run(serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    # Exit cleanly on SIGTERM too, so the (daemon) workers are stopped with us
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    workers = [multiprocessing.Process(target=_worker, args=(args.host, args.port), daemon=True)
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# RFG Palette System - Google Sheets Connection
+# One authorized Sheets client per process: credentials parsed once, tokens
+# refreshed before they expire, one pooled HTTP session, and the worksheet
+# handle fetched once and reused for every append.
+#
+# Without it every write paid for a credentials parse, a token exchange, a
+# fresh TLS connection and an open_by_key metadata fetch before the row
+# itself went out.
+#
+# Usage:
+#   connection = get_connection(credentials_info)
+#   connection.append_rows(rows)
+#   connection.stats()      # health, token and latency numbers
+#
+# api_base points the client somewhere other than sheets.googleapis.com
+# (see fake_sheets.py for a local stand-in of the API).
+
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import gspread
+import requests
+from google.auth.transport.requests import AuthorizedSession, Request
+from google.oauth2.service_account import Credentials
+from gspread.http_client import HTTPClient
+
+SHEET_KEY = '1t0mh7E_oQp78Lf4ADwX_t1ctGKSxNCvhYbcij0LIPtc'
+SCOPE = ['https://spreadsheets.google.com/feeds',
+         'https://www.googleapis.com/auth/drive']
+
+GOOGLE_API_BASE = "https://sheets.googleapis.com"
+
+# Refresh the access token when it has less than this many seconds left
+REFRESH_MARGIN = 300
+# Keep-alive connections held open to the API
+POOL_SIZE = 4
+# (connect, read) timeout per request, in seconds
+REQUEST_TIMEOUT = (5, 30)
+# Recent request latencies kept for the stats
+LATENCY_WINDOW = 200
+
+
+class _RoutedHTTPClient(HTTPClient):
+    """gspread's HTTP client, with the API host swapped for api_base."""
+
+    api_base = GOOGLE_API_BASE
+
+    def request(self, method, endpoint, *args, **kwargs):
+        if self.api_base != GOOGLE_API_BASE and endpoint.startswith(GOOGLE_API_BASE):
+            endpoint = self.api_base + endpoint[len(GOOGLE_API_BASE):]
+        return super().request(method, endpoint, *args, **kwargs)
+
+
+def _pooled_session(session=None):
+    session = session or requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class SheetsConnection:
+    """
+    Authorized access to one spreadsheet, shared by every caller. Thread-safe.
+
+    Args:
+        credentials_info: service account dict (st.secrets["gcp_service_account"])
+        sheet_key: spreadsheet id
+        api_base: Sheets API root (default: Google's)
+        refresh_margin: seconds before expiry at which the token is renewed
+    """
+
+    def __init__(self, credentials_info, sheet_key=SHEET_KEY, api_base=GOOGLE_API_BASE,
+                 refresh_margin=REFRESH_MARGIN):
+        self.sheet_key = sheet_key
+        self.api_base = api_base.rstrip("/")
+        self.refresh_margin = refresh_margin
+        self._credentials = Credentials.from_service_account_info(credentials_info, scopes=SCOPE)
+        self._token_request = Request(_pooled_session())
+        self._session = _pooled_session(AuthorizedSession(self._credentials, auth_request=self._token_request))
+        self._client = None
+        self._worksheet = None
+        self._lock = threading.RLock()
+
+        self.requests = 0
+        self.errors = 0
+        self.token_refreshes = 0
+        self.worksheet_opens = 0
+        self.last_error = None
+        self.last_success = None
+        self.last_failure = None
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    # ----- Token -----
+
+    def _token_seconds_left(self):
+        expiry = self._credentials.expiry
+        if not self._credentials.token or expiry is None:
+            return None
+        # google-auth keeps expiry as naive UTC
+        return (expiry.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).total_seconds()
+
+    def ensure_token(self):
+        """Refresh the access token if it is missing or close to expiry."""
+        with self._lock:
+            left = self._token_seconds_left()
+            if left is not None and left > self.refresh_margin:
+                return
+            self._call('token', lambda: self._credentials.refresh(self._token_request))
+            self.token_refreshes += 1
+
+    # ----- Worksheet -----
+
+    def worksheet(self):
+        """The spreadsheet's first worksheet, opened once."""
+        with self._lock:
+            self.ensure_token()
+            if self._worksheet is None:
+                if self._client is None:
+                    self._client = gspread.Client(auth=None, session=self._session, http_client=_RoutedHTTPClient)
+                    self._client.http_client.api_base = self.api_base
+                    self._client.set_timeout(REQUEST_TIMEOUT)
+                self._worksheet = self._call('open', lambda: self._client.open_by_key(self.sheet_key).sheet1)
+                self.worksheet_opens += 1
+            return self._worksheet
+
+    def _call(self, kind, func):
+        start = time.perf_counter()
+        try:
+            result = func()
+        except Exception as e:
+            with self._lock:
+                self.requests += 1
+                self.errors += 1
+                self.last_error = f"{kind}: {e}"
+                self.last_failure = time.time()
+                self._latencies.append((kind, time.perf_counter() - start))
+            raise
+        with self._lock:
+            self.requests += 1
+            self.last_success = time.time()
+            self._latencies.append((kind, time.perf_counter() - start))
+        return result
+
+    def append_rows(self, rows):
+        """Append rows to the sheet. Raises on failure."""
+        worksheet = self.worksheet()
+        try:
+            self._call('append', lambda: worksheet.append_rows(rows))
+        except gspread.exceptions.APIError as e:
+            code = getattr(e, "code", None)
+            with self._lock:
+                if code == 401:
+                    # Revoked token: fetch a new one on the next attempt
+                    self._credentials.token = None
+                elif code == 404:
+                    # Sheet moved or recreated: open it again
+                    self._worksheet = None
+            raise
+
+    # ----- Stats -----
+
+    def stats(self):
+        """
+        Connection health and latency.
+
+        Returns:
+            dict with 'healthy', 'requests', 'errors', 'last_error',
+            'seconds_since_success', 'token_refreshes', 'token_seconds_left',
+            'worksheet_opens' and per-kind ('open', 'append', 'token')
+            latency p50/p95/max in ms over the last LATENCY_WINDOW calls
+        """
+        with self._lock:
+            latencies = list(self._latencies)
+            left = self._token_seconds_left()
+            stats = {
+                # Healthy until a call fails, and again once one succeeds
+                'healthy': self.last_failure is None or (self.last_success or 0) > self.last_failure,
+                'requests': self.requests,
+                'errors': self.errors,
+                'last_error': self.last_error,
+                'seconds_since_success': (round(time.time() - self.last_success, 1)
+                                          if self.last_success else None),
+                'token_refreshes': self.token_refreshes,
+                'token_seconds_left': round(left) if left is not None else None,
+                'worksheet_opens': self.worksheet_opens,
+                'latency_ms': {},
+            }
+        for kind in ('open', 'append', 'token'):
+            values = sorted(seconds for k, seconds in latencies if k == kind)
+            if values:
+                stats['latency_ms'][kind] = {
+                    'p50': round(values[len(values) // 2] * 1e3, 1),
+                    'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1e3, 1),
+                    'max': round(values[-1] * 1e3, 1),
+                }
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._session.close()
+            self._token_request.session.close()
+
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def get_connection(credentials_info, sheet_key=SHEET_KEY, api_base=GOOGLE_API_BASE):
+    """The process-wide connection for this service account and spreadsheet."""
+    key = (credentials_info.get('client_email'), sheet_key, api_base)
+    with _connections_lock:
+        connection = _connections.get(key)
+        if connection is None:
+            connection = _connections[key] = SheetsConnection(credentials_info, sheet_key, api_base)
+        return connection
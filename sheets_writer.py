@@ -0,0 +1,307 @@
+# RFG Palette System - Google Sheets Writer
+# Queues bookings locally and appends them to the bookings sheet from a
+# background thread, so form submits never wait on the Sheets API.
+#
+# Rows are written to a SQLite queue before submit() returns, then flushed in
+# batches with a single append_rows call. Failed batches stay queued and are
+# retried with exponential backoff, so quota errors and restarts don't lose
+# bookings.
+
+import csv
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from metrics import span
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "booking_queue.sqlite3")
+
+# Rows per append_rows call
+BATCH_SIZE = 50
+# Seconds the worker waits for new rows before checking the queue again
+FLUSH_INTERVAL = 2.0
+# Seconds the worker lingers after a submit so a burst shares one batch
+LINGER = 0.25
+# Retry delay after the first failure; doubles per attempt up to MAX_BACKOFF
+BASE_BACKOFF = 2.0
+MAX_BACKOFF = 300.0
+
+
+def _format_hsv(color_data):
+    if color_data and 'hsv' in color_data:
+        h, s, v = color_data['hsv']
+        return f"H{h} S{s} V{v}"
+    return ""
+
+
+def _format_hex(color_data):
+    if color_data and 'hex' in color_data:
+        return color_data['hex']
+    return ""
+
+
+def booking_row(booking_data, timestamp=None):
+    """
+    Lay out a booking as one sheet row.
+
+    Args:
+        booking_data: dict built by the booking form
+        timestamp: datetime of the submit (default: now)
+
+    Returns:
+        list of cell values in sheet column order
+    """
+    timestamp = (timestamp or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+    return [
+        timestamp,
+        booking_data.get('name', ''),
+        booking_data.get('email', ''),
+        booking_data.get('phone', ''),
+        booking_data.get('notes', ''),
+        booking_data.get('season', ''),
+        str(booking_data.get('confidence', '')),
+        # Photo analysis results
+        booking_data.get('photo_season', ''),
+        booking_data.get('undertone', ''),
+        booking_data.get('value', ''),
+        booking_data.get('chroma', ''),
+        # Iris color
+        _format_hex(booking_data.get('iris_color')),
+        _format_hsv(booking_data.get('iris_color')),
+        # Hair color
+        _format_hex(booking_data.get('hair_color')),
+        _format_hsv(booking_data.get('hair_color')),
+        # Skin color
+        _format_hex(booking_data.get('skin_color')),
+        _format_hsv(booking_data.get('skin_color')),
+        # Favorite colors (comma-separated hex codes)
+        ', '.join(booking_data.get('favorite_colors', []))
+    ]
+
+
+# ----- Durable queue -----
+
+class BookingQueue:
+    """
+    Rows waiting to be written, stored in SQLite.
+
+    A row leaves the queue only after the sheet has accepted it. Safe to use
+    from several threads.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " row TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt REAL NOT NULL DEFAULT 0,"
+            " last_error TEXT)"
+        )
+
+    def put(self, row):
+        """Store a row; it is on disk when this returns."""
+        with self._lock:
+            self._db.execute("INSERT INTO pending (row) VALUES (?)", (json.dumps(row),))
+
+    def take(self, limit, now=None):
+        """Oldest rows due for an attempt, as a list of (id, row, attempts)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            found = self._db.execute(
+                "SELECT id, row, attempts FROM pending WHERE next_attempt <= ? ORDER BY id LIMIT ?",
+                (now, limit)).fetchall()
+        return [(row_id, json.loads(row), attempts) for row_id, row, attempts in found]
+
+    def done(self, ids):
+        """Remove rows the sheet has accepted."""
+        with self._lock:
+            self._db.executemany("DELETE FROM pending WHERE id = ?", [(i,) for i in ids])
+
+    def retry_later(self, ids, delay, error):
+        """Count a failed attempt and hold the rows back for delay seconds."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE pending SET attempts = attempts + 1, next_attempt = ?, last_error = ? WHERE id = ?",
+                [(time.time() + delay, error, i) for i in ids])
+
+    def next_due(self):
+        """Time the earliest queued row becomes due, or None if the queue is empty."""
+        with self._lock:
+            return self._db.execute("SELECT MIN(next_attempt) FROM pending").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# ----- Sheet backends -----
+# A backend needs one method, append_rows(rows), which raises on failure.
+
+class GoogleSheet:
+    """
+    The bookings sheet, written through the process-wide pooled connection
+    (see sheets_client.py).
+
+    The Google client stack is imported on the first write (on the writer
+    thread), not when the app starts.
+    """
+
+    def __init__(self, credentials_info, sheet_key=None, api_base=None):
+        self.credentials_info = credentials_info
+        self.sheet_key = sheet_key
+        self.api_base = api_base
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            from sheets_client import GOOGLE_API_BASE, SHEET_KEY, get_connection
+            self._connection = get_connection(self.credentials_info, self.sheet_key or SHEET_KEY,
+                                              self.api_base or GOOGLE_API_BASE)
+        return self._connection
+
+    def append_rows(self, rows):
+        self.connection.append_rows(rows)
+
+    def stats(self):
+        # Nothing to report before the first write
+        return self._connection.stats() if self._connection is not None else None
+
+
+class LocalSheet:
+    """
+    Stand-in for the bookings sheet, for development and testing.
+
+    Keeps appended rows in memory (and in a CSV file if a path is given).
+    Set fail_next to make the next N append_rows calls raise.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.rows = []
+        self.calls = 0
+        self.fail_next = 0
+        self._lock = threading.Lock()
+
+    def append_rows(self, rows):
+        with self._lock:
+            self.calls += 1
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                raise RuntimeError("simulated Sheets API error")
+            self.rows.extend(rows)
+            if self.path:
+                with open(self.path, "a", newline="", encoding="utf-8") as f:
+                    csv.writer(f).writerows(rows)
+
+
+# ----- Background writer -----
+
+class SheetsWriter:
+    """
+    Background thread that drains a BookingQueue into a sheet backend.
+
+    Args:
+        queue: BookingQueue
+        sheet: backend with append_rows(rows)
+        batch_size: rows per append_rows call
+        flush_interval: seconds to wait for new rows between queue checks
+        linger: seconds to wait after a submit before writing
+
+    Only one writer should drain a given queue.
+    """
+
+    def __init__(self, queue, sheet, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, linger=LINGER):
+        self.queue = queue
+        self.sheet = sheet
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.linger = linger
+        self.written = 0
+        self.failures = 0
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sheets-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, booking_data, timestamp=None):
+        """Queue a booking for the sheet. Returns once it is stored locally."""
+        self.queue.put(booking_row(booking_data, timestamp))
+        self._wake.set()
+
+    def _backoff(self, attempts):
+        delay = min(BASE_BACKOFF * 2 ** attempts, MAX_BACKOFF)
+        return delay * random.uniform(0.5, 1.0)
+
+    def flush_once(self):
+        """
+        Write one batch of due rows.
+
+        Returns:
+            number of rows written (0 if nothing was due or the write failed)
+        """
+        batch = self.queue.take(self.batch_size)
+        if not batch:
+            return 0
+        ids = [row_id for row_id, _, _ in batch]
+        try:
+            with span("sheets_write"):
+                self.sheet.append_rows([row for _, row, _ in batch])
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            attempts = max(attempts for _, _, attempts in batch)
+            self.queue.retry_later(ids, self._backoff(attempts), self.last_error)
+            return 0
+        self.queue.done(ids)
+        self.written += len(ids)
+        return len(ids)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.flush_once() == self.batch_size:
+                continue
+            due = self.queue.next_due()
+            wait = self.flush_interval if due is None else min(max(due - time.time(), 0.05), self.flush_interval)
+            if self._wake.wait(wait):
+                self._stop.wait(self.linger)
+            self._wake.clear()
+
+    def flush(self, timeout=30.0):
+        """Block until the queue is empty or timeout passes. Returns True if empty."""
+        deadline = time.time() + timeout
+        while len(self.queue) and time.time() < deadline:
+            self._wake.set()
+            time.sleep(0.05)
+        return len(self.queue) == 0
+
+    def stop(self, timeout=5.0):
+        """Stop the worker thread (queued rows stay on disk for next time)."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'pending': len(self.queue),
+            'written': self.written,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            # Connection health and latency, for backends that report them
+            'sheet': self.sheet.stats() if hasattr(self.sheet, 'stats') else None,
+        }
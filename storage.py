@@ -0,0 +1,269 @@
+# RFG Palette System - Booking Storage
+# Where submitted bookings are kept. The primary store is a local SQLite
+# database with one typed column per answer, trait, season score and photo
+# color, so past submissions can be queried and re-scored without touching
+# Google Sheets. Sheets (and any other destination) is an export sink.
+
+import json
+import logging
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from engine import QUESTION_KEYS, TRAIT_KEYS, SEASON_KEYS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bookings.sqlite3")
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+PHOTO_FEATURES = ('iris', 'hair', 'skin')
+
+# (column, SQL type) in table order. Answer, trait and score columns follow
+# engine's QUESTION_KEYS, TRAIT_KEYS and SEASON_KEYS.
+COLUMNS = (
+    [('created_at', 'TEXT NOT NULL'),
+     ('name', 'TEXT'),
+     ('email', 'TEXT'),
+     ('phone', 'TEXT'),
+     ('notes', 'TEXT'),
+     ('season', 'TEXT'),
+     ('confidence', 'INTEGER'),
+     ('runner_up', 'TEXT'),
+     ('photo_season', 'TEXT'),
+     ('undertone', 'TEXT'),
+     ('value', 'TEXT'),
+     ('chroma', 'TEXT')]
+    + [(f'answer_{q}', 'TEXT') for q in QUESTION_KEYS]
+    + [(f'trait_{t}', 'INTEGER') for t in TRAIT_KEYS]
+    + [(f'score_{s}', 'REAL') for s in SEASON_KEYS]
+    + [(f'{feature}_{part}', kind) for feature in PHOTO_FEATURES
+       for part, kind in (('hex', 'TEXT'), ('h', 'INTEGER'), ('s', 'INTEGER'), ('v', 'INTEGER'))]
+    + [('favorite_colors', 'TEXT')]
+)
+COLUMN_NAMES = tuple(name for name, _ in COLUMNS)
+
+INDEXES = {
+    'idx_bookings_season': 'season',
+    'idx_bookings_created_at': 'created_at',
+    'idx_bookings_email': 'email',
+}
+
+
+def booking_record(booking_data, created_at=None):
+    """
+    Flatten a booking into one value per column in COLUMNS.
+
+    Args:
+        booking_data: dict built by the booking form; 'answers', 'traits' and
+            'season_scores' are dicts keyed by question, trait and season
+        created_at: datetime of the submit (default: now)
+
+    Returns:
+        dict of column name -> value
+    """
+    record = {
+        'created_at': (created_at or datetime.now()).strftime(TIMESTAMP_FORMAT),
+        'favorite_colors': json.dumps(list(booking_data.get('favorite_colors') or [])),
+    }
+    for key in ('name', 'email', 'phone', 'notes', 'season', 'runner_up',
+                'photo_season', 'undertone', 'value', 'chroma'):
+        record[key] = booking_data.get(key)
+    record['confidence'] = booking_data.get('confidence')
+
+    answers = booking_data.get('answers') or {}
+    traits = booking_data.get('traits') or {}
+    scores = booking_data.get('season_scores') or {}
+    for q in QUESTION_KEYS:
+        record[f'answer_{q}'] = answers.get(q)
+    for t in TRAIT_KEYS:
+        record[f'trait_{t}'] = traits.get(t)
+    for s in SEASON_KEYS:
+        record[f'score_{s}'] = scores.get(s)
+
+    for feature in PHOTO_FEATURES:
+        color = booking_data.get(f'{feature}_color') or {}
+        h, s, v = color.get('hsv') or (None, None, None)
+        record[f'{feature}_hex'] = color.get('hex')
+        record[f'{feature}_h'], record[f'{feature}_s'], record[f'{feature}_v'] = h, s, v
+    return record
+
+
+class BookingStore(ABC):
+    """
+    Somewhere bookings are saved.
+
+    Subclasses implement save(). Stores that can be read back set queryable
+    and implement query() (see SQLiteStore.query); check queryable before
+    calling it.
+    """
+
+    queryable = False
+
+    @abstractmethod
+    def save(self, booking_data, created_at=None):
+        """Store or export one booking."""
+
+    def close(self):
+        pass
+
+
+class SQLiteStore(BookingStore):
+    """
+    Bookings in a local SQLite database (WAL mode, safe to share between
+    threads).
+
+    Columns added to COLUMNS later (e.g. a new question) are added to an
+    existing database on open.
+    """
+
+    queryable = True
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(f"{name} {kind}" for name, kind in COLUMNS)
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS bookings (id INTEGER PRIMARY KEY AUTOINCREMENT, {columns})")
+        existing = {row[1] for row in self._db.execute("PRAGMA table_info(bookings)")}
+        for name, kind in COLUMNS:
+            if name not in existing:
+                self._db.execute(f"ALTER TABLE bookings ADD COLUMN {name} {kind.replace(' NOT NULL', '')}")
+        for index, column in INDEXES.items():
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS {index} ON bookings ({column})")
+        self._insert = (f"INSERT INTO bookings ({', '.join(COLUMN_NAMES)}) "
+                        f"VALUES ({', '.join('?' * len(COLUMN_NAMES))})")
+
+    def save(self, booking_data, created_at=None):
+        """Store a booking. Returns its row id."""
+        record = booking_record(booking_data, created_at)
+        with self._lock:
+            cursor = self._db.execute(self._insert, [record[name] for name in COLUMN_NAMES])
+        return cursor.lastrowid
+
+    def query(self, season=None, email=None, since=None, until=None, columns=None, limit=None):
+        """
+        Stored bookings, oldest first.
+
+        Args:
+            season: only bookings whose quiz season is this
+            email: only bookings from this email address
+            since, until: datetime bounds on created_at (until is exclusive)
+            columns: column names to return (default: all, plus 'id')
+            limit: maximum number of rows
+
+        Returns:
+            list of dicts
+        """
+        columns = list(columns) if columns else ['id', *COLUMN_NAMES]
+        unknown = set(columns) - set(COLUMN_NAMES) - {'id'}
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+
+        where, params = [], []
+        for column, op, value in (('season', '=', season), ('email', '=', email),
+                                  ('created_at', '>=', since), ('created_at', '<', until)):
+            if value is not None:
+                where.append(f"{column} {op} ?")
+                params.append(value.strftime(TIMESTAMP_FORMAT) if isinstance(value, datetime) else value)
+        sql = f"SELECT {', '.join(columns)} FROM bookings"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def iter_rows(self, columns=None, batch_size=10000):
+        """
+        Stream every booking in id order, batch_size rows at a time.
+
+        Reads through a separate read-only connection, so a long export
+        doesn't block new bookings.
+
+        Yields:
+            lists of tuples in the order of columns (default: 'id' plus COLUMN_NAMES)
+        """
+        columns = list(columns) if columns else ['id', *COLUMN_NAMES]
+        unknown = set(columns) - set(COLUMN_NAMES) - {'id'}
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+        reader = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            cursor = reader.execute(f"SELECT {', '.join(columns)} FROM bookings ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            reader.close()
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class SheetsSink(BookingStore):
+    """Exports bookings to Google Sheets through a background SheetsWriter."""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def save(self, booking_data, created_at=None):
+        self.writer.submit(booking_data, created_at)
+
+    def close(self):
+        self.writer.stop()
+
+
+class Bookings:
+    """
+    A primary store plus optional export sinks.
+
+    A booking counts as saved once the primary store has it; a failing sink is
+    logged and never fails the booking.
+    """
+
+    def __init__(self, primary, sinks=()):
+        self.primary = primary
+        self.sinks = list(sinks)
+
+    def save(self, booking_data):
+        """Save to the primary store, then export to each sink. Returns the primary's id."""
+        created_at = datetime.now()
+        booking_id = self.primary.save(booking_data, created_at)
+        for sink in self.sinks:
+            try:
+                sink.save(booking_data, created_at)
+            except Exception:
+                logger.exception("Export to %s failed for booking %s", type(sink).__name__, booking_id)
+        return booking_id
+
+    def query(self, **filters):
+        """
+        Bookings from the primary store (see SQLiteStore.query for filters).
+
+        Raises:
+            TypeError: if the primary store can't be read back
+        """
+        if not self.primary.queryable:
+            raise TypeError(f"{type(self.primary).__name__} can't be queried")
+        return self.primary.query(**filters)
+
+    def close(self):
+        for store in [*self.sinks, self.primary]:
+            store.close()
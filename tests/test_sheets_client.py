@@ -0,0 +1,116 @@
+# RFG Palette System - Sheets connection tests
+# Run the real client stack (google-auth, gspread, requests) against
+# FakeSheetsServer on a local port.
+
+import gspread
+import pytest
+
+from fake_sheets import FakeSheetsServer
+from sheets_client import SheetsConnection, get_connection
+
+
+@pytest.fixture
+def server():
+    server = FakeSheetsServer().start()
+    yield server
+    server.stop()
+
+
+def connect(server, **kwargs):
+    return SheetsConnection(server.credentials_info(), server.sheet_key, server.url, **kwargs)
+
+
+def test_token_and_worksheet_reused_across_appends(server):
+    connection = connect(server)
+    connection.append_rows([["row 0"]])
+    opened = server.counters['metadata']
+    for n in range(1, 3):
+        connection.append_rows([[f"row {n}"]])
+
+    assert server.rows == [["row 0"], ["row 1"], ["row 2"]]
+    assert server.counters['tokens'] == 1
+    assert server.counters['metadata'] == opened
+    assert server.counters['appends'] == 3
+    stats = connection.stats()
+    assert stats['healthy'] and stats['errors'] == 0
+    assert stats['token_refreshes'] == 1 and stats['worksheet_opens'] == 1
+    connection.close()
+
+
+def test_token_refreshed_before_expiry(server):
+    # Tokens that expire within the refresh margin are renewed before use
+    server.token_lifetime = 600
+    connection = connect(server, refresh_margin=900)
+    connection.append_rows([["a"]])
+    connection.append_rows([["b"]])
+
+    assert server.counters['tokens'] == 2
+    assert connection.stats()['token_refreshes'] == 2
+    assert connection.stats()['worksheet_opens'] == 1
+    connection.close()
+
+
+def test_revoked_token_is_replaced(server):
+    connection = connect(server)
+    connection.append_rows([["a"]])
+    server.revoke_tokens()
+    connection.append_rows([["b"]])
+
+    assert server.rows == [["a"], ["b"]]
+    assert server.counters['tokens'] == 2
+    connection.close()
+
+
+def test_persistent_401_fails_then_recovers(server):
+    connection = connect(server)
+    connection.append_rows([["a"]])
+    server.fail_next = [401] * 5
+    with pytest.raises(gspread.exceptions.APIError):
+        connection.append_rows([["lost"]])
+    assert not connection.stats()['healthy']
+
+    server.fail_next = []
+    connection.append_rows([["b"]])
+    stats = connection.stats()
+    assert stats['healthy'] and stats['errors'] == 1
+    assert stats['token_refreshes'] == 2
+    assert server.rows == [["a"], ["b"]]
+    connection.close()
+
+
+def test_missing_sheet_raises(server):
+    connection = SheetsConnection(server.credentials_info(), "no-such-sheet", server.url)
+    with pytest.raises(gspread.exceptions.SpreadsheetNotFound):
+        connection.append_rows([["a"]])
+
+    assert server.rows == []
+    stats = connection.stats()
+    assert stats['errors'] == 1 and not stats['healthy'] and stats['worksheet_opens'] == 0
+    connection.close()
+
+
+def test_404_on_append_reopens_the_worksheet(server):
+    connection = connect(server)
+    connection.append_rows([["a"]])
+    server.fail_next = [404]
+    with pytest.raises(gspread.exceptions.APIError) as failure:
+        connection.append_rows([["lost"]])
+    assert failure.value.code == 404
+
+    connection.append_rows([["b"]])
+    assert connection.stats()['worksheet_opens'] == 2
+    assert server.rows == [["a"], ["b"]]
+    connection.close()
+
+
+def test_one_connection_and_worksheet_per_process(server):
+    info = server.credentials_info()
+    first = get_connection(info, server.sheet_key, server.url)
+    first.append_rows([["a"]])
+    second = get_connection(info, server.sheet_key, server.url)
+    second.append_rows([["b"]])
+
+    assert first is second
+    assert first.stats()['worksheet_opens'] == 1
+    assert server.counters['tokens'] == 1
+    assert get_connection(info, "other-sheet", server.url) is not first
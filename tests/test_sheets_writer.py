@@ -0,0 +1,132 @@
+# RFG Palette System - Booking queue and Sheets writer tests
+# Run against LocalSheet (the in-memory stand-in) and a temp queue file.
+
+import threading
+from datetime import datetime
+
+import pytest
+
+import sheets_writer
+from sheets_writer import BookingQueue, LocalSheet, SheetsWriter
+
+TIMESTAMP = datetime(2026, 1, 2, 3, 4, 5)
+
+
+def booking(n):
+    return {'name': f"Client {n}", 'email': f"client{n}@example.com", 'season': 'soft_summer'}
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "booking_queue.sqlite3")
+
+
+def stopped_writer(queue, sheet, **kwargs):
+    """A writer whose thread is stopped, so the test drives flush_once()."""
+    writer = SheetsWriter(queue, sheet, **kwargs)
+    writer.stop()
+    return writer
+
+
+def names(rows):
+    return [row[1] for row in rows]
+
+
+def test_queue_survives_restart(queue_path):
+    queue = BookingQueue(queue_path)
+    for n in range(3):
+        queue.put(sheets_writer.booking_row(booking(n), TIMESTAMP))
+    queue.close()
+
+    reopened = BookingQueue(queue_path)
+    assert len(reopened) == 3
+    assert names(row for _, row, _ in reopened.take(10)) == ["Client 0", "Client 1", "Client 2"]
+    reopened.close()
+
+
+def test_writer_sends_batches(queue_path):
+    queue, sheet = BookingQueue(queue_path), LocalSheet()
+    writer = stopped_writer(queue, sheet, batch_size=50)
+    for n in range(120):
+        writer.submit(booking(n), TIMESTAMP)
+
+    assert [writer.flush_once() for _ in range(4)] == [50, 50, 20, 0]
+    assert sheet.calls == 3
+    assert names(sheet.rows) == [f"Client {n}" for n in range(120)]
+    assert len(queue) == 0
+    queue.close()
+
+
+def test_failed_batch_backs_off_and_retries(queue_path):
+    queue, sheet = BookingQueue(queue_path), LocalSheet()
+    writer = stopped_writer(queue, sheet)
+    writer.submit(booking(1), TIMESTAMP)
+    sheet.fail_next = 1
+
+    assert writer.flush_once() == 0
+    assert writer.failures == 1 and "simulated" in writer.last_error
+    assert len(queue) == 1
+    # Held back for the backoff delay: not due now, due later
+    assert queue.take(10) == []
+    (row_id, row, attempts), = queue.take(10, now=queue.next_due())
+    assert attempts == 1
+
+    queue.retry_later([row_id], 0.0, "cleared for the test")
+    assert writer.flush_once() == 1
+    assert names(sheet.rows) == ["Client 1"]
+    queue.close()
+
+
+def test_backoff_doubles_up_to_the_cap(queue_path):
+    queue = BookingQueue(queue_path)
+    writer = stopped_writer(queue, LocalSheet())
+    for attempts in range(12):
+        delay = writer._backoff(attempts)
+        cap = min(sheets_writer.BASE_BACKOFF * 2 ** attempts, sheets_writer.MAX_BACKOFF)
+        assert cap / 2 <= delay <= cap
+    queue.close()
+
+
+def test_no_rows_lost_or_duplicated(queue_path, monkeypatch):
+    monkeypatch.setattr(sheets_writer, "BASE_BACKOFF", 0.01)
+    queue, sheet = BookingQueue(queue_path), LocalSheet()
+    sheet.fail_next = 3
+    writer = SheetsWriter(queue, sheet, batch_size=7, flush_interval=0.05, linger=0.0)
+
+    def submit_many(start):
+        for n in range(start, start + 50):
+            writer.submit(booking(n), TIMESTAMP)
+
+    threads = [threading.Thread(target=submit_many, args=(start,)) for start in range(0, 200, 50)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert writer.flush(timeout=30)
+    writer.stop()
+
+    assert writer.failures == 3
+    assert sorted(names(sheet.rows)) == sorted(f"Client {n}" for n in range(200))
+    queue.close()
+
+
+def test_rows_queued_before_restart_are_written_once(queue_path):
+    failing = LocalSheet()
+    failing.fail_next = 1
+    queue = BookingQueue(queue_path)
+    writer = stopped_writer(queue, failing)
+    for n in range(5):
+        writer.submit(booking(n), TIMESTAMP)
+    assert writer.flush_once() == 0
+    queue.close()
+
+    # Next process: same queue file, healthy sheet
+    queue, sheet = BookingQueue(queue_path), LocalSheet()
+    writer = stopped_writer(queue, sheet)
+    for row_id, _, _ in queue.take(10, now=float("inf")):
+        queue.retry_later([row_id], 0.0, None)
+    assert writer.flush_once() == 5
+    assert writer.flush_once() == 0
+    assert names(sheet.rows) == [f"Client {n}" for n in range(5)]
+    assert failing.rows == []
+    queue.close()
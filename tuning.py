@@ -0,0 +1,289 @@
+# RFG Palette System - Recipe Tuning
+# Searches SEASON_RECIPES weights against in-person draping outcomes.
+#
+# Usage:  python tuning.py draping_results.csv --out candidate_recipes.py
+#
+# The CSV needs one column per quiz question (see engine.QUESTION_KEYS) plus
+# the season the client draped as (default column: draped_season). Traits
+# are computed once; each candidate recipe table is then scored with the
+# batch scorer, fanned out across a process pool.
+
+import argparse
+import copy
+import csv
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from batch import calculate_traits_batch, determine_season_batch
+from engine import SEASON_RECIPES, QUESTION_KEYS, season_label
+
+# Share of rows used for the quick first pass that rejects weak candidates
+SAMPLE_FRACTION = 0.2
+# How far below the incumbent (sample accuracy) a candidate may land and
+# still get a full evaluation
+REJECT_MARGIN = 0.01
+
+
+def load_labeled(path, label_column="draped_season"):
+    """
+    Read labeled draping outcomes from a CSV file.
+
+    Returns:
+        (columns, labels) where columns maps each question key to an array of
+        answers and labels is an int array indexing into SEASON_RECIPES order
+    """
+    seasons = {season: i for i, season in enumerate(SEASON_RECIPES)}
+    columns = {q: [] for q in QUESTION_KEYS}
+    labels = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            label = (row.get(label_column) or "").strip().lower().replace(" ", "_")
+            if label not in seasons:
+                raise ValueError(f"{path}:{line}: unknown season '{row.get(label_column)}'")
+            labels.append(seasons[label])
+            for q in QUESTION_KEYS:
+                columns[q].append(row.get(q) or None)
+    if not labels:
+        raise ValueError(f"{path}: no labeled rows")
+    return {q: np.asarray(v) for q, v in columns.items()}, np.asarray(labels, dtype=np.intp)
+
+
+def evaluate(recipes, traits, labels, bins=10):
+    """
+    Score a recipe table against known outcomes.
+
+    Returns:
+        dict with keys:
+            - 'accuracy': share of clients whose winner matches their draping
+            - 'confusion': int array (draped season x predicted season)
+            - 'calibration': list of (low, high, count, mean_confidence, accuracy)
+              per confidence bin
+    """
+    result = determine_season_batch(traits, recipes)
+    n_seasons = len(result['seasons'])
+    predicted = result['winner']
+    correct = predicted == labels
+    confidence = result['confidence_percent']
+
+    confusion = np.bincount(labels * n_seasons + predicted, minlength=n_seasons * n_seasons)
+
+    calibration = []
+    edges = np.linspace(0, 100, bins + 1)
+    which = np.minimum(np.digitize(confidence, edges[1:-1], right=True), bins - 1)
+    for b in range(bins):
+        in_bin = which == b
+        count = int(in_bin.sum())
+        if count:
+            calibration.append((int(edges[b]), int(edges[b + 1]), count,
+                                float(confidence[in_bin].mean()), float(correct[in_bin].mean())))
+
+    return {
+        'accuracy': float(correct.mean()) if len(labels) else 0.0,
+        'confusion': confusion.reshape(n_seasons, n_seasons),
+        'calibration': calibration,
+    }
+
+
+# ----- Process pool workers -----
+# Each worker receives the traits matrix once (via the pool initializer) and
+# then only gets candidate recipe tables.
+
+_worker_data = {}
+
+
+def _init_worker(traits, labels, sample):
+    _worker_data['traits'] = traits
+    _worker_data['labels'] = labels
+    _worker_data['sample'] = sample
+
+
+def _accuracy(recipes, rows=None):
+    traits, labels = _worker_data['traits'], _worker_data['labels']
+    if rows is not None:
+        traits, labels = traits[rows], labels[rows]
+    winner = determine_season_batch(traits, recipes)['winner']
+    return float((winner == labels).mean())
+
+
+def _score_candidate(job):
+    """Return full accuracy for a candidate, or None if the quick pass rejects it."""
+    recipes, reject_below = job
+    if _accuracy(recipes, _worker_data['sample']) < reject_below:
+        return None
+    return _accuracy(recipes)
+
+
+# ----- Search -----
+
+def _with_weight(recipes, season, trait, weight):
+    candidate = copy.deepcopy(recipes)
+    candidate[season][trait] = weight
+    return candidate
+
+
+def _coordinate_candidates(recipes, step):
+    """Nudge every recipe weight up and down by one step."""
+    candidates = []
+    for season, recipe in recipes.items():
+        for trait, w in recipe.items():
+            for delta in (step, -step):
+                weight = round(w + delta, 2)
+                if weight > 0:
+                    candidates.append(_with_weight(recipes, season, trait, weight))
+    return candidates
+
+
+def _random_candidates(recipes, step, rng, count=48, changes=3):
+    """Perturb a few random weights at a time."""
+    entries = [(s, t) for s, recipe in recipes.items() for t in recipe]
+    candidates = []
+    for _ in range(count):
+        candidate = copy.deepcopy(recipes)
+        for season, trait in rng.sample(entries, min(changes, len(entries))):
+            weight = round(candidate[season][trait] + rng.gauss(0, step), 1)
+            candidate[season][trait] = max(weight, 0.1)
+        candidates.append(candidate)
+    return candidates
+
+
+def tune_recipes(traits, labels, recipes=SEASON_RECIPES, method="coordinate",
+                 rounds=20, step=0.4, min_step=0.1, seed=0, workers=None, log=print):
+    """
+    Search recipe weights that match more draping outcomes.
+
+    Candidates are scored in parallel (all cores by default). Each is first
+    scored on a fixed sample of clients and only gets a full evaluation if it
+    comes close to the incumbent there. The step halves whenever a round
+    finds no improvement.
+
+    Returns:
+        (best_recipes, best_accuracy)
+    """
+    if len(labels) == 0:
+        raise ValueError("no labeled clients to tune against")
+    rng = random.Random(seed)
+    sample = np.sort(np.random.default_rng(seed).choice(
+        len(labels), size=max(1, int(len(labels) * SAMPLE_FRACTION)), replace=False))
+    if method == "coordinate":
+        generate = _coordinate_candidates
+    else:
+        generate = partial(_random_candidates, rng=rng)
+
+    best = copy.deepcopy(recipes)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             initializer=_init_worker,
+                             initargs=(traits, labels, sample)) as pool:
+        _init_worker(traits, labels, sample)
+        best_accuracy = _accuracy(best)
+        log(f"start: accuracy {best_accuracy:.2%}")
+
+        for round_number in range(1, rounds + 1):
+            reject_below = _accuracy(best, sample) - REJECT_MARGIN
+            candidates = generate(best, step)
+            jobs = [(candidate, reject_below) for candidate in candidates]
+            scores = list(pool.map(_score_candidate, jobs, chunksize=max(1, len(jobs) // 64)))
+
+            scored = [(score, i) for i, score in enumerate(scores) if score is not None]
+            rejected = len(scores) - len(scored)
+            top_score, top = max(scored, key=lambda pair: pair[0], default=(None, None))
+            if top_score is not None and top_score > best_accuracy:
+                best, best_accuracy = candidates[top], top_score
+                log(f"round {round_number}: accuracy {best_accuracy:.2%} "
+                    f"({len(candidates)} candidates, {rejected} rejected early)")
+            else:
+                step = round(step / 2, 3)
+                log(f"round {round_number}: no improvement, step -> {step}")
+                if step < min_step:
+                    break
+
+    return best, best_accuracy
+
+
+# ----- Reporting -----
+
+def format_recipes(recipes):
+    """Render a recipe table as Python source, laid out like SEASON_RECIPES."""
+    width = max(len(season) for season in recipes) + 3
+    lines = ["SEASON_RECIPES = {"]
+    for season, recipe in recipes.items():
+        key = f'"{season}":'
+        weights = ", ".join(f'"{trait}": {w!r}' for trait, w in recipe.items())
+        lines.append(f"    {key.ljust(width)} {{{weights}}},")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def recipe_changes(old, new):
+    """List of 'season.trait: old -> new' lines for weights that differ."""
+    changes = []
+    for season, recipe in new.items():
+        for trait, w in recipe.items():
+            before = old.get(season, {}).get(trait)
+            if before != w:
+                changes.append(f"{season}.{trait}: {before} -> {w}")
+    return changes
+
+
+def format_report(report):
+    """Human-readable accuracy, confusion and calibration summary."""
+    seasons = list(SEASON_RECIPES)
+    lines = [f"Accuracy: {report['accuracy']:.2%}", "", "Confusion (rows = draped, columns = predicted):"]
+    header = "".join(f"{i:>5}" for i in range(1, len(seasons) + 1))
+    lines.append(f"{'':>18}{header}")
+    for i, season in enumerate(seasons):
+        cells = "".join(f"{int(c):>5}" for c in report['confusion'][i])
+        lines.append(f"{i + 1:>2} {season_label(season):<15}{cells}")
+    lines += ["", "Calibration (confidence bin: clients, mean confidence, accuracy):"]
+    for low, high, count, mean_confidence, accuracy in report['calibration']:
+        lines.append(f"  {low:>3}-{high:<3}%  {count:>7}  {mean_confidence:5.1f}%  {accuracy:6.1%}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune SEASON_RECIPES against draping outcomes.")
+    parser.add_argument("labeled_csv")
+    parser.add_argument("--label-column", default="draped_season")
+    parser.add_argument("--method", choices=["coordinate", "random"], default="coordinate")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--step", type=float, default=0.4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", help="write the candidate recipe table here")
+    args = parser.parse_args(argv)
+
+    try:
+        columns, labels = load_labeled(args.labeled_csv, args.label_column)
+    except ValueError as e:
+        parser.error(str(e))
+    traits = calculate_traits_batch(columns)
+    print(f"Loaded {len(labels):,} labeled clients")
+
+    print("\n== Current SEASON_RECIPES ==")
+    print(format_report(evaluate(SEASON_RECIPES, traits, labels)))
+
+    best, _ = tune_recipes(traits, labels, method=args.method, rounds=args.rounds,
+                           step=args.step, seed=args.seed, workers=args.workers)
+
+    print("\n== Candidate recipes ==")
+    print(format_report(evaluate(best, traits, labels)))
+    print("\nChanged weights:")
+    for change in recipe_changes(SEASON_RECIPES, best) or ["(none)"]:
+        print(f"  {change}")
+
+    source = format_recipes(best)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(source)
+        print(f"\nWrote {args.out}")
+    else:
+        print("\n" + source)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())